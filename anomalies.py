@@ -0,0 +1,196 @@
+"""Proxy-attendance anomaly scan over one session's responses
+
+Flags, for an admin to review:
+
+- shared devices: one device_id (a random ID the attendance form keeps in
+  the browser's localStorage) submitting several enrollment numbers
+- shared locations: different enrollment numbers submitted from within
+  same_place_m of each other inside window_s. Indoor GPS scatters phones
+  in one room by tens of metres, so near-identical fixes point to one
+  phone; in a packed hall a few are chance, so these are weaker evidence
+  than a shared device
+- bursts: a shared device or location whose submissions are closer
+  together than min_gap_s, faster than one person can capture a face and
+  fill in the form, or a device whose consecutive submissions imply moving
+  faster than max_speed_mps
+- outliers: submissions far from the class, measured from the median
+  position with a cutoff of the median distance plus outlier_mads median
+  absolute deviations (at least outlier_min_m)
+
+Nothing is compared pairwise. Responses are sorted by time once and swept
+in order; each lands in a grid cell of same_place_m and is only compared
+with the last few submissions in its own and the eight neighbouring cells
+that are still inside the time window. The whole scan is O(n log n).
+"""
+import math
+import itertools
+import collections
+from datetime import datetime
+
+from geofence import METRES_PER_DEGREE
+
+SAME_PLACE_M = 0.25
+WINDOW_S = 120.0
+MIN_GAP_S = 20.0
+MAX_SPEED_MPS = 50.0
+OUTLIER_MIN_M = 100.0
+OUTLIER_MADS = 5.0
+# Recent submissions compared per neighbouring cell; bounds the sweep when a crowd shares one cell
+MAX_COMPARE = 16
+
+
+def _float(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _timestamp(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+class _Groups:
+    """Union-find over response indexes"""
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, index):
+        while self.parent[index] != index:
+            self.parent[index] = self.parent[self.parent[index]]
+            index = self.parent[index]
+        return index
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+
+def _gaps(points, same_place_m=SAME_PLACE_M):
+    """Smallest gap in seconds and fastest implied speed between consecutive (t, x, y) points"""
+    min_gap = max_speed = None
+    for (t1, x1, y1), (t2, x2, y2) in zip(points, points[1:]):
+        gap = t2 - t1
+        min_gap = gap if min_gap is None else min(min_gap, gap)
+        if x1 is not None and x2 is not None:
+            distance = math.hypot(x2 - x1, y2 - y1)
+            speed = math.inf if gap <= 0 and distance > same_place_m else distance / gap if gap > 0 else 0.0
+            max_speed = speed if max_speed is None else max(max_speed, speed)
+    return min_gap, max_speed
+
+
+def scan(responses, same_place_m=SAME_PLACE_M, window_s=WINDOW_S, min_gap_s=MIN_GAP_S,
+         max_speed_mps=MAX_SPEED_MPS, outlier_min_m=OUTLIER_MIN_M, outlier_mads=OUTLIER_MADS):
+    """Anomalies among a session's responses, as a JSON-ready dict"""
+    responses = list(responses)
+    enrollments = [str(response.get('enrollment_no') or '') for response in responses]
+    times = [_timestamp(response.get('created_at')) for response in responses]
+    lats = [_float(response.get('latitude')) for response in responses]
+    lngs = [_float(response.get('longitude')) for response in responses]
+    located = [i for i in range(len(responses)) if lats[i] is not None and lngs[i] is not None]
+
+    # Local metres around the median position, which is also the class centre for outliers
+    xs = [None] * len(responses)
+    ys = [None] * len(responses)
+    centre = None
+    if located:
+        centre = [_median(lats[i] for i in located), _median(lngs[i] for i in located)]
+        kx = METRES_PER_DEGREE * math.cos(math.radians(centre[0]))
+        for i in located:
+            xs[i] = (lngs[i] - centre[1]) * kx
+            ys[i] = (lats[i] - centre[0]) * METRES_PER_DEGREE
+
+    # Shared devices
+    devices = collections.defaultdict(list)
+    for i, response in enumerate(responses):
+        if response.get('device_id'):
+            devices[response['device_id']].append(i)
+    shared_devices = []
+    for device_id, members in devices.items():
+        if len({enrollments[i] for i in members}) < 2:
+            continue
+        timed = sorted((times[i], xs[i], ys[i]) for i in members if times[i] is not None)
+        min_gap, max_speed = _gaps(timed, same_place_m)
+        shared_devices.append({
+            'device_id': device_id[:8],
+            'enrollments': sorted({enrollments[i] for i in members}),
+            'min_gap_s': None if min_gap is None else round(min_gap, 2),
+            'max_speed_mps': None if max_speed is None or math.isinf(max_speed) else round(max_speed, 1),
+            'burst': min_gap is not None and min_gap < min_gap_s,
+            'impossible_travel': max_speed is not None and max_speed > max_speed_mps
+        })
+
+    # Shared locations: a time-ordered sweep over grid cells
+    groups = _Groups(len(responses))
+    cells = collections.defaultdict(collections.deque)
+    for i in sorted((i for i in located if times[i] is not None), key=times.__getitem__):
+        cx, cy = math.floor(xs[i] / same_place_m), math.floor(ys[i] / same_place_m)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                recent = cells.get((cx + dx, cy + dy))
+                if not recent:
+                    continue
+                while recent and times[i] - times[recent[0]] > window_s:
+                    recent.popleft()
+                for j in itertools.islice(reversed(recent), MAX_COMPARE):
+                    if (enrollments[j] != enrollments[i]
+                            and math.hypot(xs[i] - xs[j], ys[i] - ys[j]) <= same_place_m):
+                        groups.union(i, j)
+        cells[(cx, cy)].append(i)
+    clusters = collections.defaultdict(list)
+    for i in located:
+        if times[i] is not None:
+            clusters[groups.find(i)].append(i)
+    shared_locations = []
+    for members in clusters.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=times.__getitem__)
+        min_gap, _ = _gaps([(times[i], None, None) for i in members])
+        shared_locations.append({
+            'latitude': round(sum(lats[i] for i in members) / len(members), 6),
+            'longitude': round(sum(lngs[i] for i in members) / len(members), 6),
+            'enrollments': sorted({enrollments[i] for i in members}),
+            'span_s': round(times[members[-1]] - times[members[0]], 2),
+            'min_gap_s': round(min_gap, 2),
+            'burst': min_gap < min_gap_s
+        })
+
+    # Outliers from the class centre
+    outliers = []
+    threshold = None
+    if len(located) >= 3:
+        distances = {i: math.hypot(xs[i], ys[i]) for i in located}
+        typical = _median(distances.values())
+        spread = _median(abs(distance - typical) for distance in distances.values())
+        threshold = max(outlier_min_m, typical + outlier_mads * spread)
+        outliers = sorted(({'enrollment_no': enrollments[i], 'distance_m': round(distance, 1)}
+                           for i, distance in distances.items() if distance > threshold),
+                          key=lambda outlier: -outlier['distance_m'])
+
+    flagged = set()
+    for finding in shared_devices + shared_locations:
+        flagged.update(finding['enrollments'])
+    flagged.update(outlier['enrollment_no'] for outlier in outliers)
+    return {
+        'checked': len(responses),
+        'located': len(located),
+        'centre': centre,
+        'outlier_threshold_m': None if threshold is None else round(threshold, 1),
+        'shared_devices': shared_devices,
+        'shared_locations': shared_locations,
+        'outliers': outliers,
+        'flagged': sorted(flagged)
+    }
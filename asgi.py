@@ -0,0 +1,236 @@
+"""ASGI entry point with an asyncio attendance ingestion path
+
+    uvicorn asgi:app
+
+POST /submit-attendance is handled here: each submission is a coroutine
+rather than a WSGI thread, validation is the same as the Flask view
+(attendance.build_attendance_record) and accepted records are written to
+the same session store in group commits by IngestBatcher. Every other
+request falls through to the Flask app when asgiref is installed
+(pip install asgiref); without it only the ingestion path is served, so
+run the Flask app next to it with SCANMARK_STORE=sqlite, which both
+processes can share.
+"""
+import os
+import json
+import time
+import asyncio
+from io import BytesIO
+
+from werkzeug.formparser import FormDataParser
+from werkzeug.http import parse_options_header
+
+import index
+import logs
+from attendance import build_attendance_record, SubmissionError, SUCCESS_MESSAGE, DUPLICATE_MESSAGE, ERROR_MESSAGE
+from write_behind import QueueFullError
+
+log = logs.get_logger('asgi')
+
+INGEST_PATH = '/submit-attendance'
+
+
+class IngestBatcher:
+    """Collects submissions from many coroutines and stores them in batches
+
+    Records queue up while the previous batch is being written, and the
+    next write takes up to `max_batch` of them in one store call on a
+    single background thread (one journal fsync or one SQLite transaction
+    per batch). submit() resolves to the store's add_response() result.
+    At most `max_pending` records may wait; beyond that submit() raises
+    QueueFullError.
+    """
+
+    def __init__(self, write_batch, max_batch=200, max_pending=10000):
+        self.write_batch = write_batch
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._queue = None
+        self._task = None
+        self._executor = None
+
+    def start(self):
+        if self._task is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._queue = asyncio.Queue()
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix='ingest')
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Write whatever is queued, then stop"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        self._executor.shutdown(wait=True)
+        self._task = None
+
+    async def submit(self, admin_username, session_id, record):
+        self.start()
+        if self._queue.qsize() >= self.max_pending:
+            raise QueueFullError('Ingestion queue is full')
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(((admin_username, session_id, record), future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                results = await loop.run_in_executor(self._executor, self.write_batch, [item for item, _ in batch])
+            except Exception as e:
+                log.exception('ingest.store_failed', records=len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), added in zip(batch, results):
+                    if not future.done():
+                        future.set_result(added)
+            for _ in batch:
+                self._queue.task_done()
+
+
+async def read_body(receive, limit):
+    """Read the request body; None if the client went away, or ValueError past `limit` bytes"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            raise ValueError('Request body too large')
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+def parse_form(headers, body):
+    content_type = headers.get(b'content-type', b'').decode('latin-1')
+    mimetype, options = parse_options_header(content_type)
+    _, form, _ = FormDataParser().parse(BytesIO(body), mimetype, len(body), options)
+    return form
+
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode('ascii'))],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class IngestApp:
+    """ASGI app serving the attendance ingestion path and delegating the rest"""
+
+    def __init__(self, batcher, fallback=None, max_body=16 * 1024 * 1024,
+                 get_session=index.get_admin_session, session_ttl=1.0):
+        self.batcher = batcher
+        self.fallback = fallback
+        self.max_body = max_body
+        self.get_session = get_session
+        self.session_ttl = session_ttl
+        # (admin, session_id) -> (session data, expiry); touched only on the event loop
+        self._sessions = {}
+        self._loading = {}
+
+    async def lookup_session(self, admin_username, session_id):
+        """Session data, read from the store at most once per session_ttl
+
+        The read is store I/O (SQLite, Supabase), so it runs on a thread;
+        concurrent misses for one session share it.
+        """
+        key = (admin_username, session_id)
+        cached = self._sessions.get(key)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        loading = self._loading.get(key)
+        if loading is None:
+            loop = asyncio.get_running_loop()
+            loading = self._loading[key] = loop.run_in_executor(None, self.get_session, admin_username, session_id)
+            try:
+                session_data = await loading
+            finally:
+                del self._loading[key]
+            if len(self._sessions) >= 1024:
+                self._sessions.clear()
+            self._sessions[key] = (session_data, time.monotonic() + self.session_ttl)
+            return session_data
+        return await loading
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'] == INGEST_PATH:
+            await self.ingest(scope, receive, send)
+        elif self.fallback is not None:
+            await self.fallback(scope, receive, send)
+        elif scope['type'] == 'http':
+            await send_json(send, 404, {'success': False, 'message': 'Not found'})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.batcher.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.batcher.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def ingest(self, scope, receive, send):
+        try:
+            body = await read_body(receive, self.max_body)
+        except ValueError:
+            await send_json(send, 413, {'success': False, 'message': 'Request too large'})
+            return
+        if body is None:
+            return
+        try:
+            form = parse_form(dict(scope['headers']), body)
+            session_data = await self.lookup_session(form.get('admin'), form.get('session_id'))
+            record = build_attendance_record(form, lambda admin_username, session_id: session_data)
+            added = await self.batcher.submit(record['admin_username'], record['session_id'], record)
+        except SubmissionError as e:
+            await send_json(send, e.status, {'success': False, 'message': e.message})
+            return
+        except QueueFullError:
+            await send_json(send, 503, {'success': False, 'message': 'The server is busy. Please try again.'})
+            return
+        except Exception:
+            log.exception('ingest.failed')
+            await send_json(send, 500, {'success': False, 'message': ERROR_MESSAGE})
+            return
+        if not added:
+            await send_json(send, 409, {'success': False, 'message': DUPLICATE_MESSAGE})
+            return
+        await send_json(send, 200, {'success': True, 'message': SUCCESS_MESSAGE})
+
+
+def _flask_fallback():
+    try:
+        from asgiref.wsgi import WsgiToAsgi
+    except ImportError:
+        return None
+    return WsgiToAsgi(index.app)
+
+
+app = IngestApp(
+    IngestBatcher(
+        index.add_session_responses,
+        max_batch=int(os.getenv('INGEST_BATCH_SIZE', '200')),
+        max_pending=int(os.getenv('INGEST_QUEUE_LIMIT', '10000'))
+    ),
+    fallback=_flask_fallback(),
+    max_body=index.app.config['MAX_CONTENT_LENGTH'],
+    session_ttl=float(os.getenv('INGEST_SESSION_TTL_SECONDS', '1'))
+)
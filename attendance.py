@@ -0,0 +1,84 @@
+import math
+from datetime import datetime
+
+import geofence
+
+# Response messages shared by the Flask and ASGI submission endpoints
+SUCCESS_MESSAGE = 'Attendance marked successfully!'
+DUPLICATE_MESSAGE = 'Attendance already marked for this session'
+ERROR_MESSAGE = 'An error occurred. Please try again.'
+OUTSIDE_GEOFENCE_MESSAGE = 'You must be in the classroom to mark attendance'
+
+
+class SubmissionError(Exception):
+    """A submission that fails validation; `status` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def build_attendance_record(form, get_session):
+    """Validate a submitted attendance form and build the record to store
+
+    `form` is any mapping with .get() (Flask's request.form or a parsed
+    ASGI body); `get_session(admin_username, session_id)` returns the
+    session dict or None. Raises SubmissionError with the message the
+    student sees.
+    """
+    enrollment_no = form.get('enrollment_no')
+    student_name = form.get('student_name')
+    session_id = form.get('session_id')
+    admin_username = form.get('admin')
+    latitude = form.get('latitude')
+    longitude = form.get('longitude')
+    address = form.get('address')
+    biometric_verified = form.get('biometric_verified')
+    # Random per-browser ID from the form, used by the anomaly scan (anomalies.py)
+    device_id = (form.get('device_id') or '')[:64] or None
+
+    # Validate required fields
+    if not all([enrollment_no, student_name, session_id, admin_username]):
+        raise SubmissionError('Please fill in all required fields')
+
+    # Validate location
+    if not all([latitude, longitude, address]):
+        raise SubmissionError('Location information is required')
+
+    # Validate face verification
+    if biometric_verified != 'true':
+        raise SubmissionError('Face verification is required')
+
+    # Check if session exists and is active
+    session_data = get_session(admin_username, session_id)
+    if session_data is None:
+        raise SubmissionError('Invalid or expired session')
+    if not session_data.get('active', False):
+        raise SubmissionError('This session is no longer active')
+
+    # Check the location against the session's geofence, if it has one
+    fence = session_data.get('geofence')
+    if fence:
+        try:
+            lat, lng = float(latitude), float(longitude)
+        except ValueError:
+            lat = lng = math.nan
+        if not (math.isfinite(lat) and math.isfinite(lng)):
+            raise SubmissionError('Location information is invalid')
+        if not geofence.contains(fence, lat, lng):
+            raise SubmissionError(OUTSIDE_GEOFENCE_MESSAGE, 403)
+
+    return {
+        'enrollment_no': enrollment_no,
+        'student_name': student_name,
+        'session_id': session_id,
+        'admin_username': admin_username,
+        'created_at': datetime.now().isoformat(),
+        'latitude': latitude,
+        'longitude': longitude,
+        'address': address if address else 'Location not available',
+        'biometric_verified': True,
+        'biometric_type': 'Face ID',
+        'device_id': device_id
+    }
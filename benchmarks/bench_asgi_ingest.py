@@ -0,0 +1,99 @@
+"""Burst of concurrent attendance submissions through the ASGI ingestion app
+
+Drives asgi.app in-process (no server or sockets) with `students`
+submissions started at the same moment, the way a lecture hall scans one
+QR code, and reports throughput, latency and how many store batches the
+burst was written in.
+
+Usage: python benchmarks/bench_asgi_ingest.py [students] [--store memory|sqlite]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def multipart(fields, boundary='scanmarkbench'):
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n')
+    parts.append(f'--{boundary}--\r\n')
+    return ''.join(parts).encode('utf-8'), f'multipart/form-data; boundary={boundary}'.encode('latin-1')
+
+
+async def submit(app, body, content_type):
+    sent = False
+    status = []
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+            return {'type': 'http.disconnect'}
+        sent = True
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/submit-attendance',
+             'headers': [(b'content-type', content_type)]}
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    return status[0], time.perf_counter() - start
+
+
+async def burst(app, session_id, students):
+    requests = [
+        multipart({'enrollment_no': f'EN{i:06d}', 'student_name': f'Student {i}', 'session_id': session_id,
+                   'admin': 'admin', 'latitude': '28.6139', 'longitude': '77.2090',
+                   'address': 'Lecture Hall 3', 'biometric_verified': 'true'})
+        for i in range(students)
+    ]
+    # Every student re-submits once; those must come back as 409
+    requests += requests[:students // 10]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(submit(app, body, content_type) for body, content_type in requests))
+    wall = time.perf_counter() - start
+    await app.batcher.stop()
+    return results, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('students', type=int, nargs='?', default=2000)
+    parser.add_argument('--store', default='memory', choices=['memory', 'sqlite'])
+    args = parser.parse_args()
+
+    os.environ['SCANMARK_DATA_DIR'] = tempfile.mkdtemp(prefix='scanmark-ingest-')
+    os.environ['SCANMARK_STORE'] = args.store
+    with open(os.devnull, 'w') as sink, contextlib.redirect_stdout(sink):
+        import asgi
+        import index
+        index.save_admin_session('admin', 'burst', {'name': 'Burst', 'active': True})
+
+    batches = []
+    write_batch = asgi.app.batcher.write_batch
+    asgi.app.batcher.write_batch = lambda items: batches.append(len(items)) or write_batch(items)
+
+    results, wall = asyncio.run(burst(asgi.app, 'burst', args.students))
+    latencies = sorted(elapsed for _, elapsed in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"store={args.store} submissions={len(results)} statuses={statuses}")
+    print(f"wall {wall * 1000:.0f} ms, {len(results) / wall:.0f} req/s, "
+          f"p50 {statistics.median(latencies) * 1000:.1f} ms, p99 {latencies[int(0.99 * len(latencies))] * 1000:.1f} ms")
+    print(f"{len(batches)} store batches, largest {max(batches)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Cold-start regression check for index.py
+
+Runs index.py in fresh interpreters with SCANMARK_PROFILE_STARTUP=json,
+serves one request through the test client and compares the median
+timings with benchmarks/baselines/cold_start.json. Exits with status 1 if
+
+  * time to 'app ready' or to the first response grows by more than
+    --tolerance (fraction) plus --slack-ms over the baseline,
+  * more modules are imported at startup than the baseline allows, or
+  * a module that is meant to be lazily loaded (baseline 'deferred')
+    is imported before the first request.
+
+The module checks do not depend on machine speed; the timing check does,
+so refresh the baseline with --update when moving to different hardware.
+
+Usage: python benchmarks/bench_cold_start.py [--repeat N] [--tolerance F] [--slack-ms MS] [--update]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baselines', 'cold_start.json')
+REPORT_PREFIX = 'startup-profile '
+
+# Only needed by the routes that use them; must stay off the import path
+DEFAULT_DEFERRED = ['segno', 'exports', 'qr_service', 'live_events', 'passwords',
+                    'attendance', 'geofence', 'geocoding', 'anomalies']
+
+SCRIPT = (
+    'import index; '
+    'index.app.test_client().get("/admin/login")'
+)
+
+
+def run_once(data_dir):
+    env = dict(os.environ, SCANMARK_PROFILE_STARTUP='json', SCANMARK_DATA_DIR=data_dir, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, '-c', SCRIPT], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    for line in result.stdout.splitlines():
+        if line.startswith(REPORT_PREFIX):
+            return json.loads(line[len(REPORT_PREFIX):])
+    raise RuntimeError('index.py did not print a startup profile:\n' + result.stdout + result.stderr)
+
+
+def measure(repeat):
+    reports = []
+    with tempfile.TemporaryDirectory(prefix='scanmark-cold-') as data_dir:
+        for _ in range(repeat):
+            reports.append(run_once(data_dir))
+    return {
+        'app_ready_ms': round(statistics.median(r['milestones_ms']['app ready'] for r in reports), 1),
+        'first_response_ms': round(statistics.median(r['milestones_ms']['first response'] for r in reports), 1),
+        'first_request_ms': round(statistics.median(r['first_request_ms'] for r in reports), 1),
+        'import_modules': max(len(r['modules']['import']) for r in reports),
+        'imported_at_startup': sorted(set().union(*(r['modules']['import'] for r in reports))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--slack-ms', type=float, default=15.0)
+    parser.add_argument('--update', action='store_true', help='write the current numbers as the new baseline')
+    args = parser.parse_args()
+
+    current = measure(args.repeat)
+    imported = current.pop('imported_at_startup')
+    print(f"{'metric':>18} {'current':>9} {'baseline':>9}")
+
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.update:
+        current['deferred'] = baseline.get('deferred', DEFAULT_DEFERRED)
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        with open(BASELINE, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+            f.write('\n')
+        for key, value in current.items():
+            if key != 'deferred':
+                print(f"{key:>18} {value:>9}")
+        print(f"Baseline written to {os.path.relpath(BASELINE, ROOT)}")
+        return 0
+
+    if not baseline:
+        print('No baseline yet; run with --update first')
+        return 1
+
+    failures = []
+    for key in ('app_ready_ms', 'first_response_ms'):
+        limit = baseline[key] * (1 + args.tolerance) + args.slack_ms
+        print(f"{key:>18} {current[key]:>9} {baseline[key]:>9}")
+        if current[key] > limit:
+            failures.append(f'{key} {current[key]} ms exceeds {limit:.1f} ms')
+    print(f"{'import_modules':>18} {current['import_modules']:>9} {baseline['import_modules']:>9}")
+    if current['import_modules'] > baseline['import_modules']:
+        failures.append(f"{current['import_modules'] - baseline['import_modules']} more modules imported at startup")
+    for name in baseline.get('deferred', DEFAULT_DEFERRED):
+        if name in imported:
+            failures.append(f'{name} is imported at startup but should be deferred')
+
+    for failure in failures:
+        print('FAIL: ' + failure)
+    if not failures:
+        print('OK')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
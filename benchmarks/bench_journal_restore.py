@@ -0,0 +1,101 @@
+"""Restore time of the session journal against journal size
+
+"replay" restores from the journal alone; "snapshot" restores from a
+snapshot plus the longest tail the default SCANMARK_SNAPSHOT_EVERY leaves
+behind, which is what a restart normally costs. "first use" is the one-off
+parse of one session's responses the first time it is read afterwards.
+
+Usage: python benchmarks/bench_journal_restore.py [sizes...]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import SessionJournal, loaded_responses
+
+DEFAULT_SIZES = [10000, 50000, 100000, 300000]
+SESSIONS = 50
+# Records replayed on top of the snapshot: the default snapshot interval
+TAIL = 10000
+
+
+def make_response(i, session_id):
+    return {
+        'enrollment_no': f'EN{i:07d}',
+        'student_name': f'Student {i}',
+        'session_id': session_id,
+        'admin_username': 'admin',
+        'created_at': '2025-03-17T10:15:30.123456',
+        'latitude': '28.6139',
+        'longitude': '77.2090',
+        'address': 'Lecture Hall 3, Main Campus',
+        'biometric_verified': True,
+        'biometric_type': 'Face ID'
+    }
+
+
+def build(directory, size, snapshot):
+    journal = SessionJournal(directory, snapshot_every=size + 1, fsync=False)
+    sessions, responses = journal.restore()
+    for s in range(SESSIONS):
+        session_id = f'session-{s}'
+        data = {'name': f'Lecture {s}', 'faculty': 'Dr. Rao', 'branch': 'CSE',
+                'semester': '5', 'created_at': '2025-03-17T10:00:00', 'active': True}
+        journal._apply(sessions, responses, 'session', ('admin', session_id, data))
+        journal.record('session', 'admin', session_id, data)
+    # The snapshot is taken TAIL records before the end, as late as snapshot_every allows
+    snapshot_at = max(size - TAIL, 0) if snapshot else None
+    for i in range(size):
+        if i == snapshot_at:
+            journal.snapshot(sessions, responses, background=False)
+        session_id = f'session-{i % SESSIONS}'
+        response = make_response(i, session_id)
+        journal._apply(sessions, responses, 'response', ('admin', session_id, response))
+        journal.record('response', 'admin', session_id, response)
+    journal.close()
+
+
+def time_restore(directory, repeat=3):
+    best = first_use = None
+    for _ in range(repeat):
+        journal = SessionJournal(directory)
+        start = time.perf_counter()
+        sessions, responses = journal.restore()
+        elapsed = time.perf_counter() - start
+        admin_responses = responses['admin']
+        start = time.perf_counter()
+        loaded_responses(admin_responses, 'session-0')
+        parsed = time.perf_counter() - start
+        journal.close()
+        best = elapsed if best is None else min(best, elapsed)
+        first_use = parsed if first_use is None else min(first_use, parsed)
+    restored = sum(len(loaded_responses(admin_responses, session_id)) for session_id in list(admin_responses))
+    return best, first_use, restored
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    print(f"{'responses':>10} {'journal MB':>11} {'replay ms':>10} {'snapshot ms':>12} {'first use ms':>13}")
+    for size in sizes:
+        replay_dir = tempfile.mkdtemp(prefix='scanmark-journal-')
+        snapshot_dir = tempfile.mkdtemp(prefix='scanmark-snapshot-')
+        try:
+            build(replay_dir, size, snapshot=False)
+            build(snapshot_dir, size, snapshot=True)
+            journal_mb = os.path.getsize(os.path.join(replay_dir, 'journal.log')) / 1e6
+            replay, _, restored = time_restore(replay_dir)
+            from_snapshot, first_use, restored_snapshot = time_restore(snapshot_dir)
+            assert restored == restored_snapshot == size
+            print(f"{size:>10} {journal_mb:>11.1f} {replay * 1000:>10.1f} {from_snapshot * 1000:>12.1f} "
+                  f"{first_use * 1000:>13.1f}")
+        finally:
+            shutil.rmtree(replay_dir)
+            shutil.rmtree(snapshot_dir)
+
+
+if __name__ == '__main__':
+    main()
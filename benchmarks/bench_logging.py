@@ -0,0 +1,100 @@
+"""Per-submission logging cost: the old print(request.form) against logs.py
+
+Times, per attendance submission, the statement submit_attendance used to
+run (printing the whole form, captured image included) and its logs.py
+replacement, sampled as in index.py and unsampled. Output goes to a
+temporary file in both cases so the print pays for real I/O. Each variant
+runs on 1 thread and on --threads threads, since stdout is shared by every
+request thread in a worker.
+
+Usage: python benchmarks/bench_logging.py [--calls N] [--threads N]
+"""
+import os
+import sys
+import time
+import base64
+import argparse
+import tempfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Roughly the size of the 0.8-quality JPEG the form captures from the camera
+IMAGE_BYTES = 24 * 1024
+
+
+def make_form():
+    from werkzeug.datastructures import ImmutableMultiDict
+    return ImmutableMultiDict({
+        'enrollment_no': '0801CS000123',
+        'student_name': 'Student 123',
+        'session_id': 'c0ffee00-0000-4000-8000-000000000000',
+        'admin': 'admin',
+        'latitude': '22.719600',
+        'longitude': '75.857700',
+        'address': 'Lecture Hall 3, Main Campus, Indore, Madhya Pradesh, India',
+        'biometric_verified': 'true',
+        'captured_image': 'data:image/jpeg;base64,' + base64.b64encode(os.urandom(IMAGE_BYTES)).decode('ascii'),
+    })
+
+
+def run(statement, calls, threads):
+    per_thread = calls // threads
+
+    def worker(_):
+        for _ in range(per_thread):
+            statement()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(worker, range(threads)))
+    return (time.perf_counter() - start) / (per_thread * threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=4000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    out = tempfile.NamedTemporaryFile('w', prefix='scanmark-log-', suffix='.log', delete=False)
+    import logs
+    handler = logs.configure()
+    handler.stream = out
+    sampled = logs.get_logger('bench')
+    unsampled = logs.StructuredLogger(sampled.logger, 1.0)
+    form = make_form()
+
+    def old_print():
+        print(f"Received attendance data: {form}")
+
+    def log_with(logger):
+        def statement():
+            logger.info('attendance.received', sampled=True, session_id=form.get('session_id'),
+                        admin=form.get('admin'), enrollment_no=form.get('enrollment_no'))
+        return statement
+
+    variants = [
+        ('print(request.form)', old_print),
+        (f'log.info sampled ({sampled.sample_rate:g})', log_with(sampled)),
+        ('log.info unsampled', log_with(unsampled)),
+    ]
+    print(f"{args.calls} calls per variant, output to {out.name}")
+    print(f"{'variant':<28} {'1 thread':>12} {f'{args.threads} threads':>12}")
+    for name, statement in variants:
+        timings = []
+        for threads in (1, args.threads):
+            with contextlib.redirect_stdout(out):
+                timings.append(run(statement, args.calls, threads))
+            # Writes still queued belong to this variant, not the next one
+            handler.drain()
+        print(f"{name:<28} {timings[0] * 1e6:>10.2f}us {timings[1] * 1e6:>10.2f}us")
+    print(f"{os.path.getsize(out.name) / 1e6:.1f} MB written")
+    out.close()
+    os.unlink(out.name)
+
+
+if __name__ == '__main__':
+    main()
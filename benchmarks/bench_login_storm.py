@@ -0,0 +1,121 @@
+"""Login storm: PBKDF2 on request threads vs the bounded hashing pool
+
+Simulates a department signing in at once while students keep submitting
+attendance. `logins` threads each post the login form `rounds` times and
+`students` threads submit attendance for the whole run, all through the
+Flask test client (each client thread stands in for a server thread).
+
+For each mode it reports login throughput and latency, logins turned
+away with 503, and attendance submission latency during the storm.
+
+Usage: python benchmarks/bench_login_storm.py [--logins N] [--rounds N] [--students N]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('SCANMARK_DATA_DIR', tempfile.mkdtemp(prefix='scanmark-login-'))
+os.environ.setdefault('SCANMARK_JOURNAL_FSYNC', 'false')
+# Keep the sampled per-submission log out of the report
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import index
+from passwords import PasswordHasher
+
+MODES = {
+    'inline': dict(max_workers=0),
+    'pool 1/64': dict(max_workers=1, max_queue=64, timeout=30),
+    'pool 2/64': dict(max_workers=2, max_queue=64, timeout=30),
+    'pool 2/8': dict(max_workers=2, max_queue=8, timeout=30),
+}
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def make_session():
+    client = index.app.test_client()
+    client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+    client.post('/create_session', data={'session_name': 'Storm', 'faculty_name': 'Dr. Rao',
+                                         'branch': 'CSE', 'semester': '5'})
+    return next(iter(index.get_admin_sessions('admin')))
+
+
+def run(mode, options, args, session_id):
+    index.password_hasher = PasswordHasher(**options)
+    login_times, submit_times = [], []
+    rejected = [0]
+    done = threading.Event()
+
+    def login_worker():
+        client = index.app.test_client()
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            response = client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+            elapsed = time.perf_counter() - start
+            if response.status_code == 503:
+                rejected[0] += 1
+            else:
+                login_times.append(elapsed)
+
+    def student_worker(worker):
+        client = index.app.test_client()
+        count = 0
+        while not done.is_set():
+            count += 1
+            start = time.perf_counter()
+            client.post('/submit-attendance', data={
+                'enrollment_no': f'{mode}-{worker}-{count}', 'student_name': 'Student',
+                'session_id': session_id, 'admin': 'admin', 'latitude': '28.6',
+                'longitude': '77.2', 'address': 'Campus', 'biometric_verified': 'true'
+            })
+            submit_times.append(time.perf_counter() - start)
+
+    logins = [threading.Thread(target=login_worker) for _ in range(args.logins)]
+    students = [threading.Thread(target=student_worker, args=(i,)) for i in range(args.students)]
+    start = time.perf_counter()
+    for thread in students + logins:
+        thread.start()
+    for thread in logins:
+        thread.join()
+    wall = time.perf_counter() - start
+    done.set()
+    for thread in students:
+        thread.join()
+    index.password_hasher.shutdown()
+
+    print(f"{mode:>10} {len(login_times) / wall:>9.1f} {statistics.median(login_times) * 1000:>9.0f} "
+          f"{percentile(login_times, 0.95) * 1000:>9.0f} {rejected[0]:>8} "
+          f"{statistics.median(submit_times) * 1000:>10.1f} {percentile(submit_times, 0.99) * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=4)
+    parser.add_argument('--students', type=int, default=8)
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as sink, contextlib.redirect_stdout(sink):
+        session_id = make_session()
+    print(f"{args.logins} login threads x {args.rounds} rounds, {args.students} attendance threads, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'mode':>10} {'logins/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'rejected':>8} "
+          f"{'submit p50':>10} {'submit p99':>10}")
+    for mode, options in MODES.items():
+        run(mode, options, args, session_id)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Cold-start cost of database.py: import alone vs import plus first query
+
+Each measurement runs in a fresh interpreter so nothing is cached between
+runs. 'import' is what a cold start or create_admin.py now pays before
+doing any work; 'import + connect' adds client creation and one health
+check round trip, which is what every import paid when the client was
+created and tested at module level.
+
+Uses SUPABASE_URL / SUPABASE_KEY from the environment (or .env).
+
+Usage: python benchmarks/bench_startup.py [repeat]
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPTS = {
+    'import': (
+        'import time; t = time.perf_counter(); import database; '
+        'print(json.dumps({"ms": (time.perf_counter() - t) * 1000}))'
+    ),
+    'import + connect': (
+        'import time; t = time.perf_counter(); import database; '
+        'health = database.Database.health_check(); '
+        'print(json.dumps({"ms": (time.perf_counter() - t) * 1000, "ok": health["ok"]}))'
+    ),
+}
+
+
+def run(script):
+    result = subprocess.run(
+        [sys.executable, '-c', 'import json; ' + script],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    # database.py prints progress messages; the result is the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'phase':>18} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for name, script in SCRIPTS.items():
+        results = [run(script) for _ in range(repeat)]
+        times = [r['ms'] for r in results]
+        note = '' if all(r.get('ok', True) for r in results) else '  (health check failed)'
+        print(f"{name:>18} {statistics.median(times):>10.1f} {min(times):>8.1f} {max(times):>8.1f}{note}")
+
+
+if __name__ == '__main__':
+    main()
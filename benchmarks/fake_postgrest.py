@@ -0,0 +1,157 @@
+"""In-memory stand-in for the Supabase/PostgREST client used by database.py
+
+Just enough of the query builder for benchmarks: table().select/insert/
+upsert/update/delete with eq/neq/gt/gte/lt/lte/in_ filters, order, limit,
+range, single and count='exact', plus rpc(). Install it with
+`database._client = FakeClient()`. Every execute() is counted in
+`calls`, and `latency` seconds can be added per call to mimic a network
+round trip.
+"""
+import copy
+import time
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.operation = 'select'
+        self.columns = '*'
+        self.payload = None
+        self.filters = []
+        self.orders = []
+        self.count = None
+        self.limit_rows = None
+        self.row_range = None
+        self.single_row = False
+
+    def select(self, columns='*', count=None):
+        self.columns = columns
+        self.count = count
+        return self
+
+    def insert(self, payload):
+        self.operation, self.payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, ignore_duplicates=False, on_conflict='id'):
+        self.operation, self.payload = 'upsert', payload
+        self.ignore_duplicates = ignore_duplicates
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, payload):
+        self.operation, self.payload = 'update', payload
+        return self
+
+    def delete(self):
+        self.operation = 'delete'
+        return self
+
+    def _filter(self, test):
+        self.filters.append(test)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(lambda row: row.get(column) == value)
+
+    def neq(self, column, value):
+        return self._filter(lambda row: row.get(column) != value)
+
+    def gt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and str(row[column]) > str(value))
+
+    def gte(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and str(row[column]) >= str(value))
+
+    def lt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and str(row[column]) < str(value))
+
+    def lte(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and str(row[column]) <= str(value))
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._filter(lambda row: row.get(column) in values)
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.limit_rows = count
+        return self
+
+    def range(self, start, end):
+        self.row_range = (start, end)
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    def _project(self, row):
+        if self.columns in ('*', 'count'):
+            return dict(row)
+        return {column.strip(): row.get(column.strip()) for column in self.columns.split(',')}
+
+    def execute(self):
+        self.client.calls += 1
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        rows = self.client.tables.setdefault(self.table, [])
+
+        if self.operation in ('insert', 'upsert'):
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            inserted = []
+            for item in copy.deepcopy(payload):
+                if self.operation == 'upsert':
+                    key = self.on_conflict
+                    existing = next((row for row in rows if row.get(key) == item.get(key)), None)
+                    if existing is not None:
+                        if not self.ignore_duplicates:
+                            existing.update(item)
+                        continue
+                rows.append(item)
+                inserted.append(item)
+            return FakeResponse(inserted)
+
+        matched = [row for row in rows if all(test(row) for test in self.filters)]
+        if self.operation == 'delete':
+            self.client.tables[self.table] = [row for row in rows if row not in matched]
+            return FakeResponse(matched)
+        if self.operation == 'update':
+            for row in matched:
+                row.update(self.payload)
+            return FakeResponse(matched)
+
+        for column, desc in reversed(self.orders):
+            matched.sort(key=lambda row: str(row.get(column, '')), reverse=desc)
+        total = len(matched)
+        if self.row_range is not None:
+            matched = matched[self.row_range[0]:self.row_range[1] + 1]
+        if self.limit_rows is not None:
+            matched = matched[:self.limit_rows]
+        data = [self._project(row) for row in matched]
+        if self.single_row:
+            data = data[0] if data else None
+        return FakeResponse(data, total if self.count == 'exact' else None)
+
+
+class FakeClient:
+    def __init__(self, tables=None, latency=0.0):
+        self.tables = tables if tables is not None else {}
+        self.latency = latency
+        self.calls = 0
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params):
+        return FakeQuery(self, f'rpc:{name}')
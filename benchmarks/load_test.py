@@ -0,0 +1,199 @@
+"""Classroom-burst load test for index.py, fully offline
+
+Logs in, creates sessions through POST /admin/generate-qr, then fires
+bursts of students at them: each student loads the form
+(GET /submit-attendance) and submits it (POST /submit-attendance) with a
+realistic payload, including a captured-image data URL. Requests go
+through the Flask test client from `--concurrency` threads, so nothing
+leaves the process; the numbers cover routing, validation, templates and
+the session store, not the network.
+
+Reports throughput and p50/p95/p99 latency per route, and compares them
+with benchmarks/baselines/load_test.json. Exits with status 1 when a
+route's p95 grows, or its throughput drops, by more than --tolerance.
+Refresh the baseline with --update.
+
+Usage: python benchmarks/load_test.py [--sessions N] [--bursts N] [--students N]
+                                      [--concurrency N] [--store memory|sqlite] [--update]
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baselines', 'load_test.json')
+sys.path.insert(0, ROOT)
+
+# Roughly the size of the 0.8-quality JPEG the form captures from the camera
+IMAGE_BYTES = 24 * 1024
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float('nan')
+
+
+class Recorder:
+    """Latencies and status codes per route"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = {}
+
+    def add(self, route, status, elapsed):
+        with self.lock:
+            self.latencies.setdefault(route, []).append(elapsed)
+            codes = self.statuses.setdefault(route, {})
+            codes[status] = codes.get(status, 0) + 1
+
+    def timed(self, route, call):
+        start = time.perf_counter()
+        response = call()
+        self.add(route, response.status_code, time.perf_counter() - start)
+        return response
+
+    def summary(self, wall):
+        return {
+            route: {
+                'requests': len(values),
+                'throughput_rps': round(len(values) / wall, 1),
+                'p50_ms': round(percentile(values, 0.50) * 1000, 2),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+                'statuses': {str(code): count for code, count in sorted(self.statuses[route].items())},
+            }
+            for route, values in sorted(self.latencies.items())
+        }
+
+
+def student_form(session_id, admin_username, number, image):
+    return {
+        'enrollment_no': f'0801CS{number:06d}',
+        'student_name': f'Student {number}',
+        'session_id': session_id,
+        'admin': admin_username,
+        'latitude': f'{22.7196 + random.uniform(-0.0005, 0.0005):.6f}',
+        'longitude': f'{75.8577 + random.uniform(-0.0005, 0.0005):.6f}',
+        'address': 'Lecture Hall 3, Main Campus, Indore, Madhya Pradesh, India',
+        'biometric_verified': 'true',
+        'captured_image': image,
+    }
+
+
+def run(args):
+    import index
+    recorder = Recorder()
+    image = 'data:image/jpeg;base64,' + base64.b64encode(os.urandom(IMAGE_BYTES)).decode('ascii')
+
+    admin = index.app.test_client()
+    admin.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+    form_urls = []
+    for number in range(args.sessions):
+        response = recorder.timed('POST /admin/generate-qr', lambda: admin.post('/admin/generate-qr', data={
+            'name': f'Lecture {number}', 'faculty': 'Dr. Sharma', 'branch': 'CSE', 'semester': '5'}))
+        url = urlsplit(response.get_json()['session']['form_url'])
+        form_urls.append(f'{url.path}?{url.query}')
+
+    local = threading.local()
+    counter = iter(range(10 ** 9))
+    counter_lock = threading.Lock()
+
+    def student(form_url):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = index.app.test_client()
+        with counter_lock:
+            number = next(counter)
+        recorder.timed('GET /submit-attendance', lambda: client.get(form_url))
+        query = dict(part.split('=', 1) for part in urlsplit(form_url).query.split('&'))
+        form = student_form(query['session_id'], query['admin'], number, image)
+        recorder.timed('POST /submit-attendance', lambda: client.post('/submit-attendance', data=form))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        for burst in range(args.bursts):
+            form_url = form_urls[burst % len(form_urls)]
+            list(pool.map(student, [form_url] * args.students))
+            if args.pause and burst < args.bursts - 1:
+                time.sleep(args.pause)
+    return recorder.summary(time.perf_counter() - start)
+
+
+def compare(current, baseline, tolerance):
+    failures = []
+    for route, stats in current.items():
+        before = baseline.get(route)
+        # Session setup makes only a handful of requests; too few to compare
+        if before is None or stats['requests'] < 50:
+            continue
+        if stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            failures.append(f"{route}: p95 {stats['p95_ms']} ms vs baseline {before['p95_ms']} ms")
+        if stats['throughput_rps'] < before['throughput_rps'] / (1 + tolerance):
+            failures.append(f"{route}: {stats['throughput_rps']} req/s vs baseline {before['throughput_rps']} req/s")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=5)
+    parser.add_argument('--bursts', type=int, default=5)
+    parser.add_argument('--students', type=int, default=500, help='students per burst')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--pause', type=float, default=0.0, help='seconds between bursts')
+    parser.add_argument('--store', default='memory', choices=['memory', 'sqlite'])
+    parser.add_argument('--tolerance', type=float, default=0.3)
+    parser.add_argument('--update', action='store_true', help='write these results as the new baseline')
+    args = parser.parse_args()
+
+    os.environ['SCANMARK_DATA_DIR'] = tempfile.mkdtemp(prefix='scanmark-load-')
+    os.environ['SCANMARK_STORE'] = args.store
+    # Keep the sampled per-submission log out of the report
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    random.seed(0)
+    with open(os.devnull, 'w') as sink, contextlib.redirect_stdout(sink):
+        results = run(args)
+
+    print(f"{args.bursts} bursts x {args.students} students over {args.sessions} sessions, "
+          f"{args.concurrency} threads, {args.store} store")
+    print(f"{'route':<26} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    for route, stats in results.items():
+        print(f"{route:<26} {stats['requests']:>8} {stats['throughput_rps']:>8} {stats['p50_ms']:>8} "
+              f"{stats['p95_ms']:>8} {stats['p99_ms']:>8}  {stats['statuses']}")
+
+    key = f'{args.store}:{args.bursts}x{args.students}:c{args.concurrency}'
+    baselines = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE, 'r', encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    if args.update:
+        baselines[key] = results
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        with open(BASELINE, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline '{key}' written to {os.path.relpath(BASELINE, ROOT)}")
+        return 0
+
+    if key not in baselines:
+        print(f"No baseline for '{key}'; run with --update to record one")
+        return 0
+    failures = compare(results, baselines[key], args.tolerance)
+    for failure in failures:
+        print('FAIL: ' + failure)
+    print('OK' if not failures else f'{len(failures)} regression(s) against baseline')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,481 @@
+"""Microbenchmarks for ScanMark's hot functions, recorded per commit
+
+Each benchmark is a setup function registered with @benchmark that returns
+the callable to time. Like pytest-benchmark, the callable is calibrated to
+a number of loops per round, rounds are repeated for at least --min-time
+seconds, and min/median/mean/stddev per call are reported.
+
+Results are written to benchmarks/results/<commit>.json, named after the
+short commit hash of HEAD with '-dirty' appended when files outside
+benchmarks/ have uncommitted changes. --compare <commit> prints the change
+in median against an earlier run, so check in the results for a commit
+before shipping a performance change and compare after.
+
+Database benchmarks run against benchmarks/fake_postgrest.py, and the
+sqlite group against the embedded sqlite_backend, so no Supabase project
+is needed.
+
+Usage: python benchmarks/microbench.py [-k substring] [--min-time S] [--compare COMMIT] [--no-save]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import itertools
+import statistics
+import contextlib
+import subprocess
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DATA_DIR = tempfile.mkdtemp(prefix='scanmark-micro-')
+os.environ['SCANMARK_DATA_DIR'] = DATA_DIR
+os.environ['SCANMARK_STORE'] = 'memory'
+os.environ['SCANMARK_JOURNAL_FSYNC'] = 'false'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+BENCHMARKS = []
+
+
+def benchmark(name, group, **params):
+    """Register a setup function; it returns the zero-argument callable to time"""
+    def decorator(setup):
+        BENCHMARKS.append((name, group, setup, params))
+        return setup
+    return decorator
+
+
+_DEVNULL = open(os.devnull, 'w')
+
+
+def quiet():
+    # Some setup paths still print progress
+    return contextlib.redirect_stdout(_DEVNULL)
+
+
+def make_response(i, session_id):
+    return {
+        'enrollment_no': f'0801CS{i:07d}',
+        'student_name': f'Student {i}',
+        'session_id': session_id,
+        'admin_username': 'admin',
+        'created_at': '2025-03-17T10:15:30.123456',
+        'latitude': '22.7196',
+        'longitude': '75.8577',
+        'address': 'Lecture Hall 3, Main Campus',
+        'biometric_verified': True,
+        'biometric_type': 'Face ID'
+    }
+
+
+def make_session(i):
+    return {
+        'name': f'Lecture {i}',
+        'faculty': 'Dr. Sharma',
+        'branch': 'CSE',
+        'semester': '5',
+        'created_at': '2025-03-17T10:00:00',
+        'active': True,
+        'form_url': f'http://localhost/submit-attendance?session_id=session-{i}&admin=admin',
+    }
+
+
+def memory_store(responses, session_id='bench'):
+    """A fresh journaled store with `responses` responses in one session"""
+    from session_store import create_store
+    store = create_store('memory', tempfile.mkdtemp(dir=DATA_DIR), snapshot_every=10 ** 9, fsync=False)
+    store.put_session('admin', session_id, make_session(0))
+    for start in range(0, responses, 5000):
+        store.add_responses([('admin', session_id, make_response(i, session_id))
+                             for i in range(start, min(start + 5000, responses))])
+    return store
+
+
+def logged_in_client(index):
+    client = index.app.test_client()
+    client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+    return client
+
+
+# QR ----------------------------------------------------------------------
+
+@benchmark('generate_session_qr', 'qr')
+def bench_generate_session_qr():
+    import index
+    session_data = make_session(0)
+
+    def run():
+        with index.app.test_request_context('/'):
+            index.generate_session_qr('admin', 'session-0', session_data)
+    return run
+
+
+@benchmark('qr_cache.render png miss', 'qr')
+def bench_qr_render_miss():
+    from qr_service import QRCache
+    cache = QRCache(max_bytes=0)
+    return lambda: cache.render('http://localhost/submit-attendance?session_id=abc&admin=admin', 'png', 'small')
+
+
+# Passwords ---------------------------------------------------------------
+
+@benchmark('hash_password', 'passwords')
+def bench_hash_password():
+    from passwords import hash_password
+    return lambda: hash_password('admin123')
+
+
+@benchmark('verify_password', 'passwords')
+def bench_verify_password():
+    from passwords import hash_password, verify_password
+    hashed = hash_password('admin123')
+    return lambda: verify_password('admin123', hashed)
+
+
+# Store -------------------------------------------------------------------
+
+for _size in (1000, 10000, 100000):
+    @benchmark(f'add_session_response[{_size}]', 'store', size=_size)
+    def bench_add_session_response(size):
+        import index
+        index.store = memory_store(size)
+        counter = itertools.count(size)
+        return lambda: index.add_session_response('admin', 'bench', make_response(next(counter), 'bench'))
+
+    @benchmark(f'add_session_response duplicate[{_size}]', 'store', size=_size)
+    def bench_add_duplicate(size):
+        import index
+        index.store = memory_store(size)
+        duplicate = make_response(size // 2, 'bench')
+        return lambda: index.add_session_response('admin', 'bench', duplicate)
+
+
+# Exports -----------------------------------------------------------------
+
+for _size in (1000, 10000):
+    @benchmark(f'download_responses csv[{_size}]', 'export', size=_size)
+    def bench_download_responses(size):
+        import index
+        index.store = memory_store(size)
+        client = logged_in_client(index)
+        return lambda: client.get('/admin/download-responses/bench').data
+
+
+# Templates ---------------------------------------------------------------
+
+for _size in (10, 100, 1000):
+    @benchmark(f'render dashboard.html[{_size} sessions]', 'templates', size=_size)
+    def bench_render_dashboard(size):
+        import index
+        from flask import render_template
+        sessions = [dict(make_session(i), id=f'session-{i}', qr_url=f'/admin/qr/session-{i}.png?size=small',
+                         projector_url=f'/admin/qr/session-{i}.svg') for i in range(size)]
+
+        def run():
+            with index.app.test_request_context('/admin/dashboard'):
+                return render_template('admin/dashboard.html', sessions=sessions)
+        return run
+
+
+for _size in (50, 200):
+    @benchmark(f'render view_responses.html[{_size} responses]', 'templates', size=_size)
+    def bench_render_view_responses(size):
+        import index
+        from flask import render_template
+        responses = [make_response(i, 'bench') for i in range(size)]
+
+        def run():
+            with index.app.test_request_context('/admin/view-responses/bench'):
+                return render_template('admin/view_responses.html', responses=responses, session=make_session(0),
+                                       session_id='bench', cursor=None, next_cursor='50', live_after=None,
+                                       qr_url='/admin/qr/bench.svg', qr_print_url='/admin/qr/bench.png?size=print')
+        return run
+
+
+# Database cache wrappers (against the in-memory PostgREST stand-in) ------
+
+def fake_database(rows=1000):
+    import database
+    from fake_postgrest import FakeClient
+    now = datetime.now()
+    database._client = FakeClient({
+        'admins': [{'id': i, 'username': f'admin{i}', 'password_hash': 'x'} for i in range(rows)],
+        'sessions': [{'id': f'session-{i}', 'name': f'Lecture {i}', 'active': True,
+                      'created_at': now.isoformat()} for i in range(rows)],
+        'qr_tokens': [{'token': f'token-{i}', 'session': f'session-{i % 100}',
+                       'created_at': now.isoformat(),
+                       'expires_at': (now + timedelta(hours=1)).isoformat()} for i in range(rows)],
+    })
+    return database.Database
+
+
+@benchmark('Database.get_admin hit', 'database')
+def bench_get_admin_hit():
+    db = fake_database()
+    return lambda: db.get_admin('admin500')
+
+
+@benchmark('Database.get_admin miss', 'database')
+def bench_get_admin_miss():
+    db = fake_database()
+
+    def run():
+        db._get_admin_cached.cache_clear()
+        return db.get_admin('admin500')
+    return run
+
+
+@benchmark('Database.get_session (uncached)', 'database')
+def bench_get_session():
+    db = fake_database()
+    return lambda: db.get_session('session-500')
+
+
+@benchmark('Database._get_session_cached hit', 'database')
+def bench_get_session_cached_hit():
+    db = fake_database()
+    return lambda: db._get_session_cached('session-500')
+
+
+@benchmark('Database._get_session_cached miss', 'database')
+def bench_get_session_cached_miss():
+    db = fake_database()
+
+    def run():
+        db._get_session_cached.cache_clear()
+        return db._get_session_cached('session-500')
+    return run
+
+
+@benchmark('Database.verify_qr_token hit', 'database')
+def bench_verify_qr_token_hit():
+    db = fake_database()
+    return lambda: db.verify_qr_token('token-500')
+
+
+@benchmark('Database.verify_qr_token miss', 'database')
+def bench_verify_qr_token_miss():
+    db = fake_database()
+
+    def run():
+        db._verify_qr_token_cached.cache_clear()
+        return db.verify_qr_token('token-500')
+    return run
+
+
+# Queries against the embedded SQLite backend ---------------------------
+
+_sqlite_database = None
+
+
+def sqlite_database(rows=10000):
+    global _sqlite_database
+    import database
+    if _sqlite_database is None:
+        from sqlite_backend import SQLiteBackend
+        client = SQLiteBackend(os.path.join(DATA_DIR, 'bench.db'))
+        now = datetime.now()
+        client.table('sessions').insert([
+            {'id': f'session-{i}', 'name': f'Lecture {i}', 'faculty': 'Dr. Sharma', 'branch': 'CSE',
+             'semester': '5', 'created_at': now.isoformat()} for i in range(100)]).execute()
+        client.table('qr_tokens').insert([
+            {'token': f'token-{i}', 'session': f'session-{i}', 'created_at': now.isoformat(),
+             'expires_at': (now + timedelta(hours=1)).isoformat()} for i in range(100)]).execute()
+        client.table('attendance').insert([
+            {'id': f'row-{i:06d}', 'student_id': f'0801CS{i:06d}', 'session_id': f'session-{i % 100}',
+             'token': f'token-{i % 100}', 'created_at': (now - timedelta(seconds=i)).isoformat()}
+            for i in range(rows)]).execute()
+        _sqlite_database = client
+    database._client = _sqlite_database
+    return database.Database
+
+
+@benchmark('SQLite get_session (uncached)', 'sqlite')
+def bench_sqlite_get_session():
+    db = sqlite_database()
+    return lambda: db.get_session('session-50')
+
+
+@benchmark('SQLite get_responses_page (50 rows)', 'sqlite')
+def bench_sqlite_responses_page():
+    db = sqlite_database()
+    first, cursor = db.get_responses_page('session-50', limit=50)
+    return lambda: db.get_responses_page('session-50', limit=50, cursor=cursor)
+
+
+@benchmark('SQLite session attendance count', 'sqlite')
+def bench_sqlite_session_count():
+    sqlite_database()
+    import database
+    table = database.get_client().table
+    return lambda: table('attendance').select('id', count='exact').eq('session_id', 'session-50').limit(1).execute()
+
+
+@benchmark('SQLite attendance flush (100 rows)', 'sqlite')
+def bench_sqlite_flush():
+    sqlite_database()
+    import database
+    counter = itertools.count()
+
+    def run():
+        batch = next(counter)
+        database._flush_attendance([
+            {'id': f'flush-{batch}-{i}', 'student_id': f'F{batch}-{i}', 'session_id': 'session-1',
+             'created_at': datetime.now().isoformat(), 'status': 'present'} for i in range(100)])
+    return run
+
+
+# Geofences ---------------------------------------------------------------
+
+CLASSROOM = {'type': 'polygon', 'margin_m': 10.0, 'points': [
+    [22.71900, 75.85700], [22.71900, 75.85780], [22.71960, 75.85780], [22.71960, 75.85740], [22.71990, 75.85740],
+    [22.71990, 75.85700]]}
+
+
+def located_responses(count):
+    import random
+    rng = random.Random(0)
+    return [{'enrollment_no': f'0801CS{i:06d}', 'latitude': f'{22.71945 + rng.gauss(0, 0.0004):.6f}',
+             'longitude': f'{75.85740 + rng.gauss(0, 0.0004):.6f}'} for i in range(count)]
+
+
+@benchmark('geofence.contains polygon (submit)', 'geofence')
+def bench_geofence_contains():
+    import geofence
+    return lambda: geofence.contains(CLASSROOM, 22.71945, 75.85740)
+
+
+@benchmark('geofence.audit polygon', 'geofence', size=50000)
+def bench_geofence_audit(size):
+    import geofence
+    responses = located_responses(size)
+    return lambda: geofence.audit(CLASSROOM, responses)
+
+
+@benchmark('geofence.contains_many polygon (arrays)', 'geofence', size=50000)
+def bench_geofence_contains_many(size):
+    import geofence
+    responses = located_responses(size)
+    lats = [float(r['latitude']) for r in responses]
+    lngs = [float(r['longitude']) for r in responses]
+    with contextlib.suppress(ImportError):
+        import numpy
+        lats, lngs = numpy.array(lats), numpy.array(lngs)
+    return lambda: geofence.contains_many(CLASSROOM, lats, lngs)
+
+
+@benchmark('anomalies.scan lecture', 'geofence', size=1000)
+def bench_anomaly_scan(size):
+    import anomalies
+    start = datetime(2026, 1, 5, 9, 0)
+    responses = located_responses(size)
+    for i, response in enumerate(responses):
+        response['created_at'] = (start + timedelta(seconds=i * 600 / size)).isoformat()
+        response['device_id'] = f'device-{i}'
+    return lambda: anomalies.scan(responses)
+
+
+# Runner ------------------------------------------------------------------
+
+def measure(fn, min_time, min_rounds=5, round_time=0.001):
+    """Per-call timings: calibrate loops so a round lasts >= round_time, then repeat rounds"""
+    fn()
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= round_time or loops >= 1 << 20:
+            break
+        loops *= 10 if elapsed < round_time / 10 else 2
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < min_rounds or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - start) / loops)
+    return {
+        'min_us': round(min(samples) * 1e6, 3),
+        'median_us': round(statistics.median(samples) * 1e6, 3),
+        'mean_us': round(statistics.mean(samples) * 1e6, 3),
+        'stddev_us': round(statistics.stdev(samples) * 1e6, 3) if len(samples) > 1 else 0.0,
+        'rounds': len(samples),
+        'loops': loops,
+        'ops_per_s': round(1 / statistics.median(samples), 1),
+    }
+
+
+def git(*args):
+    return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+
+
+def commit_label():
+    commit = git('rev-parse', '--short', 'HEAD') or 'unknown'
+    # Changes to the benchmarks themselves don't change what is measured
+    dirty = git('status', '--porcelain', '--', '.', ':(exclude)benchmarks')
+    return commit + ('-dirty' if dirty else '')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-k', dest='keyword', help='only run benchmarks whose name contains this')
+    parser.add_argument('--min-time', type=float, default=0.3, help='seconds of rounds per benchmark')
+    parser.add_argument('--compare', help='commit whose saved results to compare against')
+    parser.add_argument('--no-save', action='store_true')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        label = git('rev-parse', '--short', args.compare) or args.compare
+        path = os.path.join(RESULTS_DIR, f'{label}.json')
+        if not os.path.exists(path):
+            print(f'No saved results for {args.compare} ({path})')
+            return 1
+        with open(path, 'r', encoding='utf-8') as f:
+            baseline = {item['name']: item for item in json.load(f)['benchmarks']}
+
+    results = []
+    print(f"{'group':<10} {'benchmark':<44} {'median':>12} {'min':>12} {'stddev':>10} {'rounds':>7}"
+          + (f" {'vs ' + args.compare:>12}" if baseline else ''))
+    for name, group, setup, params in BENCHMARKS:
+        if args.keyword and args.keyword.lower() not in name.lower():
+            continue
+        with quiet():
+            fn = setup(**params)
+            stats = measure(fn, args.min_time)
+        results.append(dict(name=name, group=group, params=params, **stats))
+        line = (f"{group:<10} {name:<44} {stats['median_us']:>10.1f}us {stats['min_us']:>10.1f}us "
+                f"{stats['stddev_us']:>8.1f}us {stats['rounds']:>7}")
+        if name in baseline:
+            change = (stats['median_us'] / baseline[name]['median_us'] - 1) * 100
+            line += f" {change:>+11.1f}%"
+        print(line, flush=True)
+
+    if not args.no_save:
+        label = commit_label()
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f'{label}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'commit': label,
+                'date': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'machine': f'{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs',
+                'benchmarks': results,
+            }, f, indent=2)
+            f.write('\n')
+        print(f'Results saved to {os.path.relpath(path, ROOT)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
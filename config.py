@@ -7,6 +7,13 @@ load_dotenv()
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 
+# Database backend: 'supabase' (hosted) or 'sqlite' (embedded, built from schema.sql)
+DATABASE_BACKEND = os.getenv('DATABASE_BACKEND', 'supabase').lower()
+SQLITE_DATABASE = os.getenv('SQLITE_DATABASE', os.path.join('data', 'scanmark.db'))
+
 # App Configuration
 SECRET_KEY = os.getenv('SECRET_KEY', os.urandom(24).hex())
 DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
+
+# Request latency and backend call metrics, served at /admin/metrics
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
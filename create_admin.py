@@ -1,13 +1,5 @@
 from database import Database
-import hashlib
-import os
-import base64
-
-def hash_password(password: str) -> str:
-    """Hash password with salt using PBKDF2"""
-    salt = os.urandom(32)  # 32 bytes salt
-    key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 100000)
-    return base64.b64encode(salt + key).decode('utf-8')
+from passwords import hash_password
 
 def main():
     print("Starting admin creation/update process...")
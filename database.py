@@ -1,72 +1,148 @@
-from supabase import create_client
-from config import SUPABASE_URL, SUPABASE_KEY
+from config import SUPABASE_URL, SUPABASE_KEY, DATABASE_BACKEND, SQLITE_DATABASE, METRICS_ENABLED
 import uuid
 from datetime import datetime, timedelta
-from functools import lru_cache
-import time
 import os
 import hashlib
 import base64
-import traceback
+import json
+import time
+import threading
+from write_behind import BatchWriter, QueueFullError
+from session_store import DEFAULT_DATA_DIR, private_directory
+from ttl_cache import ttl_cached
+from rollups import DailyRollup, DistinctCounter, AttendanceCounters
+import metrics
+import logs
 
-# Initialize Supabase client
-print("Initializing Supabase client...")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+log = logs.get_logger('database')
 
-# Check if Supabase configuration is present
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError('Supabase configuration missing. Please check your .env file.')
+# The backend client is created on first use, so importing this module
+# (CLI tools, serverless cold starts) does no network I/O and does not
+# fail when the backend is briefly unreachable. Use
+# Database.health_check() to test connectivity explicitly.
+_client = None
+_client_lock = threading.Lock()
 
-try:
+def _create_client():
+    if DATABASE_BACKEND == 'sqlite':
+        from sqlite_backend import SQLiteBackend
+        log.info('client.open', backend='sqlite', path=SQLITE_DATABASE)
+        return SQLiteBackend(SQLITE_DATABASE)
+    if DATABASE_BACKEND != 'supabase':
+        raise ValueError(f'Unknown DATABASE_BACKEND {DATABASE_BACKEND!r}; use supabase or sqlite')
     if not SUPABASE_URL or not SUPABASE_KEY:
-        print('Error: SUPABASE_URL or SUPABASE_KEY is empty')
-        print(f'SUPABASE_URL: {"`" + SUPABASE_URL + "`" if SUPABASE_URL else "Not set"}')
-        print(f'SUPABASE_KEY length: {len(SUPABASE_KEY) if SUPABASE_KEY else "Not set"}')
-        raise ValueError('Supabase configuration missing or invalid')
-
-    # Test the connection
-    print('Testing Supabase connection...')
-    test = supabase.table('sessions').select('count', count='exact').execute()
-    print('Supabase connection successful!')
-except Exception as e:
-    print(f'Error connecting to Supabase: {str(e)}')
-    print('Please check your .env file and make sure SUPABASE_URL and SUPABASE_KEY are set correctly')
-    raise
+        log.error('client.config_missing', supabase_url=SUPABASE_URL or 'Not set',
+                  supabase_key_length=len(SUPABASE_KEY) if SUPABASE_KEY else 'Not set')
+        raise ValueError('Supabase configuration missing. Please check your .env file.')
+    # Imported here too: the client library and its HTTP stack are slow to import
+    from supabase import create_client
+    log.info('client.open', backend='supabase')
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+def get_client():
+    """Return the shared backend client, creating it on first call
+
+    Database only uses the PostgREST query-builder API (table()/rpc()), so
+    any client implementing it can be selected with DATABASE_BACKEND.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                client = _create_client()
+                # Every query is timed and attributed to the Database method that made it
+                _client = metrics.InstrumentedClient(client, DATABASE_BACKEND) if METRICS_ENABLED else client
+    return _client
+
+# Per-day attendance counts; loaded from attendance_daily and bumped on every flush
+daily_rollup = DailyRollup(max_age=300)
+
+# Total / today / per-session counts, bumped on every flush and reconciled in the background
+attendance_counters = AttendanceCounters(reconcile_every=int(os.getenv('STATS_RECONCILE_SECONDS', '60')))
+
+# Distinct students, used when the attendance_students table is unavailable.
+# Built once from the attendance table, then fed by every flush.
+student_counter = DistinctCounter(exact_limit=int(os.getenv('STATS_EXACT_STUDENT_LIMIT', '10000')))
+_student_counter_loaded = False
+
+# Attendance inserts go through a write-behind queue, created on first use
+_attendance_writer = None
+_attendance_writer_lock = threading.Lock()
+
+def _flush_attendance(rows: list):
+    # Upsert keyed on the client-generated id so rows replayed from the spool after a crash are not duplicated
+    get_client().table('attendance').upsert(rows, ignore_duplicates=True).execute()
+
+def _attendance_flushed(rows: list):
+    # Stats are updated in place; nothing is recounted on the write path
+    daily_rollup.add_rows(rows)
+    attendance_counters.add_rows(rows)
+    student_counter.update(row['student_id'] for row in rows)
+
+def get_attendance_writer() -> BatchWriter:
+    global _attendance_writer
+    if _attendance_writer is None:
+        with _attendance_writer_lock:
+            if _attendance_writer is None:
+                data_dir = private_directory(os.getenv('SCANMARK_DATA_DIR', DEFAULT_DATA_DIR))
+                _attendance_writer = BatchWriter(
+                    _flush_attendance,
+                    os.path.join(data_dir, 'attendance.spool'),
+                    max_batch=int(os.getenv('ATTENDANCE_BATCH_SIZE', '200')),
+                    max_delay=int(os.getenv('ATTENDANCE_BATCH_MS', '50')) / 1000,
+                    max_queue=int(os.getenv('ATTENDANCE_QUEUE_LIMIT', '5000')),
+                    max_retries=int(os.getenv('ATTENDANCE_FLUSH_RETRIES', '5')),
+                    on_flush=_attendance_flushed
+                )
+    return _attendance_writer
 
 class Database:
-    # Cache admin data for 5 minutes to reduce database load
     @staticmethod
-    @lru_cache(maxsize=128, typed=False)
-    def _get_admin_cached(username: str, timestamp: int) -> dict:
-        data = supabase.table('admins').select('*').eq('username', username).execute()
+    def cache_stats() -> list:
+        """Hit/miss counters for every TTL cache"""
+        return [
+            Database._get_admin_cached.cache.stats(),
+            Database._get_session_cached.cache.stats(),
+            Database._get_session_tokens_cached.cache.stats(),
+            Database._verify_qr_token_cached.cache.stats(),
+        ]
+
+    # Cache admin data for 5 minutes (served stale for 1 more while refreshing)
+    @staticmethod
+    @ttl_cached(maxsize=128, ttl=300, stale_ttl=60)
+    def _get_admin_cached(username: str) -> dict:
+        data = get_client().table('admins').select('*').eq('username', username).execute()
         return data.data[0] if data.data else None
 
+    @staticmethod
+    def health_check() -> dict:
+        """Round-trip a trivial query; returns ok, latency_ms and error"""
+        started = time.perf_counter()
+        try:
+            get_client().table('sessions').select('id').limit(1).execute()
+            return {'ok': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 1), 'error': None}
+        except Exception as e:
+            return {'ok': False, 'latency_ms': round((time.perf_counter() - started) * 1000, 1), 'error': str(e)}
+
     @staticmethod
     def test_connection():
         """Test the connection to Supabase"""
-        try:
-            print("Testing Supabase connection...")
-            data = supabase.table('admins').select('*').limit(1).execute()
-            print("Connection test successful")
+        log.info('health_check.start')
+        health = Database.health_check()
+        if health['ok']:
+            log.info('health_check.ok', latency_ms=health['latency_ms'])
             return True
-        except Exception as e:
-            print(f"Error connecting to Supabase: {str(e)}")
-            return False
+        log.error('health_check.failed', error=health['error'])
+        return False
 
     @staticmethod
     def get_admin(username: str) -> dict:
         """Get admin by username"""
         try:
-            print(f"Getting admin with username: {username}")
-            data = supabase.table('admins').select('*').eq('username', username).execute()
-            print(f"Query result: {data.data}")
-            
-            if data.data:
-                return data.data[0]
-            return None
+            log.debug('get_admin', username=username)
+            return Database._get_admin_cached(username)
         except Exception as e:
-            print(f"Error getting admin: {str(e)}")
-            traceback.print_exc()
+            log.exception('get_admin.failed')
             return None
 
     @staticmethod
@@ -74,46 +150,47 @@ class Database:
         """Create or update admin user"""
         try:
             # Check if admin exists
-            print(f"Checking if admin '{username}' exists...")
+            log.debug('create_admin.lookup', username=username)
             existing = Database.get_admin(username)
             
             if existing:
-                print("Admin exists, updating password...")
-                data = supabase.table('admins').update({
+                log.info('create_admin.update', username=username)
+                data = get_client().table('admins').update({
                     'password_hash': password_hash
                 }).eq('username', username).execute()
             else:
-                print("Creating new admin...")
-                data = supabase.table('admins').insert({
+                log.info('create_admin.insert', username=username)
+                data = get_client().table('admins').insert({
                     'username': username,
                     'password_hash': password_hash,
-                    'created_at': 'now()'
+                    'created_at': datetime.now().isoformat()
                 }).execute()
             
+            # Drop the cached row (or cached miss) so the change is visible immediately
+            Database._get_admin_cached.invalidate(username)
             return True
         except Exception as e:
-            print(f"Error creating/updating admin: {str(e)}")
-            traceback.print_exc()
+            log.exception('create_admin.failed')
             return False
 
     @staticmethod
     def get_sessions() -> list:
         """Get all sessions"""
         try:
-            data = supabase.table('sessions').select('*').order('created_at', desc=True).execute()
+            data = get_client().table('sessions').select('*').order('created_at', desc=True).execute()
             return data.data if data.data else []
         except Exception as e:
-            print(f"Error getting sessions: {str(e)}")
+            log.error('get_sessions.failed', error=str(e))
             return []
 
     @staticmethod
     def get_session_by_name(session_name: str) -> dict:
         """Get session by name"""
         try:
-            data = supabase.table('sessions').select('*').eq('name', session_name).execute()
+            data = get_client().table('sessions').select('*').eq('name', session_name).execute()
             return data.data[0] if data.data else None
         except Exception as e:
-            print(f"Error getting session by name: {str(e)}")
+            log.error('get_session_by_name.failed', error=str(e))
             return None
 
     @staticmethod
@@ -126,7 +203,7 @@ class Database:
             name = session_data.get('name')
             faculty = session_data.get('faculty')
             if not name or not faculty:
-                print("Missing required fields: name or faculty")
+                log.warning('create_session.invalid', error='Missing required fields: name or faculty')
                 return False, ""
 
             # Create session
@@ -142,9 +219,9 @@ class Database:
             }
             
             # Insert session
-            session_result = supabase.table('sessions').insert(session).execute()
+            session_result = get_client().table('sessions').insert(session).execute()
             if not session_result.data:
-                print("Failed to create session record")
+                log.error('create_session.failed', error='session insert returned no rows')
                 return False, ""
             
             # Create QR token
@@ -157,70 +234,118 @@ class Database:
             }
             
             # Insert token
-            token_result = supabase.table('qr_tokens').insert(token_data).execute()
+            token_result = get_client().table('qr_tokens').insert(token_data).execute()
             if not token_result.data:
-                print("Failed to create QR token")
+                log.error('create_session.failed', error='QR token insert returned no rows')
                 # Clean up session if token creation fails
-                supabase.table('sessions').delete().eq('id', session_id).execute()
+                get_client().table('sessions').delete().eq('id', session_id).execute()
                 return False, ""
                 
             return True, token
             
         except Exception as e:
-            print(f"Error creating session: {str(e)}")
-            traceback.print_exc()
+            log.exception('create_session.failed')
             return False, ""
 
     @staticmethod
     def get_session(session_id: str) -> dict:
         """Get session details by ID"""
         try:
-            data = supabase.table('sessions').select('*').eq('id', session_id).execute()
+            data = get_client().table('sessions').select('*').eq('id', session_id).execute()
             return data.data[0] if data.data else None
         except Exception as e:
-            print(f"Error getting session: {str(e)}")
+            log.error('get_session.failed', error=str(e))
             return None
 
+    # Cache session lookups for 30 seconds so each scan does not re-read the session
     @staticmethod
-    def get_responses(session_id: str) -> list:
-        """Get responses for a session"""
+    @ttl_cached(maxsize=256, ttl=30, stale_ttl=30)
+    def _get_session_cached(session_id: str) -> dict:
+        data = get_client().table('sessions').select('*').eq('id', session_id).execute()
+        return data.data[0] if data.data else None
+
+    @staticmethod
+    def encode_cursor(created_at: str, row_id: str) -> str:
+        return base64.urlsafe_b64encode(json.dumps([created_at, row_id]).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple:
+        """Inverse of encode_cursor; raises ValueError for anything it did not produce"""
         try:
-            # Get QR tokens for the session
-            tokens = supabase.table('qr_tokens').select('token').eq('session', session_id).execute()
-            if not tokens.data:
-                return []
-            
-            # Get all token values
-            token_values = [t['token'] for t in tokens.data]
-            
-            # Get attendance records for these tokens
-            data = supabase.table('attendance').select('*').in_('token', token_values).order('created_at', desc=True).execute()
-            return data.data if data.data else []
+            created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'Invalid page cursor: {cursor!r}') from e
+        return created_at, row_id
+
+    # Cache a session's QR tokens briefly; every page of a session needs them
+    @staticmethod
+    @ttl_cached(maxsize=256, ttl=30, stale_ttl=30)
+    def _get_session_tokens_cached(session_id: str) -> list:
+        tokens = get_client().table('qr_tokens').select('token').eq('session', session_id).execute()
+        return [t['token'] for t in tokens.data] if tokens.data else []
+
+    @staticmethod
+    def get_responses_page(session_id: str, limit: int = 50, cursor: str = None) -> tuple:
+        """Get one page of a session's responses, oldest first like the session stores
+        Returns: (rows: list, next_cursor: str or None)
+
+        Keyset pagination on (created_at, id): the cursor is the last row
+        of the previous page, so each page costs one bounded query. A
+        malformed cursor raises ValueError, as in the session stores.
+        """
+        # Decoded before the query so a bad cursor is not mistaken for a failed one
+        position = Database.decode_cursor(cursor) if cursor else None
+        try:
+            token_values = Database._get_session_tokens_cached(session_id)
+            if not token_values:
+                return [], None
+
+            query = get_client().table('attendance').select('*').in_('token', token_values)
+            if position:
+                created_at, row_id = position
+                query = query.or_(f'created_at.gt."{created_at}",'
+                                  f'and(created_at.eq."{created_at}",id.gt."{row_id}")')
+            # One extra row tells us whether another page exists
+            data = query.order('created_at').order('id').limit(limit + 1).execute()
+            rows = data.data or []
+            if len(rows) <= limit:
+                return rows, None
+            rows = rows[:limit]
+            return rows, Database.encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
         except Exception as e:
-            print(f"Error getting responses: {str(e)}")
-            return []
+            log.error('get_responses_page.failed', error=str(e))
+            return [], None
+
+    @staticmethod
+    def get_responses(session_id: str) -> list:
+        """Get all responses for a session; prefer get_responses_page for display"""
+        rows, cursor = Database.get_responses_page(session_id, limit=1000)
+        while cursor:
+            page, cursor = Database.get_responses_page(session_id, limit=1000, cursor=cursor)
+            rows.extend(page)
+        return rows
 
     @staticmethod
     def delete_session(session_id: str) -> bool:
         """Delete a session and its QR tokens by ID"""
         try:
             # Get session name first
-            session = supabase.table('sessions').select('name').eq('id', session_id).single().execute()
+            session = get_client().table('sessions').select('name').eq('id', session_id).single().execute()
             if not session.data:
                 return False
             
             session_name = session.data['name']
             
             # Delete QR tokens for this session
-            supabase.table('qr_tokens').delete().eq('session', session_name).execute()
+            get_client().table('qr_tokens').delete().eq('session', session_name).execute()
             
             # Delete session
-            result = supabase.table('sessions').delete().eq('id', session_id).execute()
+            result = get_client().table('sessions').delete().eq('id', session_id).execute()
             # Clear cache after modification
-            Database._get_sessions_cached.cache_clear()
+            Database._get_session_cached.invalidate(session_id)
             return bool(result.data)
         except Exception as e:
-            print(f"Error deleting session: {str(e)}")
+            log.error('delete_session.failed', error=str(e))
             return False
             
     @staticmethod
@@ -228,15 +353,15 @@ class Database:
         """Delete a session and its QR tokens by name"""
         try:
             # Delete QR tokens for this session
-            supabase.table('qr_tokens').delete().eq('session', session_name).execute()
+            get_client().table('qr_tokens').delete().eq('session', session_name).execute()
             
             # Delete session
-            result = supabase.table('sessions').delete().eq('name', session_name).execute()
+            result = get_client().table('sessions').delete().eq('name', session_name).execute()
             # Clear cache after modification
-            Database._get_sessions_cached.cache_clear()
+            Database._get_session_cached.cache_clear()
             return bool(result.data)
         except Exception as e:
-            print(f"Error deleting session by name: {str(e)}")
+            log.error('delete_session_by_name.failed', error=str(e))
             return False
 
     @staticmethod
@@ -244,57 +369,54 @@ class Database:
         """Toggle session active status"""
         try:
             # Get current status
-            session_result = supabase.table('sessions').select('active').eq('id', session_id).execute()
+            session_result = get_client().table('sessions').select('active').eq('id', session_id).execute()
             if not session_result.data:
                 return False
             
             # Toggle status
             current_status = session_result.data[0]['active']
-            update_result = supabase.table('sessions')\
+            update_result = get_client().table('sessions')\
                 .update({'active': not current_status})\
                 .eq('id', session_id)\
                 .execute()
                 
             # Clear cache after modification
-            Database._get_sessions_cached.cache_clear()
+            Database._get_session_cached.invalidate(session_id)
             return bool(update_result.data)
         except Exception as e:
-            print(f"Error toggling session: {str(e)}")
+            log.error('toggle_session.failed', error=str(e))
             return False
 
     @staticmethod
     def delete_session(session_id: str) -> bool:
         """Delete a session"""
         try:
-            data = supabase.table('sessions').delete().eq('id', session_id).execute()
+            data = get_client().table('sessions').delete().eq('id', session_id).execute()
             # Clear cache after modification
-            Database._get_sessions_cached.cache_clear()
+            Database._get_session_cached.invalidate(session_id)
             return bool(data.data)
         except Exception as e:
-            print(f"Error deleting session: {str(e)}")
+            log.error('delete_session.failed', error=str(e))
             return False
 
-    # Cache QR token verification for 5 seconds
+    # Cache QR token lookups for 5 seconds
     @staticmethod
-    @lru_cache(maxsize=1000, typed=False)
-    def _verify_qr_token_cached(token: str, timestamp: int) -> dict:
-        data = supabase.table('qr_tokens').select('*').eq('token', token).execute()
-        if not data.data:
-            return None
-        token_data = data.data[0]
-        if datetime.fromisoformat(token_data['expires_at']) < datetime.now():
-            return None
-        return token_data
+    @ttl_cached(maxsize=1000, ttl=5, stale_ttl=5)
+    def _verify_qr_token_cached(token: str) -> dict:
+        data = get_client().table('qr_tokens').select('*').eq('token', token).execute()
+        return data.data[0] if data.data else None
 
     @staticmethod
     def verify_qr_token(token: str) -> dict:
         """Verify if a QR token is valid and not expired with caching"""
         try:
-            # Use current 5-second block as cache key
-            timestamp = int(time.time() / 5) * 5
-            return Database._verify_qr_token_cached(token, timestamp)
+            token_data = Database._verify_qr_token_cached(token)
+            # Expiry is checked on every call so a cached token cannot outlive it
+            if not token_data or datetime.fromisoformat(token_data['expires_at']) < datetime.now():
+                return None
+            return token_data
         except Exception as e:
-            print(f"Error verifying QR token: {str(e)}")
+            log.error('verify_qr_token.failed', error=str(e))
             return None
 
     @staticmethod
@@ -302,7 +424,7 @@ class Database:
         """Create a new QR token for a session"""
         try:
             token = str(uuid.uuid4())
-            data = supabase.table('qr_tokens').insert({
+            data = get_client().table('qr_tokens').insert({
                 'token': token,
                 'session': session,
                 'created_at': datetime.now().isoformat(),
@@ -310,111 +432,156 @@ class Database:
             }).execute()
             return data.data[0] if data.data else None
         except Exception as e:
-            print(f"Error creating QR token: {str(e)}")
+            log.error('create_qr_token.failed', error=str(e))
             return None
 
-    # Cache attendance stats for 1 minute
     @staticmethod
-    @lru_cache(maxsize=1, typed=False)
-    def _get_attendance_stats_cached(timestamp: int) -> dict:
-        total = supabase.table('attendance').select('count', count='exact').execute()
-        today = datetime.now().date().isoformat()
-        today_count = supabase.table('attendance').select('count', count='exact').gte('created_at', today).execute()
-        students = supabase.table('attendance').select('student_id').execute()
-        unique_students = len(set(record['student_id'] for record in students.data))
-        
-        return {
-            'total_attendance': total.count if hasattr(total, 'count') else 0,
-            'today_attendance': today_count.count if hasattr(today_count, 'count') else 0,
-            'total_students': unique_students
-        }
+    def _reconcile_attendance_counters() -> None:
+        """Re-seed the in-place counters from the database"""
+        try:
+            total = get_client().table('attendance').select('id', count='exact').limit(1).execute()
+            today = datetime.now().date().isoformat()
+            today_count = get_client().table('attendance').select('id', count='exact').gte('created_at', today).limit(1).execute()
+            attendance_counters.reconcile(
+                total.count or 0,
+                today_count.count or 0,
+                Database._count_distinct_students(),
+                today_day=today
+            )
+        except Exception as e:
+            log.error('reconcile_counters.failed', error=str(e))
+            attendance_counters.reconcile_failed()
+
+    @staticmethod
+    def _count_distinct_students() -> int:
+        """Count distinct students without transferring the attendance table"""
+        global _student_counter_loaded
+        try:
+            # Only the count comes back; attendance_students is kept by trigger
+            data = get_client().table('attendance_students').select('student_id', count='exact').limit(1).execute()
+            return data.count
+        except Exception as e:
+            log.warning('attendance_students.unavailable', error=str(e))
+
+        if not _student_counter_loaded:
+            page_size = 1000
+            last_id = None
+            while True:
+                # Keyset on id: offsets over an unordered scan can skip or repeat rows
+                query = get_client().table('attendance').select('id,student_id')
+                if last_id is not None:
+                    query = query.gt('id', last_id)
+                page = query.order('id').limit(page_size).execute()
+                student_counter.update(record['student_id'] for record in page.data)
+                if len(page.data) < page_size:
+                    break
+                last_id = page.data[-1]['id']
+            _student_counter_loaded = True
+        return student_counter.count()
 
     @staticmethod
     def get_attendance_stats() -> dict:
-        """Get attendance statistics with caching"""
+        """Get attendance statistics from the in-place counters"""
         try:
-            # Use current 1-minute block as cache key
-            timestamp = int(time.time() / 60) * 60
-            return Database._get_attendance_stats_cached(timestamp)
+            if attendance_counters.due_for_reconcile():
+                if attendance_counters.loaded:
+                    # Serve current values while the database is re-read
+                    threading.Thread(target=Database._reconcile_attendance_counters, daemon=True).start()
+                else:
+                    Database._reconcile_attendance_counters()
+            return attendance_counters.stats()
         except Exception as e:
-            print(f"Error getting attendance stats: {str(e)}")
+            log.error('get_attendance_stats.failed', error=str(e))
             return {
                 'total_attendance': 0,
                 'today_attendance': 0,
                 'total_students': 0
             }
 
-    # Cache attendance trends for 5 minutes
     @staticmethod
-    @lru_cache(maxsize=1, typed=False)
-    def _get_attendance_trends_cached(days: int, timestamp: int) -> list:
+    def get_session_attendance_count(session_id: str) -> int:
+        """Attendance count for one session, read once and then kept up to date"""
         try:
-            trends = []
-            for i in range(days - 1, -1, -1):
-                date = (datetime.now() - timedelta(days=i)).date()
-                next_date = date + timedelta(days=1)
-                
-                count = supabase.table('attendance').select('count', count='exact')\
-                    .gte('created_at', date.isoformat())\
-                    .lt('created_at', next_date.isoformat())\
-                    .execute()
-                
-                trends.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'count': count.count if hasattr(count, 'count') else 0
-                })
-            return trends
+            count = attendance_counters.session_count(session_id)
+            if count is None:
+                data = get_client().table('attendance').select('id', count='exact').eq('session_id', session_id).limit(1).execute()
+                count = data.count or 0
+                attendance_counters.set_session_count(session_id, count)
+            return count
         except Exception as e:
-            print(f"Error in _get_attendance_trends_cached: {str(e)}")
-            return []
+            log.error('get_session_attendance_count.failed', error=str(e))
+            return 0
+
+    @staticmethod
+    def _load_daily_rollup(days: int) -> None:
+        """Load the last `days` days of attendance_daily in a single read"""
+        start = (datetime.now() - timedelta(days=days - 1)).date().isoformat()
+        data = get_client().table('attendance_daily').select('day,count').gte('day', start).execute()
+        daily_rollup.load(start, {row['day']: row['count'] for row in data.data})
 
     @staticmethod
     def get_attendance_trends(days: int = 7) -> list:
         """Get attendance trends for the specified number of days"""
         try:
-            # Use current 5-minute block as cache key
-            timestamp = int(time.time() / 300) * 300
-            return Database._get_attendance_trends_cached(days, timestamp)
+            start = (datetime.now() - timedelta(days=days - 1)).date().isoformat()
+            if not daily_rollup.covers(start):
+                # Load a generous window so nearby requests are answered from memory
+                Database._load_daily_rollup(max(days, 90))
+            return daily_rollup.window(days)
         except Exception as e:
-            print(f"Error getting attendance trends: {str(e)}")
+            log.error('get_attendance_trends.failed', error=str(e))
             return []
 
+    @staticmethod
+    def backfill_daily_rollups() -> bool:
+        """Rebuild attendance_daily from the attendance table"""
+        try:
+            get_client().rpc('backfill_attendance_daily', {}).execute()
+            daily_rollup.invalidate()
+            return True
+        except Exception as e:
+            log.error('backfill_daily_rollups.failed', error=str(e))
+            return False
+
     @staticmethod
     def mark_attendance(student_id: str, session_id: str = None) -> dict:
-        """Mark attendance for a student"""
+        """Mark attendance for a student
+
+        The row is spooled and queued for a bulk insert; it is returned as
+        soon as it is durably queued. Raises QueueFullError when the queue
+        stays full, so callers can ask the client to retry.
+        """
         try:
             # Validate session if provided
             if session_id:
-                session = Database.get_session(session_id)
+                session = Database._get_session_cached(session_id)
                 if not session or not session['active']:
                     raise ValueError("Invalid or inactive session")
 
-            data = supabase.table('attendance').insert({
+            return get_attendance_writer().submit({
                 'id': str(uuid.uuid4()),
                 'student_id': student_id,
                 'session_id': session_id,
                 'created_at': datetime.now().isoformat(),
                 'status': 'present'
-            }).execute()
-            # Clear stats cache after new attendance
-            Database._get_attendance_stats_cached.cache_clear()
-            Database._get_attendance_trends_cached.cache_clear()
-            return data.data[0] if data.data else None
+            })
         except ValueError as ve:
-            print(f"Validation error in mark_attendance: {str(ve)}")
+            log.warning('mark_attendance.invalid', error=str(ve))
+            raise
+        except QueueFullError as qe:
+            log.warning('mark_attendance.queue_full', error=str(qe))
             raise
         except Exception as e:
-            print(f"Error marking attendance: {str(e)}")
+            log.error('mark_attendance.failed', error=str(e))
             return None
 
     @staticmethod
     def get_unique_students_count():
         """Get count of unique students who have attended sessions."""
         try:
-            data = supabase.table('attendance').select('student_id', count='exact').execute()
-            return data.count
+            return Database.get_attendance_stats()['total_students']
         except Exception as e:
-            print(f"Error getting unique students count: {str(e)}")
+            log.error('get_unique_students_count.failed', error=str(e))
             return 0
 
     @staticmethod
@@ -422,31 +589,28 @@ class Database:
         """Get count of active sessions."""
         try:
             now = datetime.now()
-            data = supabase.table('qr_tokens').select('session', count='exact').gte('expires_at', now.isoformat()).execute()
+            data = get_client().table('qr_tokens').select('session', count='exact').gte('expires_at', now.isoformat()).execute()
             return data.count
         except Exception as e:
-            print(f"Error getting active sessions count: {str(e)}")
+            log.error('get_active_sessions_count.failed', error=str(e))
             return 0
 
     @staticmethod
     def get_today_attendance_count():
         """Get count of attendance records for today."""
         try:
-            today = datetime.now().date()
-            data = supabase.table('attendance').select('id', count='exact').gte('created_at', today.isoformat()).execute()
-            return data.count
+            return Database.get_attendance_stats()['today_attendance']
         except Exception as e:
-            print(f"Error getting today's attendance count: {str(e)}")
+            log.error('get_today_attendance_count.failed', error=str(e))
             return 0
 
     @staticmethod
     def get_total_attendance_count():
         """Get total count of attendance records."""
         try:
-            data = supabase.table('attendance').select('id', count='exact').execute()
-            return data.count
+            return Database.get_attendance_stats()['total_attendance']
         except Exception as e:
-            print(f"Error getting total attendance count: {str(e)}")
+            log.error('get_total_attendance_count.failed', error=str(e))
             return 0
 
     @staticmethod
@@ -455,7 +619,7 @@ class Database:
         try:
             # Get all active sessions
             now = datetime.now()
-            data = supabase.table('qr_tokens').select('session,created_at,expires_at').gte('expires_at', now.isoformat()).execute()
+            data = get_client().table('qr_tokens').select('session,created_at,expires_at').gte('expires_at', now.isoformat()).execute()
             
             events = []
             for record in data.data:
@@ -468,5 +632,8 @@ class Database:
             
             return events
         except Exception as e:
-            print(f"Error getting session events: {str(e)}")
+            log.error('get_session_events.failed', error=str(e))
             return []
+
+if METRICS_ENABLED:
+    metrics.instrument_class(Database, 'Database')
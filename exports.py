@@ -0,0 +1,84 @@
+import io
+import csv
+import zlib
+import zipfile
+
+CSV_HEADER = ['Student Name', 'Student ID', 'Time', 'Biometric Type',
+              'Location (Lat, Long)', 'Image Path']
+SESSION_HEADER = ['Session ID', 'Session Name']
+
+# Rows written between yields; keeps each chunk around a few KB
+ROWS_PER_CHUNK = 64
+
+
+def response_row(resp):
+    return [
+        resp.get('student_name', ''),
+        resp.get('enrollment_no', resp.get('student_id', '')),
+        resp.get('created_at', ''),
+        resp.get('biometric_type', ''),
+        f"{resp.get('latitude', '')}, {resp.get('longitude', '')}",
+        resp.get('image_path', '')
+    ]
+
+
+def iter_csv(rows, header):
+    """Yield CSV-encoded bytes for an iterable of row lists, a few rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_stream(chunks, level=6):
+    """Gzip a stream of byte chunks incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Unseekable sink that lets zipfile write into a generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def zip_stream(members):
+    """Stream a zip archive from (name, chunk iterator) pairs
+
+    zipfile falls back to data descriptors on an unseekable output, so no
+    member has to be held in memory to know its size up front.
+    """
+    sink = _StreamBuffer()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in members:
+            with archive.open(name, mode='w', force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,168 @@
+"""Server-side reverse geocoding behind a grid-quantized cache
+
+Coordinates are snapped to a grid of `cell_m`-metre cells and the provider
+is asked about the cell's centre, so every student in one room shares a
+single lookup. Cells are kept in a TTLCache: concurrent misses on the same
+cell wait for one provider call, and the least recently used cells are
+evicted past `maxsize`. Failed lookups are not cached.
+
+A provider is any object with reverse(lat, lng) returning an address
+string and raising GeocodeError on failure. NominatimProvider calls an
+OpenStreetMap Nominatim server, throttled to its one-request-per-second
+usage policy; a lookup that would wait longer than `max_wait` for its turn
+fails with GeocodeBusy instead of holding a request thread. OfflineProvider
+answers locally for tests and air-gapped installs.
+
+Cache misses can also be limited per client with a RateLimiter, so one
+client walking the grid cannot use up the provider's budget; lookups
+answered from the cache are never limited.
+"""
+import json
+import math
+import time
+import threading
+import collections
+
+from ttl_cache import TTLCache
+
+METRES_PER_DEGREE = math.pi * 6371008.8 / 180
+
+
+class GeocodeError(Exception):
+    """The provider could not resolve a location"""
+
+
+class GeocodeBusy(GeocodeError):
+    """No provider request can be made soon enough; try again later"""
+
+
+class RateLimiter:
+    """Token bucket per client: `rate` requests per second, bursts of up to `burst`"""
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, client):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[client] = (tokens - 1 if allowed else tokens, now)
+            if len(self._buckets) > self.max_clients:
+                # Forget the least recently seen client; it starts again with a full bucket
+                self._buckets.popitem(last=False)
+            return allowed
+
+
+class NominatimProvider:
+    def __init__(self, url='https://nominatim.openstreetmap.org/reverse', user_agent='ScanMark attendance',
+                 timeout=5.0, min_interval=1.0, max_wait=None):
+        self.url = url
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.max_wait = timeout if max_wait is None else max_wait
+        self._lock = threading.Lock()
+        self._next_request = 0.0
+
+    def reverse(self, lat, lng):
+        # Imported on first lookup to keep urllib's HTTP stack off the cold-start path
+        from urllib.parse import urlencode
+        from urllib.request import Request, urlopen
+
+        # Reserve the next free request slot under the lock, then wait for it outside
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request)
+            if slot - now > self.max_wait:
+                raise GeocodeBusy('Address lookups are queued too deep; try again shortly')
+            self._next_request = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+        query = urlencode({'format': 'jsonv2', 'lat': f'{lat:.6f}', 'lon': f'{lng:.6f}', 'addressdetails': 1})
+        request = Request(f'{self.url}?{query}', headers={'User-Agent': self.user_agent})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                data = json.load(response)
+        except Exception as e:
+            raise GeocodeError(f'Nominatim lookup failed: {e}')
+        if 'error' in data:
+            raise GeocodeError(data['error'])
+        return format_address(data)
+
+
+class OfflineProvider:
+    """Local stand-in that describes the coordinates instead of calling a service"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def reverse(self, lat, lng):
+        self.calls += 1
+        return f'Near {lat:.5f}, {lng:.5f}'
+
+
+PROVIDERS = {
+    'nominatim': NominatimProvider,
+    'offline': OfflineProvider,
+}
+
+
+def create_provider(name, **options):
+    """Build the provider selected by GEOCODER"""
+    if name not in PROVIDERS:
+        raise ValueError(f'Unknown geocoder: {name}')
+    return PROVIDERS[name](**options)
+
+
+def format_address(data):
+    """Short address from a Nominatim response, as the attendance form showed it"""
+    address = data.get('address') or {}
+    parts = [address.get('road'), address.get('suburb'), address.get('city') or address.get('town'),
+             address.get('state'), address.get('country')]
+    return ', '.join(part for part in parts if part) or data.get('display_name') or 'Location not available'
+
+
+class GeocodeCache:
+    """Reverse geocoding with one provider call per grid cell"""
+
+    def __init__(self, provider, cell_m=25.0, maxsize=10000, ttl=7 * 24 * 3600, limiter=None):
+        self.provider = provider
+        self.cell_m = cell_m
+        self.limiter = limiter
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl, name='geocode')
+
+    def cell(self, lat, lng):
+        """(row, column) of the grid cell containing a point"""
+        row = math.floor(lat * METRES_PER_DEGREE / self.cell_m)
+        # Columns are narrower in degrees away from the equator; size them at the row's latitude
+        center_lat = (row + 0.5) * self.cell_m / METRES_PER_DEGREE
+        width = self.cell_m / (METRES_PER_DEGREE * max(math.cos(math.radians(center_lat)), 1e-6))
+        return row, math.floor(lng / width)
+
+    def cell_center(self, row, column):
+        lat = (row + 0.5) * self.cell_m / METRES_PER_DEGREE
+        width = self.cell_m / (METRES_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        return lat, (column + 0.5) * width
+
+    def reverse(self, lat, lng, client=None):
+        """Address for a point; raises GeocodeError when the provider fails
+
+        `client` identifies the caller to the limiter, which is only
+        consulted when the cell has to be looked up.
+        """
+        cell = self.cell(lat, lng)
+
+        def load():
+            if self.limiter is not None and not self.limiter.allow(client):
+                raise GeocodeBusy('Too many address lookups; try again shortly')
+            return self.provider.reverse(*self.cell_center(*cell))
+        return self.cache.get_or_load(cell, load)
+
+    def stats(self):
+        return dict(self.cache.stats(), cell_m=self.cell_m)
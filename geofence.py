@@ -0,0 +1,203 @@
+"""Session geofences: a radius around a point, or a polygon
+
+A geofence is a plain dict stored with the session:
+
+    {'type': 'radius', 'center': [lat, lng], 'radius_m': 40, 'margin_m': 10}
+    {'type': 'polygon', 'points': [[lat, lng], ...], 'margin_m': 10}
+
+margin_m is slack for GPS error: a point that far outside the fence still
+counts as inside. contains() checks one submission in pure Python, so the
+submit path needs no NumPy. contains_many() checks whole arrays of points
+with NumPy for audits, and falls back to contains() per point when NumPy
+is not installed.
+
+Polygons are tested in a local equirectangular projection around their
+first vertex, which is exact enough at classroom and campus scale.
+"""
+import json
+import math
+
+EARTH_RADIUS_M = 6371008.8
+METRES_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+MAX_POLYGON_POINTS = 500
+
+
+def _coordinate(value, name, limit):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number')
+    if not math.isfinite(number) or abs(number) > limit:
+        raise ValueError(f'{name} must be between -{limit} and {limit}')
+    return number
+
+
+def _metres(value, name, allow_zero=False):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = math.nan
+    if not math.isfinite(number) or number < 0 or (number == 0 and not allow_zero):
+        raise ValueError(f'{name} must be a {"non-negative" if allow_zero else "positive"} number of metres')
+    return number
+
+
+def parse_geofence(form):
+    """Build a geofence from form fields, or None when none was given
+
+    Fields: geofence_polygon (JSON list of [lat, lng]) or geofence_lat,
+    geofence_lng and geofence_radius (metres); geofence_margin (metres) is
+    optional. Raises ValueError with a message for the admin.
+    """
+    polygon = (form.get('geofence_polygon') or '').strip()
+    radius = (form.get('geofence_radius') or '').strip()
+    if not polygon and not radius:
+        return None
+
+    margin = _metres(form.get('geofence_margin') or 0, 'Geofence margin', allow_zero=True)
+
+    if polygon:
+        try:
+            points = json.loads(polygon)
+        except ValueError:
+            raise ValueError('Geofence polygon must be a JSON list of [latitude, longitude] points')
+        if not isinstance(points, list) or not 3 <= len(points) <= MAX_POLYGON_POINTS:
+            raise ValueError(f'Geofence polygon needs 3 to {MAX_POLYGON_POINTS} points')
+        parsed = []
+        for point in points:
+            if not isinstance(point, list) or len(point) != 2:
+                raise ValueError('Geofence polygon points must be [latitude, longitude]')
+            parsed.append([_coordinate(point[0], 'Latitude', 90), _coordinate(point[1], 'Longitude', 180)])
+        return {'type': 'polygon', 'points': parsed, 'margin_m': margin}
+
+    radius_m = _metres(radius, 'Geofence radius')
+    center = [_coordinate(form.get('geofence_lat'), 'Latitude', 90),
+              _coordinate(form.get('geofence_lng'), 'Longitude', 180)]
+    return {'type': 'radius', 'center': center, 'radius_m': radius_m, 'margin_m': margin}
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres (haversine)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _projected_polygon(fence):
+    lat0, lng0 = fence['points'][0]
+    kx = METRES_PER_DEGREE * math.cos(math.radians(lat0))
+    vertices = [((lng - lng0) * kx, (lat - lat0) * METRES_PER_DEGREE) for lat, lng in fence['points']]
+    return lat0, lng0, kx, vertices
+
+
+def contains(fence, lat, lng):
+    """Whether one point is inside the fence (plus its margin)"""
+    margin = fence.get('margin_m', 0)
+    if fence['type'] == 'radius':
+        return distance_m(fence['center'][0], fence['center'][1], lat, lng) <= fence['radius_m'] + margin
+
+    lat0, lng0, kx, vertices = _projected_polygon(fence)
+    x, y = (lng - lng0) * kx, (lat - lat0) * METRES_PER_DEGREE
+    inside = False
+    nearest = math.inf
+    for (x1, y1), (x2, y2) in zip(vertices, vertices[1:] + vertices[:1]):
+        # Ray casting: count edges crossed by a ray going right from the point
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+        if margin:
+            dx, dy = x2 - x1, y2 - y1
+            length = dx * dx + dy * dy
+            t = 0.0 if not length else max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / length))
+            nearest = min(nearest, math.hypot(x - x1 - t * dx, y - y1 - t * dy))
+    return inside or nearest <= margin
+
+
+def contains_many(fence, lats, lngs):
+    """Vectorised contains() over sequences of coordinates
+
+    NaN coordinates are never inside. Returns a NumPy bool array, or a list
+    of bools when NumPy is not installed.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return [lat == lat and lng == lng and contains(fence, lat, lng) for lat, lng in zip(lats, lngs)]
+
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    margin = fence.get('margin_m', 0)
+    if fence['type'] == 'radius':
+        lat0, lng0 = np.radians(fence['center'])
+        phi = np.radians(lats)
+        a = (np.sin((phi - lat0) / 2) ** 2
+             + math.cos(lat0) * np.cos(phi) * np.sin((np.radians(lngs) - lng0) / 2) ** 2)
+        distance = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        return distance <= fence['radius_m'] + margin
+
+    lat0, lng0, kx, vertices = _projected_polygon(fence)
+    x = (lngs - lng0) * kx
+    y = (lats - lat0) * METRES_PER_DEGREE
+    inside = np.zeros(x.shape, dtype=bool)
+    # One pass per edge, each over every point at once
+    edges = list(zip(vertices, vertices[1:] + vertices[:1]))
+    for (x1, y1), (x2, y2) in edges:
+        if y1 != y2:
+            inside ^= ((y1 > y) != (y2 > y)) & (x < (x2 - x1) * (y - y1) / (y2 - y1) + x1)
+    if not margin:
+        return inside
+
+    # Only points outside the polygon need their distance to its edges
+    outside = np.flatnonzero(~inside)
+    x, y = x[outside], y[outside]
+    nearest = np.full(x.shape, np.inf)
+    for (x1, y1), (x2, y2) in edges:
+        dx, dy = x2 - x1, y2 - y1
+        length = dx * dx + dy * dy
+        t = np.zeros(x.shape) if not length else np.clip(((x - x1) * dx + (y - y1) * dy) / length, 0.0, 1.0)
+        nearest = np.minimum(nearest, (x - x1 - t * dx) ** 2 + (y - y1 - t * dy) ** 2)
+    inside[outside] = nearest <= margin * margin
+    return inside
+
+
+def _floats(values):
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    if np is not None:
+        # Fast path: every value is a number or numeric text, or missing
+        try:
+            return np.array([value if value not in (None, '') else 'nan' for value in values], dtype=float)
+        except (TypeError, ValueError):
+            pass
+    floats = []
+    for value in values:
+        try:
+            floats.append(float(value))
+        except (TypeError, ValueError):
+            floats.append(math.nan)
+    return np.array(floats) if np is not None else floats
+
+
+def audit(fence, responses):
+    """Re-check stored responses against a fence
+
+    Returns (outside, missing): the responses outside the fence, and those
+    without usable coordinates.
+    """
+    responses = list(responses)
+    if not responses:
+        return [], []
+    lats = _floats([response.get('latitude') for response in responses])
+    lngs = _floats([response.get('longitude') for response in responses])
+    inside = contains_many(fence, lats, lngs)
+    if hasattr(inside, 'nonzero'):
+        rejected = (~inside).nonzero()[0].tolist()
+    else:
+        rejected = [index for index, ok in enumerate(inside) if not ok]
+    outside, missing = [], []
+    for index in rejected:
+        lat, lng = lats[index], lngs[index]
+        (missing if lat != lat or lng != lng else outside).append(responses[index])
+    return outside, missing
@@ -1,38 +1,66 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, send_file
 import os
+# SCANMARK_PROFILE_STARTUP=1 (or =json) reports import and first-request
+# time by module; it has to be enabled before anything else is imported
+if os.getenv('SCANMARK_PROFILE_STARTUP'):
+    import startup_profile
+    startup_profile.enable()
+
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, send_file, stream_with_context, abort
 import secrets
+import hmac
 import hashlib
-import base64
-import segno
-from io import BytesIO
 from datetime import datetime
-from urllib.parse import urlencode
 from functools import wraps
-import csv
-from io import StringIO
-import json
-from pathlib import Path
+import itertools
+import threading
+import time
 import uuid
+from session_store import create_store, resolve_backend, DEFAULT_DATA_DIR
+import metrics
+import logs
+
+log = logs.get_logger('index')
 
 # Initialize Flask app
 app = Flask(__name__)
-app.secret_key = secrets.token_hex(16)
+# Workers must share the key or a login on one worker is rejected by the next
+app.secret_key = os.getenv('SECRET_KEY') or secrets.token_hex(16)
+
+# Request latency histograms and backend call accounting, served at /admin/metrics
+metrics_enabled = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+# Session store methods reported as backend calls
+STORE_METHODS = ('get_sessions', 'get_session', 'put_session', 'set_active', 'delete_session',
+                 'get_responses', 'iter_responses', 'get_responses_page', 'responses_after',
+                 'tail_position', 'add_response', 'add_responses')
 
 # Initialize storage
 if not hasattr(app, 'initialized'):
     # Default admin
     DEFAULT_PASSWORD = 'admin123'
+    # Hashed on first use (see get_admin_account) so cold starts don't run PBKDF2,
+    # unless ADMIN_PASSWORD_HASH supplies a hash from create_admin.py's hash_password
     DEFAULT_ADMIN = {
         'username': 'admin',
-        'password': DEFAULT_PASSWORD,
+        'password_hash': os.getenv('ADMIN_PASSWORD_HASH'),
         'created_at': datetime.now().isoformat()
     }
     
-    # Initialize persistent storage
+    # Initialize persistent storage. Sessions and responses live in a
+    # pluggable store: 'memory' is journaled to disk per process, 'sqlite'
+    # is shared by every gunicorn worker on the host. 'auto' picks sqlite
+    # when gunicorn forks several workers; memory with several is refused here.
+    store_backend = resolve_backend(os.getenv('SCANMARK_STORE', 'auto'))
+    store_options = {}
+    if store_backend == 'memory':
+        store_options = {
+            'snapshot_every': int(os.getenv('SCANMARK_SNAPSHOT_EVERY', '10000')),
+            'fsync': os.getenv('SCANMARK_JOURNAL_FSYNC', 'true').lower() == 'true'
+        }
+    store = create_store(store_backend, os.getenv('SCANMARK_DATA_DIR', DEFAULT_DATA_DIR), **store_options)
+    if metrics_enabled:
+        # Every store call is timed and counted against the request that made it
+        metrics.instrument_methods(store, f'{store_backend}-store', STORE_METHODS)
     app.config['ADMINS'] = {'admin': DEFAULT_ADMIN}
-    app.config['ACTIVE_SESSIONS'] = {'admin': {}}
-    app.config['SESSION_RESPONSES'] = {'admin': {}}
-    app.config['ATTENDANCE_RECORDS'] = []
     app.initialized = True
 
 # Configure Flask app
@@ -41,35 +69,185 @@ app.config['UPLOAD_FOLDER'] = '/tmp'  # Use /tmp for Vercel
 
 # No need to create directories in serverless environment
 
-# Helper functions for session data
+# Objects behind optional features are built on first use, like the QR and
+# export imports, so they stay off the cold-start path
+_lazy_lock = threading.Lock()
+
+# Rendered QR variants, keyed by the hash of form URL and render options
+qr_cache = None
+
+def get_qr_cache():
+    global qr_cache
+    if qr_cache is None:
+        with _lazy_lock:
+            if qr_cache is None:
+                from qr_service import QRCache
+                qr_cache = QRCache(max_bytes=int(os.getenv('QR_CACHE_MAX_BYTES', str(16 * 1024 * 1024))))
+    return qr_cache
+
+# Reverse geocoding for the attendance form, one provider lookup per grid cell
+geocoder = None
+
+def get_geocoder():
+    global geocoder
+    if geocoder is None:
+        with _lazy_lock:
+            if geocoder is None:
+                import geocoding
+                options = {}
+                if os.getenv('GEOCODER', 'nominatim') == 'nominatim' and os.getenv('GEOCODER_URL'):
+                    options['url'] = os.getenv('GEOCODER_URL')
+                geocoder = geocoding.GeocodeCache(
+                    geocoding.create_provider(os.getenv('GEOCODER', 'nominatim'), **options),
+                    cell_m=float(os.getenv('GEOCODE_CELL_METRES', '25')),
+                    maxsize=int(os.getenv('GEOCODE_CACHE_SIZE', '10000')),
+                    ttl=float(os.getenv('GEOCODE_TTL_SECONDS', str(7 * 24 * 3600))),
+                    # Lookups that miss the cache, per client address
+                    limiter=geocoding.RateLimiter(rate=float(os.getenv('GEOCODE_MISSES_PER_MINUTE', '20')) / 60,
+                                                  burst=int(os.getenv('GEOCODE_MISS_BURST', '5')))
+                )
+    return geocoder
+
+# Helper functions for session data. These are the only code that touches
+# the session store.
 def get_admin_sessions(admin_username):
-    return app.config['ACTIVE_SESSIONS'].get(admin_username, {})
+    return store.get_sessions(admin_username)
 
-def get_session_responses(admin_username, session_id):
-    return app.config['SESSION_RESPONSES'].get(admin_username, {}).get(session_id, [])
+def get_admin_session(admin_username, session_id):
+    return store.get_session(admin_username, session_id)
+
+def get_session_responses_page(admin_username, session_id, cursor=None, limit=50):
+    return store.get_responses_page(admin_username, session_id, cursor=cursor, limit=limit)
+
+def iter_session_responses(admin_username, session_id):
+    return store.iter_responses(admin_username, session_id)
+
+def get_responses_after(admin_username, session_id, position=0, limit=200):
+    return store.responses_after(admin_username, session_id, position, limit)
+
+def get_tail_position(admin_username, session_id):
+    return store.tail_position(admin_username, session_id)
 
 def add_session_response(admin_username, session_id, response):
-    if admin_username not in app.config['SESSION_RESPONSES']:
-        app.config['SESSION_RESPONSES'][admin_username] = {}
-    if session_id not in app.config['SESSION_RESPONSES'][admin_username]:
-        app.config['SESSION_RESPONSES'][admin_username][session_id] = []
-    app.config['SESSION_RESPONSES'][admin_username][session_id].append(response)
-
-def hash_password(password):
-    salt = os.urandom(32)
-    key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 100000)
-    return base64.b64encode(salt + key).decode('utf-8')
-
-def verify_password(password, hashed):
-    decoded = base64.b64decode(hashed.encode('utf-8'))
-    salt, key = decoded[:32], decoded[32:]
-    new_key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 100000)
-    return new_key == key
+    """Store a response; returns False if this enrollment number already responded"""
+    added = store.add_response(admin_username, session_id, response)
+    if added:
+        notify_listeners()
+    return added
+
+def add_session_responses(items):
+    """Store a batch of (admin_username, session_id, response); one result per item"""
+    results = store.add_responses(items)
+    if any(results):
+        notify_listeners()
+    return results
+
+def save_admin_session(admin_username, session_id, session_data):
+    store.put_session(admin_username, session_id, session_data)
+    notify_listeners()
+
+def set_session_active(admin_username, session_id, active):
+    updated = store.set_active(admin_username, session_id, active)
+    notify_listeners()
+    return updated
+
+def remove_admin_session(admin_username, session_id):
+    removed = store.delete_session(admin_username, session_id)
+    notify_listeners()
+    return removed
+
+# Live updates for the dashboard and response pages. Server-Sent Events
+# hold a request open per browser tab, which only an async worker
+# (gunicorn -k gevent) can afford, so they are opt-in; otherwise pages poll
+# the /admin/updates routes every LIVE_CLIENT_POLL_SECONDS.
+live_events_enabled = os.getenv('LIVE_EVENTS', 'false').lower() == 'true'
+app.jinja_env.globals.update(
+    live_events=live_events_enabled,
+    live_poll_ms=int(float(os.getenv('LIVE_CLIENT_POLL_SECONDS', '10')) * 1000)
+)
+
+# The hub polls the store, so writes from other workers are picked up too
+event_hub = None
+
+def get_event_hub():
+    global event_hub
+    if event_hub is None:
+        with _lazy_lock:
+            if event_hub is None:
+                from live_events import EventHub
+                event_hub = EventHub(
+                    get_responses_after, get_tail_position, get_admin_session, get_admin_sessions,
+                    poll_interval=float(os.getenv('LIVE_POLL_SECONDS', '1.0')),
+                    heartbeat=float(os.getenv('LIVE_HEARTBEAT_SECONDS', '15'))
+                )
+    return event_hub
+
+def notify_listeners():
+    # Before the hub exists nothing can be listening
+    if event_hub is not None:
+        event_hub.notify()
+
+# PBKDF2 runs on its own small pool so a burst of logins cannot occupy
+# the threads that serve attendance submissions
+password_hasher = None
+
+def get_password_hasher():
+    global password_hasher
+    if password_hasher is None:
+        with _lazy_lock:
+            if password_hasher is None:
+                from passwords import PasswordHasher
+                password_hasher = PasswordHasher(
+                    max_workers=int(os.getenv('PASSWORD_HASH_WORKERS', '2')),
+                    max_queue=int(os.getenv('PASSWORD_HASH_QUEUE', '32')),
+                    timeout=float(os.getenv('PASSWORD_HASH_TIMEOUT', '5'))
+                )
+    return password_hasher
+
+_default_admin_lock = threading.Lock()
+
+def get_admin_account(username):
+    """Admin record with its password hash, hashing the default password on first use"""
+    admin = app.config['ADMINS'].get(username)
+    if admin is not None and not admin.get('password_hash'):
+        with _default_admin_lock:
+            if not admin.get('password_hash'):
+                # Salt derived from the secret key so every worker computes the
+                # same hash and a session credential is valid on all of them
+                salt = hashlib.sha256(f'{app.secret_key}\0default-admin\0{username}'.encode('utf-8')).digest()
+                admin['password_hash'] = get_password_hasher().hash(DEFAULT_PASSWORD, salt)
+    return admin
+
+def admin_credential(username):
+    # Through get_admin_account so a worker that has not served a login yet
+    # derives the default admin's hash (the same on every worker) instead of
+    # rejecting cookies issued by another worker
+    from passwords import session_credential
+    admin = get_admin_account(username)
+    if admin is None or not admin.get('password_hash'):
+        return None
+    return session_credential(app.secret_key, username, admin['password_hash'])
+
+def is_logged_in():
+    # The signed session carries an HMAC of the password hash, so this is
+    # one cheap comparison instead of re-hashing the password
+    from passwords import HasherBusyError
+    username = session.get('admin_username')
+    try:
+        expected = admin_credential(username) if username else None
+    except HasherBusyError:
+        # Only the first check in a fresh worker hashes; keep the session and ask to retry
+        abort(503)
+    if expected is None or not hmac.compare_digest(session.get('credential', ''), expected):
+        session.pop('admin_username', None)
+        session.pop('credential', None)
+        return False
+    return True
 
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'admin_username' not in session:
+        if not is_logged_in():
             flash('Please log in first.', 'error')
             return redirect(url_for('admin_login'))
         return f(*args, **kwargs)
@@ -82,6 +260,7 @@ def index():
 @app.route('/admin/register', methods=['GET', 'POST'])
 def admin_register():
     if request.method == 'POST':
+        from passwords import HasherBusyError
         username = request.form.get('username')
         password = request.form.get('password')
         
@@ -93,18 +272,17 @@ def admin_register():
             flash('Username already exists.', 'error')
             return redirect(url_for('admin_register'))
             
+        try:
+            password_hash = get_password_hasher().hash(password)
+        except HasherBusyError:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return render_template('admin/register.html'), 503
+            
         app.config['ADMINS'][username] = {
-            'password_hash': hash_password(password),
+            'password_hash': password_hash,
             'created_at': datetime.now().isoformat()
         }
         
-        # Save credentials to file
-        save_credentials()
-        
-        # Initialize admin's session storage
-        app.config['ACTIVE_SESSIONS'][username] = {}
-        app.config['SESSION_RESPONSES'][username] = {}
-        
         flash('Registration successful! Please log in.', 'success')
         return redirect(url_for('admin_login'))
         
@@ -113,11 +291,20 @@ def admin_register():
 @app.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
     if request.method == 'POST':
+        from passwords import HasherBusyError
         username = request.form.get('username')
         password = request.form.get('password')
         
-        if username in app.config['ADMINS'] and password == app.config['ADMINS'][username]['password']:
+        try:
+            admin = get_admin_account(username) if username and password else None
+            valid = admin is not None and get_password_hasher().verify(password, admin['password_hash'])
+        except HasherBusyError:
+            flash('Too many sign-ins right now. Please try again in a moment.', 'error')
+            return render_template('admin/login.html'), 503
+            
+        if valid:
             session['admin_username'] = username
+            session['credential'] = admin_credential(username)
             return redirect(url_for('admin_dashboard'))
             
         flash('Invalid username or password.', 'error')
@@ -127,6 +314,7 @@ def admin_login():
 @app.route('/admin/logout')
 def admin_logout():
     session.pop('admin_username', None)
+    session.pop('credential', None)
     flash('Logged out successfully.', 'success')
     return redirect(url_for('admin_login'))
 
@@ -136,13 +324,10 @@ def admin_dashboard():
     admin_username = session['admin_username']
     active_sessions = []
     
-    # Get only this admin's sessions
-    for session_id, session_data in app.config['ACTIVE_SESSIONS'][admin_username].items():
-        # Regenerate QR if not present
-        if 'qr_code' not in session_data or not session_data['qr_code']:
-            qr_code, form_url = generate_session_qr(admin_username, session_id, session_data)
-            session_data['qr_code'] = qr_code
-            session_data['form_url'] = form_url
+    # Get only this admin's sessions; QR images are fetched by URL and cached by the browser
+    for session_id, session_data in get_admin_sessions(admin_username).items():
+        if not session_data.get('form_url'):
+            _, session_data['form_url'] = generate_session_qr(admin_username, session_id, session_data)
             
         active_sessions.append({
             'id': session_id,
@@ -152,7 +337,8 @@ def admin_dashboard():
             'semester': session_data['semester'],
             'created_at': session_data['created_at'],
             'active': session_data['active'],
-            'qr_code': session_data['qr_code'],
+            'qr_url': url_for('session_qr', session_id=session_id, fmt='png', size='small'),
+            'projector_url': url_for('session_qr', session_id=session_id, fmt='svg'),
             'form_url': session_data['form_url']
         })
         
@@ -169,6 +355,11 @@ def generate_qr():
     
     if not all([name, faculty, branch, semester]):
         return jsonify({'error': 'All fields are required'}), 400
+    import geofence
+    try:
+        fence = geofence.parse_geofence(request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
         
     session_id = secrets.token_urlsafe(16)
     session_data = {
@@ -176,35 +367,39 @@ def generate_qr():
         'faculty': faculty,
         'branch': branch,
         'semester': semester,
-        'created_at': datetime.now(),
+        'created_at': datetime.now().isoformat(),
         'active': True
     }
+    if fence:
+        session_data['geofence'] = fence
     
-    qr_code, form_url = generate_session_qr(admin_username, session_id, session_data)
-    if not qr_code:
+    qr_url, form_url = generate_session_qr(admin_username, session_id, session_data)
+    if not qr_url:
         return jsonify({'error': 'Failed to generate QR code'}), 500
         
-    session_data['qr_code'] = qr_code
     session_data['form_url'] = form_url
     
     # Store in admin's sessions
-    if admin_username not in app.config['ACTIVE_SESSIONS']:
-        app.config['ACTIVE_SESSIONS'][admin_username] = {}
-    app.config['ACTIVE_SESSIONS'][admin_username][session_id] = session_data
+    save_admin_session(admin_username, session_id, session_data)
     
     return jsonify({
         'success': True,
+        # Same fields as the dashboard's 'session' events, so the row can be drawn at once
         'session': {
             'id': session_id,
-            'qr_code': qr_code,
+            'qr_url': qr_url,
             'form_url': form_url,
-            'name': name
+            'name': name,
+            'faculty': faculty,
+            'branch': branch,
+            'semester': semester,
+            'active': True
         }
     })
 
 @app.route('/create_session', methods=['POST'])
 def create_session():
-    if 'admin_username' not in session:
+    if not is_logged_in():
         return jsonify({'error': 'Not logged in'}), 401
     
     admin_username = session['admin_username']
@@ -217,6 +412,11 @@ def create_session():
     
     if not all([session_name, faculty_name, branch, semester]):
         return jsonify({'error': 'All fields are required'}), 400
+    import geofence
+    try:
+        fence = geofence.parse_geofence(request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
         # Generate unique session ID
@@ -229,78 +429,77 @@ def create_session():
             'branch': branch,
             'semester': semester,
             'created_at': datetime.now().isoformat(),
-            'qr_code': None,
+            'active': True,
             'form_url': None
         }
+        if fence:
+            session_data['geofence'] = fence
         
-        # Ensure static directory exists
-        os.makedirs('static', exist_ok=True)
-        
-        # Generate QR code
-        form_url = url_for('attendance_form', admin=admin_username, session=session_id, _external=True)
-        qr = segno.make(form_url)
-        
-        # Save QR code with unique filename
-        qr_filename = f"qr_{admin_username}_{session_id}.png"
-        qr_path = os.path.join('static', qr_filename)
-        qr.save(qr_path, scale=10)
+        # QR images are rendered on demand by session_qr
+        qr_url, form_url = generate_session_qr(admin_username, session_id, session_data)
+        if not qr_url:
+            return jsonify({'error': 'Failed to generate QR code'}), 500
         
         # Update session data
-        session_data['qr_code'] = qr_filename
         session_data['form_url'] = form_url
         
-        # Initialize session storage if needed
-        if admin_username not in app.config['ACTIVE_SESSIONS']:
-            app.config['ACTIVE_SESSIONS'][admin_username] = {}
-            
-        if admin_username not in app.config['SESSION_RESPONSES']:
-            app.config['SESSION_RESPONSES'][admin_username] = {}
-            
         # Store session data
-        app.config['ACTIVE_SESSIONS'][admin_username][session_id] = session_data
-        app.config['SESSION_RESPONSES'][admin_username][session_id] = []
+        save_admin_session(admin_username, session_id, session_data)
         
         return jsonify({
             'success': True,
             'message': 'Session created successfully',
             'session_id': session_id,
-            'qr_code': qr_filename,
+            'qr_url': qr_url,
             'form_url': form_url
         })
         
-    except Exception as e:
-        app.logger.error(f"Error creating session: {str(e)}")
+    except Exception:
+        log.exception('session.create_failed', username=admin_username)
         return jsonify({'error': 'Failed to generate QR code'}), 500
 
 def generate_session_qr(admin_username, session_id, session_data):
-    """Generate QR code for a session with pre-filled form fields"""
-    if admin_username not in app.config['SESSION_RESPONSES']:
-        app.config['SESSION_RESPONSES'][admin_username] = {}
-    
-    if session_id not in app.config['SESSION_RESPONSES'][admin_username]:
-        app.config['SESSION_RESPONSES'][admin_username][session_id] = []
-    
+    """Return (qr_url, form_url) for a session
+
+    The image itself is rendered lazily by session_qr and cached there.
+    """
     try:
         # Generate attendance form URL with proper parameters
         base_url = request.host_url.rstrip('/')
         form_url = f"{base_url}/submit-attendance?admin={admin_username}&session_id={session_id}"
-        
-        # Generate QR code
-        qr = segno.make(form_url)
-        
-        # Save QR code to a BytesIO object
-        qr_io = BytesIO()
-        qr.save(qr_io, kind='png', scale=10)
-        qr_io.seek(0)
-        
-        # Convert to base64
-        qr_base64 = base64.b64encode(qr_io.getvalue()).decode()
-        
-        return qr_base64, form_url
+        return url_for('session_qr', session_id=session_id, fmt='png', size='small'), form_url
     except Exception as e:
-        print(f"Error generating QR code: {e}")
+        log.error('qr.generate_failed', session_id=session_id, error=str(e))
         return None, None
 
+@app.route('/admin/qr/<session_id>.<fmt>')
+@login_required
+def session_qr(session_id, fmt):
+    """Serve a session QR as png, svg or txt (terminal) at ?size=small|medium|print"""
+    admin_username = session['admin_username']
+    session_data = get_admin_session(admin_username, session_id)
+    if session_data is None:
+        return "Session not found", 404
+
+    form_url = session_data.get('form_url')
+    if not form_url:
+        _, form_url = generate_session_qr(admin_username, session_id, session_data)
+
+    size = request.args.get('size', 'medium')
+    try:
+        digest, image, mimetype = get_qr_cache().render(form_url, fmt=fmt, size=size)
+    except ValueError as e:
+        return str(e), 400
+    except Exception as e:
+        log.error('qr.render_failed', session_id=session_id, fmt=fmt, error=str(e))
+        return "Failed to generate QR code", 500
+
+    # The image only depends on the form URL, so browsers may keep it indefinitely
+    response = Response(image, content_type=mimetype)
+    response.set_etag(digest)
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response.make_conditional(request)
+
 @app.route('/submit-attendance', methods=['GET', 'POST'])
 def submit_attendance():
     if request.method == 'GET':
@@ -309,9 +508,8 @@ def submit_attendance():
         admin_username = request.args.get('admin')
         
         if admin_username and session_id:
-            active_sessions = get_admin_sessions(admin_username)
-            if session_id in active_sessions:
-                session_data = active_sessions[session_id]
+            session_data = get_admin_session(admin_username, session_id)
+            if session_data is not None:
                 # Add session name if not present
                 if 'name' not in session_data:
                     session_data['name'] = f'Session {session_id[:8]}'
@@ -326,167 +524,315 @@ def submit_attendance():
             return "Invalid parameters", 400
             
     elif request.method == 'POST':
+        from attendance import build_attendance_record, SubmissionError, SUCCESS_MESSAGE, DUPLICATE_MESSAGE, ERROR_MESSAGE
         try:
-            # Get form data
-            enrollment_no = request.form.get('enrollment_no')
-            student_name = request.form.get('student_name')
-            session_id = request.form.get('session_id')
-            admin_username = request.form.get('admin')
-            latitude = request.form.get('latitude')
-            longitude = request.form.get('longitude')
-            address = request.form.get('address')
-            biometric_verified = request.form.get('biometric_verified')
-            
-            print(f"Received attendance data: {request.form}")
-            
-            # Validate required fields
-            if not all([enrollment_no, student_name, session_id, admin_username]):
-                return jsonify({
-                    'success': False,
-                    'message': 'Please fill in all required fields'
-                }), 400
-            
-            # Validate location
-            if not all([latitude, longitude, address]):
-                return jsonify({
-                    'success': False,
-                    'message': 'Location information is required'
-                }), 400
+            # Every scan passes here, so this is sampled and leaves out the captured image
+            log.info('attendance.received', sampled=True, session_id=request.form.get('session_id'),
+                     admin=request.form.get('admin'), enrollment_no=request.form.get('enrollment_no'))
             
-            # Validate face verification
-            if biometric_verified != 'true':
+            # Validation is shared with the ASGI ingestion endpoint (asgi.py)
+            try:
+                attendance_data = build_attendance_record(request.form, get_admin_session)
+            except SubmissionError as e:
                 return jsonify({
                     'success': False,
-                    'message': 'Face verification is required'
-                }), 400
+                    'message': e.message
+                }), e.status
             
-            # Check if session exists and is active
-            active_sessions = get_admin_sessions(admin_username)
-            if session_id not in active_sessions:
+            # Store attendance data, rejecting repeat submissions from the same student
+            if not add_session_response(attendance_data['admin_username'], attendance_data['session_id'], attendance_data):
                 return jsonify({
                     'success': False,
-                    'message': 'Invalid or expired session'
-                }), 400
-                
-            session_data = active_sessions[session_id]
-            if not session_data.get('active', False):
-                return jsonify({
-                    'success': False,
-                    'message': 'This session is no longer active'
-                }), 400
-            
-            # Create attendance record with proper address
-            attendance_data = {
-                'enrollment_no': enrollment_no,
-                'student_name': student_name,
-                'session_id': session_id,
-                'admin_username': admin_username,
-                'created_at': datetime.now().isoformat(),
-                'latitude': latitude,
-                'longitude': longitude,
-                'address': address if address else 'Location not available',
-                'biometric_verified': True,
-                'biometric_type': 'Face ID'
-            }
-            
-            # Store attendance data
-            add_session_response(admin_username, session_id, attendance_data)
+                    'message': DUPLICATE_MESSAGE
+                }), 409
             
             return jsonify({
                 'success': True,
-                'message': 'Attendance marked successfully!'
+                'message': SUCCESS_MESSAGE
             })
                 
-        except Exception as e:
-            print(f"Error in submit_attendance: {str(e)}")
+        except Exception:
+            log.exception('attendance.failed')
             return jsonify({
                 'success': False,
-                'message': 'An error occurred. Please try again.'
+                'message': ERROR_MESSAGE
             }), 500
+
 @app.route('/admin/view-responses/<session_id>')
 @login_required
 def view_responses(session_id):
     admin_username = session.get('admin_username')
-    responses = app.config['SESSION_RESPONSES'].get(admin_username, {}).get(session_id, [])
-    session_data = app.config['ACTIVE_SESSIONS'].get(admin_username, {}).get(session_id, {})
+    cursor = request.args.get('cursor') or None
+    # Read before the page so nothing lands between the two; the page
+    # skips rows it already shows by enrollment number
+    tail_position = get_tail_position(admin_username, session_id)
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+    except ValueError:
+        return "Invalid page size", 400
+    try:
+        responses, next_cursor = get_session_responses_page(admin_username, session_id, cursor=cursor, limit=limit)
+    except ValueError:
+        return "Invalid page cursor", 400
+    session_data = get_admin_session(admin_username, session_id) or {}
+    # Only the last page grows, so only it follows the live feed
+    live_after = tail_position if session_data and next_cursor is None else None
     
-    # Generate QR code file path
-    qr_path = None
-    if session_data:  # Only try to handle QR if we have session data
-        qr_path = f'static/qr_codes/{session_id}.png'
-        if not os.path.exists(qr_path):
-            # Generate QR code
-            qr_code, _ = generate_session_qr(admin_username, session_id, session_data)
-            if qr_code:
-                try:
-                    qr_data = base64.b64decode(qr_code.split(',')[1])
-                    os.makedirs('static/qr_codes', exist_ok=True)
-                    with open(qr_path, 'wb') as f:
-                        f.write(qr_data)
-                except Exception as e:
-                    print(f"Error saving QR code: {str(e)}")
-                    qr_path = None
+    # QR images are served (and cached) by session_qr: SVG on screen, high-res PNG for print
+    qr_url = url_for('session_qr', session_id=session_id, fmt='svg') if session_data else None
+    qr_print_url = url_for('session_qr', session_id=session_id, fmt='png', size='print') if session_data else None
     
     return render_template('admin/view_responses.html', 
                          responses=responses,
+                         live_after=live_after,
                          session=session_data,
                          session_id=session_id,
-                         qr_path=qr_path)
+                         cursor=cursor,
+                         next_cursor=next_cursor,
+                         limit=limit,
+                         qr_url=qr_url,
+                         qr_print_url=qr_print_url)
+
+def event_stream(key):
+    """Server-Sent Events response for one event hub channel"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('after')
+    if last_event_id is not None and not last_event_id.isdigit():
+        last_event_id = None
+    return Response(
+        stream_with_context(get_event_hub().listen(key, last_event_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/admin/events/<session_id>')
+@login_required
+def session_events(session_id):
+    """New responses and state changes for one session"""
+    if not live_events_enabled:
+        return jsonify({'error': 'Live events are disabled (LIVE_EVENTS=false)'}), 404
+    admin_username = session['admin_username']
+    if get_admin_session(admin_username, session_id) is None:
+        return jsonify({'error': 'Session not found'}), 404
+    return event_stream(('session', admin_username, session_id))
+
+@app.route('/admin/events')
+@login_required
+def dashboard_events():
+    """Sessions created, toggled or deleted by this admin"""
+    if not live_events_enabled:
+        return jsonify({'error': 'Live events are disabled (LIVE_EVENTS=false)'}), 404
+    return event_stream(('admin', session['admin_username']))
+
+@app.route('/admin/updates/<session_id>')
+@login_required
+def session_updates(session_id):
+    """Polling counterpart of session_events: responses after ?after= and the session state"""
+    admin_username = session['admin_username']
+    session_data = get_admin_session(admin_username, session_id)
+    if session_data is None:
+        return jsonify({'error': 'Session not found'}), 404
+    after = request.args.get('after', '0')
+    position = int(after) if after.isdigit() else 0
+    items = get_responses_after(admin_username, session_id, position)
+    return jsonify({
+        'responses': [response for _, response in items],
+        'position': items[-1][0] if items else position,
+        'active': bool(session_data.get('active', False))
+    })
+
+@app.route('/admin/updates')
+@login_required
+def dashboard_updates():
+    """Polling counterpart of dashboard_events: this admin's sessions"""
+    return jsonify({'sessions': list(get_event_hub().session_list(session['admin_username']).values())})
+
+def wants_gzip():
+    return request.args.get('gzip') in ('1', 'true')
+
+def stream_download(chunks, filename, mimetype):
+    """Stream an export, gzip-compressed when ?gzip=1"""
+    if wants_gzip():
+        from exports import gzip_stream
+        chunks = gzip_stream(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
 
 @app.route('/admin/download-responses/<session_id>')
 @login_required
 def download_responses(session_id):
+    # Export helpers are imported on first use to keep them off the cold-start path
+    from exports import CSV_HEADER, response_row, iter_csv
     admin_username = session.get('admin_username')
-    responses = app.config['SESSION_RESPONSES'].get(admin_username, {}).get(session_id, [])
+    responses = iter_session_responses(admin_username, session_id)
     
-    if not responses:
+    first = next(responses, None)
+    if first is None:
         flash('No responses found for this session.', 'warning')
         return redirect(url_for('view_responses', session_id=session_id))
         
-    # Create CSV content
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Student Name', 'Student ID', 'Time', 'Biometric Type', 
-                    'Location (Lat, Long)', 'Image Path'])
-    
-    for resp in responses:
-        writer.writerow([
-            resp.get('student_name', ''),
-            resp.get('student_id', ''),
-            resp.get('created_at', ''),
-            resp.get('biometric_type', ''),
-            f"{resp.get('latitude', '')}, {resp.get('longitude', '')}",
-            resp.get('image_path', '')
-        ])
-    
-    # Create response
-    output.seek(0)
-    return Response(
-        output.getvalue(),
-        mimetype='text/csv',
-        headers={
-            'Content-Disposition': f'attachment; filename=responses_{session_id}.csv',
-            'Content-Type': 'text/csv; charset=utf-8'
-        }
+    # Rows are written to the client as they are read, so memory stays flat
+    rows = (response_row(resp) for resp in itertools.chain([first], responses))
+    return stream_download(iter_csv(rows, CSV_HEADER), f'responses_{session_id}.csv', 'text/csv')
+
+@app.route('/admin/export')
+@login_required
+def export_responses():
+    """Export every session of the admin, optionally limited to a date range or one student
+
+    Query parameters: start / end (YYYY-MM-DD, inclusive, on session
+    creation date), enrollment_no, format=csv|zip and gzip=1 (csv only).
+    """
+    from exports import CSV_HEADER, SESSION_HEADER, response_row, iter_csv, zip_stream
+    admin_username = session['admin_username']
+    start = request.args.get('start', '')
+    end = request.args.get('end', '')
+    enrollment_no = request.args.get('enrollment_no', '').strip().upper()
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'zip'):
+        return jsonify({'error': 'format must be csv or zip'}), 400
+
+    selected = []
+    for session_id, session_data in get_admin_sessions(admin_username).items():
+        created = str(session_data.get('created_at', ''))[:10]
+        if (start and created < start) or (end and created > end):
+            continue
+        selected.append((session_id, session_data.get('name', session_id)))
+
+    def session_responses(session_id):
+        for resp in iter_session_responses(admin_username, session_id):
+            if enrollment_no and str(resp.get('enrollment_no', '')).strip().upper() != enrollment_no:
+                continue
+            yield resp
+
+    if export_format == 'zip':
+        members = (
+            (f'{name}_{session_id}.csv',
+             iter_csv((response_row(resp) for resp in session_responses(session_id)), CSV_HEADER))
+            for session_id, name in selected
+        )
+        return Response(
+            stream_with_context(zip_stream(members)),
+            mimetype='application/zip',
+            headers={'Content-Disposition': 'attachment; filename=responses_export.zip'}
+        )
+
+    rows = (
+        [session_id, name] + response_row(resp)
+        for session_id, name in selected
+        for resp in session_responses(session_id)
     )
+    return stream_download(iter_csv(rows, SESSION_HEADER + CSV_HEADER), 'responses_export.csv', 'text/csv')
 
 @app.route('/admin/toggle-session/<session_id>', methods=['POST'])
 @login_required
 def toggle_session(session_id):
     admin_username = session['admin_username']
-    if session_id in app.config['ACTIVE_SESSIONS'][admin_username]:
-        app.config['ACTIVE_SESSIONS'][admin_username][session_id]['active'] = not app.config['ACTIVE_SESSIONS'][admin_username][session_id]['active']
-        return jsonify({'success': True, 'active': app.config['ACTIVE_SESSIONS'][admin_username][session_id]['active']})
+    session_data = get_admin_session(admin_username, session_id)
+    if session_data is not None:
+        active = not session_data.get('active', False)
+        set_session_active(admin_username, session_id, active)
+        return jsonify({'success': True, 'active': active})
     return jsonify({'error': 'Session not found'}), 404
 
+@app.route('/admin/session-geofence/<session_id>', methods=['POST'])
+@login_required
+def set_session_geofence(session_id):
+    """Set or (with no geofence fields) remove a session's geofence"""
+    admin_username = session['admin_username']
+    session_data = get_admin_session(admin_username, session_id)
+    if session_data is None:
+        return jsonify({'error': 'Session not found'}), 404
+    import geofence
+    try:
+        fence = geofence.parse_geofence(request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    session_data = dict(session_data)
+    if fence:
+        session_data['geofence'] = fence
+    else:
+        session_data.pop('geofence', None)
+    save_admin_session(admin_username, session_id, session_data)
+    return jsonify({'success': True, 'geofence': fence})
+
+def audit_session(admin_username, session_id, session_data):
+    import geofence
+    fence = session_data.get('geofence')
+    if not fence:
+        return {'session_id': session_id, 'name': session_data.get('name'), 'geofence': None}
+    responses = list(iter_session_responses(admin_username, session_id))
+    outside, missing = geofence.audit(fence, responses)
+    return {
+        'session_id': session_id,
+        'name': session_data.get('name'),
+        'geofence': fence,
+        'checked': len(responses),
+        'outside': [{key: resp.get(key) for key in ('enrollment_no', 'student_name', 'latitude', 'longitude', 'created_at')}
+                    for resp in outside],
+        'missing_location': [resp.get('enrollment_no') for resp in missing]
+    }
+
+@app.route('/admin/geofence-audit/<session_id>')
+@login_required
+def geofence_audit(session_id):
+    admin_username = session['admin_username']
+    session_data = get_admin_session(admin_username, session_id)
+    if session_data is None:
+        return jsonify({'error': 'Session not found'}), 404
+    started = time.perf_counter()
+    result = audit_session(admin_username, session_id, session_data)
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify(result)
+
+@app.route('/admin/geofence-audit')
+@login_required
+def term_geofence_audit():
+    """Audit every fenced session in a term: filter by created date range, semester and branch"""
+    admin_username = session['admin_username']
+    start = request.args.get('start', '')
+    end = request.args.get('end', '')
+    semester = request.args.get('semester', '')
+    branch = request.args.get('branch', '')
+
+    started = time.perf_counter()
+    sessions = []
+    for session_id, session_data in get_admin_sessions(admin_username).items():
+        created = str(session_data.get('created_at', ''))[:10]
+        if (start and created < start) or (end and created > end):
+            continue
+        if (semester and str(session_data.get('semester')) != semester) or (branch and session_data.get('branch') != branch):
+            continue
+        sessions.append(audit_session(admin_username, session_id, session_data))
+    return jsonify({
+        'sessions': sessions,
+        'checked': sum(result.get('checked', 0) for result in sessions),
+        'outside': sum(len(result.get('outside', [])) for result in sessions),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+
+@app.route('/admin/anomalies/<session_id>')
+@login_required
+def session_anomalies(session_id):
+    """Flag possible proxy attendance: shared devices and spots, bursts and outliers"""
+    admin_username = session['admin_username']
+    if get_admin_session(admin_username, session_id) is None:
+        return jsonify({'error': 'Session not found'}), 404
+    import anomalies
+    started = time.perf_counter()
+    result = anomalies.scan(iter_session_responses(admin_username, session_id))
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify(result)
+
 @app.route('/admin/delete-session/<session_id>', methods=['POST'])
 @login_required
 def delete_session(session_id):
     admin_username = session['admin_username']
-    if session_id in app.config['ACTIVE_SESSIONS'][admin_username]:
-        del app.config['ACTIVE_SESSIONS'][admin_username][session_id]
-        if session_id in app.config['SESSION_RESPONSES'][admin_username]:
-            del app.config['SESSION_RESPONSES'][admin_username][session_id]
+    if remove_admin_session(admin_username, session_id):
         return jsonify({'success': True})
     return jsonify({'error': 'Session not found'}), 404
 
@@ -496,7 +842,7 @@ def serve_qr(filename):
         # Get session details from filename
         session_id = filename.split('.')[0]  # Remove .png extension
         admin_username = session.get('admin_username')
-        session_data = app.config['ACTIVE_SESSIONS'].get(admin_username, {}).get(session_id, {})
+        session_data = get_admin_session(admin_username, session_id) or {}
         
         # Set custom filename with session details
         custom_filename = f"{session_data.get('name', 'session')}_qr.png"
@@ -508,7 +854,7 @@ def serve_qr(filename):
             download_name=custom_filename
         )
     except Exception as e:
-        print(f"Error serving QR code: {str(e)}")
+        log.error('qr.serve_failed', filename=filename, error=str(e))
         return "QR code not found", 404
 
 @app.route('/static/uploads/<path:filename>')
@@ -516,8 +862,43 @@ def serve_image(filename):
     try:
         return send_file(f'static/uploads/{filename}', mimetype='image/jpeg')
     except Exception as e:
-        print(f"Error serving image: {str(e)}")
+        log.error('image.serve_failed', filename=filename, error=str(e))
         return "Image not found", 404
 
+@app.route('/geocode')
+def geocode():
+    # Public: the attendance form calls this before the student has submitted anything
+    try:
+        lat = float(request.args.get('lat', ''))
+        lng = float(request.args.get('lng', ''))
+    except ValueError:
+        return jsonify({'error': 'lat and lng must be numbers'}), 400
+    if not (abs(lat) <= 90 and abs(lng) <= 180):
+        return jsonify({'error': 'lat and lng are out of range'}), 400
+    import geocoding
+    try:
+        address = get_geocoder().reverse(lat, lng, client=request.remote_addr)
+    except geocoding.GeocodeBusy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    except geocoding.GeocodeError as e:
+        log.warning('geocode.failed', error=str(e))
+        return jsonify({'error': 'Address lookup failed'}), 502
+    return jsonify({'address': address})
+
+@app.route('/admin/metrics')
+def metrics_endpoint():
+    # Admins only; a scraper can send METRICS_TOKEN as a bearer token instead of logging in
+    token = os.getenv('METRICS_TOKEN')
+    authorization = request.headers.get('Authorization', '')
+    if not (token and hmac.compare_digest(authorization, f'Bearer {token}')) and not is_logged_in():
+        return 'Unauthorized', 401
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+if metrics_enabled:
+    metrics.instrument_app(app)
+
+if os.getenv('SCANMARK_PROFILE_STARTUP'):
+    startup_profile.instrument(app)
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,211 @@
+import json
+import threading
+from collections import deque
+
+import logs
+
+log = logs.get_logger('live_events')
+
+# Responses read from the store per query while catching up
+FETCH_LIMIT = 200
+
+
+def format_event(event, data, event_id=None):
+    """Encode one Server-Sent Event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"), default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class _Channel:
+    """Buffered event feed for one session (or one admin's session list)"""
+
+    def __init__(self, key, buffer_size):
+        self.key = key
+        self.events = deque(maxlen=buffer_size)
+        self.seq = 0
+        self.listeners = 0
+        self.position = 0
+        self.state = None
+        self.condition = threading.Condition()
+
+    def publish(self, items):
+        with self.condition:
+            for event, data, event_id in items:
+                self.seq += 1
+                self.events.append((self.seq, event, data, event_id))
+            self.condition.notify_all()
+
+
+class EventHub:
+    """Fans out session activity to Server-Sent Events listeners
+
+    One poller thread per process reads the session store for each
+    channel that has listeners, so the cost of watching a session is one
+    query per poll interval no matter how many browsers are watching, and
+    writes made by other workers show up within `poll_interval`. Writes in
+    this process call notify() to skip the wait. Listeners only wait on a
+    condition variable; under gevent/eventlet workers each is a greenlet
+    rather than an OS thread.
+
+    Channel keys are ('session', admin, session_id) for responses and
+    state of one session, and ('admin', admin) for an admin's session list.
+    """
+
+    def __init__(self, fetch_responses, fetch_tail, fetch_session, fetch_sessions,
+                 poll_interval=1.0, heartbeat=15.0, buffer_size=1000):
+        self.fetch_responses = fetch_responses
+        self.fetch_tail = fetch_tail
+        self.fetch_session = fetch_session
+        self.fetch_sessions = fetch_sessions
+        self.poll_interval = poll_interval
+        self.heartbeat = heartbeat
+        self.buffer_size = buffer_size
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._poller = None
+
+    def notify(self):
+        """Poll now instead of waiting for the next interval"""
+        self._wake.set()
+
+    def _acquire(self, key):
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is None:
+                channel = _Channel(key, self.buffer_size)
+                if key[0] == 'session':
+                    channel.position = self.fetch_tail(key[1], key[2])
+                    channel.state = self._session_state(key)
+                else:
+                    channel.state = self.session_list(key[1])
+                self._channels[key] = channel
+            channel.listeners += 1
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll_loop, name='event-hub', daemon=True)
+                self._poller.start()
+            return channel
+
+    def _release(self, channel):
+        with self._lock:
+            channel.listeners -= 1
+            if channel.listeners <= 0:
+                self._channels.pop(channel.key, None)
+
+    def _session_state(self, key):
+        session_data = self.fetch_session(key[1], key[2])
+        return None if session_data is None else bool(session_data.get('active', False))
+
+    def session_list(self, admin_username):
+        """An admin's sessions as sent in 'session' events, keyed by id"""
+        return {
+            session_id: {
+                'id': session_id,
+                'name': data.get('name'),
+                'faculty': data.get('faculty'),
+                'branch': data.get('branch'),
+                'semester': data.get('semester'),
+                'active': bool(data.get('active', False)),
+                'form_url': data.get('form_url'),
+            }
+            for session_id, data in self.fetch_sessions(admin_username).items()
+        }
+
+    def _poll_loop(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self._lock:
+                channels = list(self._channels.values())
+            if not channels:
+                with self._lock:
+                    if not self._channels:
+                        self._poller = None
+                        return
+                continue
+            for channel in channels:
+                try:
+                    self._poll(channel)
+                except Exception:
+                    log.exception('live_events.poll_failed', channel=channel.key)
+
+    def _poll(self, channel):
+        items = []
+        if channel.key[0] == 'session':
+            _, admin_username, session_id = channel.key
+            while True:
+                batch = self.fetch_responses(admin_username, session_id, channel.position, FETCH_LIMIT)
+                for position, response in batch:
+                    items.append(('response', response, position))
+                    channel.position = position
+                if len(batch) < FETCH_LIMIT:
+                    break
+            state = self._session_state(channel.key)
+            if state != channel.state:
+                channel.state = state
+                if state is None:
+                    items.append(('session_deleted', {'id': session_id}, None))
+                else:
+                    items.append(('session', {'id': session_id, 'active': state}, None))
+        else:
+            state = self.session_list(channel.key[1])
+            for session_id, data in state.items():
+                if channel.state.get(session_id) != data:
+                    items.append(('session', data, None))
+            for session_id in channel.state.keys() - state.keys():
+                items.append(('session_deleted', {'id': session_id}, None))
+            channel.state = state
+        if items:
+            channel.publish(items)
+
+    def listen(self, key, last_event_id=None):
+        """Generator of SSE text for one listener
+
+        `last_event_id` (the browser's Last-Event-ID) replays responses
+        after that position straight from the store before going live.
+        """
+        channel = self._acquire(key)
+        try:
+            with channel.condition:
+                seq = channel.seq
+                live_position = channel.position
+            yield f'retry: {int(self.poll_interval * 1000) + 1000}\n\n'
+
+            position = live_position
+            if key[0] == 'session' and last_event_id is not None:
+                position = int(last_event_id)
+                while position < live_position:
+                    batch = [item for item in self.fetch_responses(key[1], key[2], position, FETCH_LIMIT)
+                             if item[0] <= live_position]
+                    for item_position, response in batch:
+                        yield format_event('response', response, item_position)
+                        position = item_position
+                    if len(batch) < FETCH_LIMIT:
+                        break
+                position = max(position, live_position)
+
+            while True:
+                with channel.condition:
+                    if channel.seq == seq:
+                        channel.condition.wait(self.heartbeat)
+                    pending = [event for event in channel.events if event[0] > seq]
+                    oldest = channel.events[0][0] if channel.events else seq + 1
+                if not pending:
+                    yield ': keepalive\n\n'
+                    continue
+                if oldest > seq + 1:
+                    # This listener fell behind the buffer; the page reloads itself
+                    yield format_event('reset', {})
+                for event_seq, event, data, event_id in pending:
+                    seq = event_seq
+                    if event_id is not None:
+                        if event_id <= position:
+                            continue
+                        position = event_id
+                    yield format_event(event, data, event_id)
+        finally:
+            self._release(channel)
@@ -0,0 +1,180 @@
+"""Non-blocking structured logging
+
+get_logger(name) returns a logger whose calls take an event name and
+keyword fields:
+
+    log = logs.get_logger('index')
+    log.info('attendance.received', sampled=True, session_id=sid)
+    log.error('attendance.failed', error=str(e))
+
+The calling thread only checks the level, builds a LogRecord and appends it
+to an in-memory queue; a background thread formats records (JSON lines by
+default) and writes them to stderr. When the queue is full, new records are
+dropped and counted rather than blocking the request. Events logged with
+sampled=True are kept at the LOG_SAMPLE_RATE fraction, for things that
+happen on every scan.
+
+    LOG_LEVEL=INFO            # DEBUG, INFO, WARNING, ERROR
+    LOG_FORMAT=json           # json or text
+    LOG_SAMPLE_RATE=0.01      # fraction of sampled events that are kept
+    LOG_QUEUE_SIZE=10000      # records waiting to be written before dropping
+"""
+import os
+import sys
+import json
+import atexit
+import random
+import logging
+import threading
+import collections
+from datetime import datetime
+
+ROOT_LOGGER = 'scanmark'
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'event': record.msg,
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = ' '.join(f'{key}={value}' for key, value in getattr(record, 'fields', {}).items())
+        line = f"{datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds')} " \
+               f"{record.levelname:<7} {record.name} {record.msg} {fields}".rstrip()
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class AsyncHandler(logging.Handler):
+    """Queues records for a writer thread; emit() never does I/O"""
+
+    def __init__(self, stream=None, max_queue=10000):
+        super().__init__()
+        self.stream = stream
+        self.max_queue = max_queue
+        self.records = collections.deque()
+        self.dropped = 0
+        self._wakeup = threading.Event()
+        self._drain_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def emit(self, record):
+        if len(self.records) >= self.max_queue:
+            self.dropped += 1
+            return
+        self.records.append(record)
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self.drain()
+
+    def drain(self):
+        """Format and write everything queued so far"""
+        with self._drain_lock:
+            self._write_pending()
+
+    def _write_pending(self):
+        lines = []
+        while self.records:
+            record = self.records.popleft()
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+        if self.dropped:
+            record = logging.LogRecord(ROOT_LOGGER, logging.WARNING, __file__, 0, 'log.dropped', None, None)
+            record.fields = {'count': self.dropped, 'reason': 'log queue full'}
+            self.dropped = 0
+            lines.append(self.format(record))
+        if lines:
+            stream = self.stream or sys.stderr
+            try:
+                stream.write('\n'.join(lines) + '\n')
+                stream.flush()
+            except Exception:
+                pass
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=1)
+        self.drain()
+        super().close()
+
+
+class StructuredLogger:
+    """Event-plus-fields front end for a stdlib logger"""
+
+    def __init__(self, logger, sample_rate):
+        self.logger = logger
+        self.sample_rate = sample_rate
+
+    def _log(self, level, event, sampled, exc_info, fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        if sampled and random.random() >= self.sample_rate:
+            return
+        # makeRecord directly: Logger.log() would also walk the stack to find the caller
+        record = self.logger.makeRecord(self.logger.name, level, '', 0, event, None,
+                                        sys.exc_info() if exc_info else None, extra={'fields': fields})
+        self.logger.handle(record)
+
+    def debug(self, event, sampled=False, **fields):
+        self._log(logging.DEBUG, event, sampled, None, fields)
+
+    def info(self, event, sampled=False, **fields):
+        self._log(logging.INFO, event, sampled, None, fields)
+
+    def warning(self, event, sampled=False, **fields):
+        self._log(logging.WARNING, event, sampled, None, fields)
+
+    def error(self, event, sampled=False, **fields):
+        self._log(logging.ERROR, event, sampled, None, fields)
+
+    def exception(self, event, **fields):
+        """Log at ERROR with the current exception's traceback"""
+        self._log(logging.ERROR, event, False, True, fields)
+
+
+handler = None
+_configure_lock = threading.Lock()
+_sample_rate = 1.0
+
+
+def configure():
+    """Attach the queueing handler to the 'scanmark' logger (once)"""
+    global handler, _sample_rate
+    with _configure_lock:
+        if handler is not None:
+            return handler
+        _sample_rate = min(1.0, max(0.0, float(os.getenv('LOG_SAMPLE_RATE', '0.01'))))
+        handler = AsyncHandler(max_queue=int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+        handler.setFormatter(TextFormatter() if os.getenv('LOG_FORMAT', 'json').lower() == 'text' else JSONFormatter())
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+        root.addHandler(handler)
+        # Records stay out of the root logger, which may still write synchronously
+        root.propagate = False
+        atexit.register(handler.close)
+        return handler
+
+
+def get_logger(name):
+    configure()
+    return StructuredLogger(logging.getLogger(f'{ROOT_LOGGER}.{name}'), _sample_rate)
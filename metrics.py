@@ -0,0 +1,242 @@
+"""Request latency histograms and backend call accounting in Prometheus format
+
+A Registry holds fixed-bucket histograms keyed by metric name and labels.
+instrument_app() times every Flask request by endpoint, method and status.
+Backend calls (session store methods, Database queries) are timed with
+record_backend_call(); calls made while a request is running are also
+tallied against it, so each endpoint gets a histogram of backend calls and
+backend time per request. Registry.render() produces the text exposition
+format served at /admin/metrics.
+
+Recording a value is a bisect and a few additions under one lock, so this
+is cheap enough to leave on in production (set METRICS_ENABLED=false to
+turn it off).
+"""
+import time
+import bisect
+import functools
+import threading
+import contextvars
+
+# Seconds; Prometheus client defaults plus a 1 ms bucket for in-process backends
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CALL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Backend tally of the request being served: [calls, seconds], or None
+_request_tally = contextvars.ContextVar('scanmark_request_tally', default=None)
+# Outermost instrumented call, so nested calls are attributed to it
+_current_call = contextvars.ContextVar('scanmark_current_call', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Histograms by (name, labels); labels are a tuple of (key, value) pairs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, help_text, buckets):
+        self._help[name] = (help_text, buckets)
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self._help[name][1])
+            histogram.observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: (list(h.counts), h.sum, h.count) for key, h in self._histograms.items()}
+
+    def render(self):
+        lines = []
+        snapshot = self.snapshot()
+        for name, (help_text, buckets) in sorted(self._help.items()):
+            series = sorted((labels, values) for (metric, labels), values in snapshot.items() if metric == name)
+            if not series:
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, (counts, total, count) in series:
+                label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+                prefix = label_text + ',' if label_text else ''
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{{label_text}}} {total:.6f}')
+                lines.append(f'{name}_count{{{label_text}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+registry.describe('scanmark_request_duration_seconds',
+                  'Time to produce a response, by endpoint, method and status', LATENCY_BUCKETS)
+registry.describe('scanmark_request_backend_calls',
+                  'Backend calls made while serving one request, by endpoint', CALL_COUNT_BUCKETS)
+registry.describe('scanmark_request_backend_seconds',
+                  'Time spent in backend calls while serving one request, by endpoint', LATENCY_BUCKETS)
+registry.describe('scanmark_backend_call_seconds',
+                  'Duration of each backend call, by backend and call', LATENCY_BUCKETS)
+
+
+def record_backend_call(backend, call, seconds):
+    registry.observe('scanmark_backend_call_seconds', (('backend', backend), ('call', call)), seconds)
+    tally = _request_tally.get()
+    if tally is not None:
+        tally[0] += 1
+        tally[1] += seconds
+
+
+def timed_call(backend, call, fn):
+    """Wrap fn so each call is recorded; calls made inside it are not counted again"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _current_call.get() is not None:
+            return fn(*args, **kwargs)
+        token = _current_call.set(call)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            record_backend_call(backend, call, time.perf_counter() - start)
+            _current_call.reset(token)
+    return wrapper
+
+
+def instrument_methods(obj, backend, names):
+    """Time the named methods of one object (e.g. the session store)"""
+    for name in names:
+        setattr(obj, name, timed_call(backend, name, getattr(obj, name)))
+    return obj
+
+
+def attributed(call, fn):
+    """Wrap fn so backend queries it makes are labelled with `call`"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _current_call.get() is not None:
+            return fn(*args, **kwargs)
+        token = _current_call.set(call)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_call.reset(token)
+    return wrapper
+
+
+def instrument_class(cls, prefix):
+    """Attribute queries to the public static methods of cls (e.g. Database)"""
+    for name, value in list(vars(cls).items()):
+        if isinstance(value, staticmethod) and not name.startswith('_'):
+            setattr(cls, name, staticmethod(attributed(f'{prefix}.{name}', value.__func__)))
+    return cls
+
+
+class _TimedQuery:
+    """PostgREST query builder whose execute() is recorded as one backend call"""
+
+    __slots__ = ('_query', '_client', '_table', '_operation')
+
+    def __init__(self, query, client, table, operation='select'):
+        self._query = query
+        self._client = client
+        self._table = table
+        self._operation = operation
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if name == 'execute':
+            return self._execute
+        if not callable(attr):
+            return attr
+        operation = name if name in ('select', 'insert', 'upsert', 'update', 'delete') else self._operation
+
+        def chained(*args, **kwargs):
+            return _TimedQuery(attr(*args, **kwargs), self._client, self._table, operation)
+        return chained
+
+    def _execute(self):
+        start = time.perf_counter()
+        try:
+            return self._query.execute()
+        finally:
+            call = _current_call.get() or f'{self._table}.{self._operation}'
+            record_backend_call(self._client.backend, call, time.perf_counter() - start)
+
+
+class InstrumentedClient:
+    """Wraps a Supabase-compatible client so every query and rpc is recorded"""
+
+    def __init__(self, client, backend):
+        self.client = client
+        self.backend = backend
+
+    def table(self, name):
+        return _TimedQuery(self.client.table(name), self, name)
+
+    def rpc(self, name, params=None):
+        return _TimedQuery(self.client.rpc(name, params or {}), self, 'rpc', name)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def instrument_app(app):
+    """Record latency and backend usage of every request to `app`"""
+    def start_request():
+        _request_tally.set([0, 0.0])
+        request_start.set(time.perf_counter())
+
+    def finish_request(status):
+        start = request_start.get()
+        if start is None:
+            return
+        request_start.set(None)
+        from flask import request
+        endpoint = request.endpoint or 'unmatched'
+        registry.observe('scanmark_request_duration_seconds',
+                         (('endpoint', endpoint), ('method', request.method), ('status', str(status))),
+                         time.perf_counter() - start)
+        calls, seconds = _request_tally.get() or (0, 0.0)
+        registry.observe('scanmark_request_backend_calls', (('endpoint', endpoint),), calls)
+        registry.observe('scanmark_request_backend_seconds', (('endpoint', endpoint),), seconds)
+        _request_tally.set(None)
+
+    def after_request(response):
+        finish_request(response.status_code)
+        return response
+
+    def teardown_request(error):
+        # Only still pending when the view raised
+        if error is not None:
+            finish_request(500)
+
+    request_start = contextvars.ContextVar('scanmark_request_start', default=None)
+    app.before_request(start_request)
+    app.after_request(after_request)
+    app.teardown_request(teardown_request)
+    return app
@@ -0,0 +1,94 @@
+import os
+import hmac
+import base64
+import hashlib
+import threading
+
+ITERATIONS = 100000
+SALT_BYTES = 32
+
+
+class HasherBusyError(Exception):
+    """Raised when the password hashing queue is full or a hash takes too long"""
+
+
+def hash_password(password: str, salt: bytes = None) -> str:
+    """Hash password with salt using PBKDF2"""
+    salt = os.urandom(SALT_BYTES) if salt is None else salt
+    key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, ITERATIONS)
+    return base64.b64encode(salt + key).decode('utf-8')
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    decoded = base64.b64decode(hashed.encode('utf-8'))
+    salt, key = decoded[:SALT_BYTES], decoded[SALT_BYTES:]
+    new_key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, ITERATIONS)
+    return hmac.compare_digest(new_key, key)
+
+
+def session_credential(secret_key: str, username: str, password_hash: str) -> str:
+    """Tag stored in the signed session after login
+
+    Checking it is one HMAC rather than a PBKDF2 run, and it stops matching
+    as soon as the admin's password hash changes.
+    """
+    message = f'{username}\0{password_hash}'.encode('utf-8')
+    return hmac.new(secret_key.encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+
+class PasswordHasher:
+    """Runs PBKDF2 on a small dedicated pool so logins cannot starve other requests
+
+    At most `max_workers` hashes run at once (hashlib releases the GIL, so
+    these use separate cores) and at most `max_queue` may be waiting.
+    Beyond that, or when a result takes longer than `timeout` seconds,
+    HasherBusyError is raised and the caller should answer 503 instead of
+    tying up a worker thread. max_workers=0 hashes inline on the caller's
+    thread, as before.
+    """
+
+    def __init__(self, max_workers=2, max_queue=32, timeout=5.0):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue) if max_workers else None
+        self.rejected = 0
+
+    def _get_executor(self):
+        # Created on first use; concurrent.futures is not needed for a cold start
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='pbkdf2')
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self.max_workers:
+            return fn(*args)
+        from concurrent.futures import TimeoutError
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusyError('Too many password checks in progress')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            self.rejected += 1
+            raise HasherBusyError('Password check timed out')
+
+    def hash(self, password, salt=None):
+        return self._run(hash_password, password, salt)
+
+    def verify(self, password, hashed):
+        return self._run(verify_password, password, hashed)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,119 @@
+import sys
+import hashlib
+import threading
+from io import BytesIO, StringIO
+from collections import OrderedDict
+
+# Module size in pixels for each named size; 'small' suits the dashboard,
+# 'medium' matches the old scale=10 images and 'print' is for handouts
+SIZES = {
+    'small': 4,
+    'medium': 10,
+    'print': 25,
+}
+
+FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'txt': 'text/plain; charset=utf-8',
+}
+
+
+class QRCache:
+    """QR rendering service with a memory-bounded LRU of rendered variants
+
+    Each (data, format, size) variant is rendered on first request and
+    kept until the cache exceeds `max_bytes`, measured with
+    sys.getsizeof over the stored images and keys. The key is the SHA-256
+    of the data plus the render options, so it doubles as a strong ETag.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(data, **options):
+        material = data + '\0' + '&'.join(f'{k}={options[k]}' for k in sorted(options))
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _footprint(digest, image):
+        return sys.getsizeof(digest) + sys.getsizeof(image)
+
+    def get(self, digest):
+        with self._lock:
+            image = self._items.get(digest)
+            if image is not None:
+                self._items.move_to_end(digest)
+            return image
+
+    def put(self, digest, image):
+        size = self._footprint(digest, image)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._items.pop(digest, None)
+            if previous is not None:
+                self.current_bytes -= self._footprint(digest, previous)
+            self._items[digest] = image
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                old_digest, old_image = self._items.popitem(last=False)
+                self.current_bytes -= self._footprint(old_digest, old_image)
+                self.evictions += 1
+
+    def render(self, data, fmt='png', size='medium'):
+        """Return (digest, body, mimetype) for data, rendering on a cache miss"""
+        if fmt not in FORMATS:
+            raise ValueError(f'Unsupported QR format: {fmt}')
+        if size not in SIZES:
+            raise ValueError(f'Unsupported QR size: {size}')
+        # Terminal output has no pixel size
+        if fmt == 'txt':
+            size = 'medium'
+
+        digest = self.key(data, kind=fmt, size=size)
+        image = self.get(digest)
+        if image is not None:
+            self.hits += 1
+            return digest, image, FORMATS[fmt]
+
+        self.misses += 1
+        image = self._draw(data, fmt, SIZES[size])
+        self.put(digest, image)
+        return digest, image, FORMATS[fmt]
+
+    @staticmethod
+    def _draw(data, fmt, scale):
+        # segno is only needed on a cache miss; importing it lazily keeps it off the cold-start path
+        import segno
+        qr = segno.make(data)
+        if fmt == 'txt':
+            out = StringIO()
+            qr.terminal(out=out, compact=True)
+            return out.getvalue().encode('utf-8')
+        out = BytesIO()
+        if fmt == 'svg':
+            qr.save(out, kind='svg', scale=scale, xmldecl=False)
+        else:
+            qr.save(out, kind='png', scale=scale)
+        return out.getvalue()
+
+    def stats(self):
+        return {
+            'entries': len(self._items),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def __len__(self):
+        return len(self._items)
@@ -40,3 +40,81 @@ CREATE INDEX IF NOT EXISTS idx_attendance_student_id ON attendance(student_id);
 CREATE INDEX IF NOT EXISTS idx_attendance_created_at ON attendance(created_at);
 CREATE INDEX IF NOT EXISTS idx_qr_tokens_expires_at ON qr_tokens(expires_at);
 CREATE INDEX IF NOT EXISTS idx_sessions_active ON sessions(active);
+
+-- Columns written by mark_attendance and read by the per-session queries
+ALTER TABLE attendance ADD COLUMN IF NOT EXISTS session_id text;
+ALTER TABLE attendance ADD COLUMN IF NOT EXISTS token text;
+CREATE INDEX IF NOT EXISTS idx_attendance_session_id ON attendance(session_id);
+-- Keyset pagination in get_responses_page: token IN (...) ordered by (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_attendance_token_created ON attendance(token, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_qr_tokens_session ON qr_tokens(session);
+
+-- Daily attendance rollup so trend windows are answered with one read.
+-- Maintained per statement, so a bulk insert bumps each day once.
+CREATE TABLE IF NOT EXISTS attendance_daily (
+    day date PRIMARY KEY,
+    count bigint NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION attendance_daily_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO attendance_daily (day, count)
+    SELECT created_at::date, count(*) FROM new_rows GROUP BY 1
+    ON CONFLICT (day) DO UPDATE SET count = attendance_daily.count + EXCLUDED.count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION attendance_daily_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE attendance_daily d SET count = d.count - o.n
+    FROM (SELECT created_at::date AS day, count(*) AS n FROM old_rows GROUP BY 1) o
+    WHERE d.day = o.day;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_attendance_daily_insert ON attendance;
+CREATE TRIGGER trg_attendance_daily_insert AFTER INSERT ON attendance
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_daily_insert();
+
+DROP TRIGGER IF EXISTS trg_attendance_daily_delete ON attendance;
+CREATE TRIGGER trg_attendance_daily_delete AFTER DELETE ON attendance
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_daily_delete();
+
+-- Rebuild the rollup from the attendance table (also callable as an RPC)
+CREATE OR REPLACE FUNCTION backfill_attendance_daily() RETURNS void AS $$
+BEGIN
+    INSERT INTO attendance_daily (day, count)
+    SELECT created_at::date, count(*) FROM attendance GROUP BY 1
+    ON CONFLICT (day) DO UPDATE SET count = EXCLUDED.count;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT backfill_attendance_daily();
+
+-- Distinct students seen in attendance, so counting them never scans attendance
+CREATE TABLE IF NOT EXISTS attendance_students (
+    student_id text PRIMARY KEY,
+    first_seen timestamp NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION attendance_students_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO attendance_students (student_id, first_seen)
+    SELECT student_id, min(created_at) FROM new_rows GROUP BY student_id
+    ON CONFLICT (student_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_attendance_students_insert ON attendance;
+CREATE TRIGGER trg_attendance_students_insert AFTER INSERT ON attendance
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_students_insert();
+
+INSERT INTO attendance_students (student_id, first_seen)
+SELECT student_id, min(created_at) FROM attendance GROUP BY student_id
+ON CONFLICT (student_id) DO NOTHING;
@@ -0,0 +1,809 @@
+import os
+import sys
+import json
+import glob
+import tempfile
+import threading
+from datetime import datetime
+
+JOURNAL_NAME = 'journal.log'
+SNAPSHOT_NAME = 'snapshot.jsonl'
+LEGACY_SNAPSHOT_NAME = 'snapshot.pickle'
+LOCK_NAME = 'journal.lock'
+SEGMENT_PATTERN = 'journal-*.log'
+
+# Private to the user running the app; /tmp itself is writable by everyone
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), f'scanmark-{os.getuid()}' if hasattr(os, 'getuid') else 'scanmark')
+
+
+def private_directory(path):
+    """Create `path` readable only by this user, refusing one someone else controls"""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if hasattr(os, 'getuid'):
+        st = os.stat(path)
+        if st.st_uid != os.getuid():
+            raise RuntimeError(f'Data directory {path} belongs to another user')
+        if st.st_mode & 0o077:
+            os.chmod(path, 0o700)
+    return path
+
+
+class SnapshotText:
+    """A session's responses as they appear in the snapshot, parsed on first use
+
+    Responses replayed from the journal on top of the snapshot wait in `tail`.
+    """
+    __slots__ = ('text', 'tail')
+
+    def __init__(self, text):
+        self.text = text
+        self.tail = []
+
+    def parse(self):
+        return json.loads(self.text) + self.tail
+
+
+def loaded_responses(admin_responses, session_id):
+    """A session's response list, parsing its snapshot text if needed; callers hold the journal lock"""
+    items = admin_responses[session_id]
+    if isinstance(items, SnapshotText):
+        items = admin_responses[session_id] = items.parse()
+    return items
+
+
+def write_snapshot(path, state):
+    """Atomically write {'seq', 'sessions', 'responses'} as a snapshot
+
+    The first line holds the sequence number and sessions; each session's
+    responses follow as a [admin, session_id] line and a line with the list,
+    so restore can keep the lists as text until a session is used.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'seq': state['seq'], 'sessions': state['sessions']},
+                           separators=(',', ':'), default=_encode_default) + '\n')
+        for admin_username, admin_responses in state['responses'].items():
+            for session_id, items in admin_responses.items():
+                f.write(json.dumps([admin_username, session_id], separators=(',', ':')) + '\n')
+                if isinstance(items, SnapshotText) and not items.tail:
+                    # Unchanged since the last restore, so it is still exactly what was read
+                    f.write(items.text)
+                else:
+                    if isinstance(items, SnapshotText):
+                        items = items.parse()
+                    f.write(json.dumps(items, separators=(',', ':'), default=_encode_default) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class JournalLockedError(RuntimeError):
+    """Another process already writes the journal in this directory"""
+
+
+class StoreConfigurationError(RuntimeError):
+    """The selected store cannot be shared by the processes serving the app"""
+
+
+# Directories whose journal is open in this process; POSIX record locks
+# only exclude other processes
+_open_journals = set()
+_open_journals_lock = threading.Lock()
+
+
+def enrollment_key(response):
+    """Normalised enrollment number used to detect duplicate submissions"""
+    enrollment_no = response.get('enrollment_no')
+    return enrollment_no.strip().upper() if enrollment_no else None
+
+
+def _encode_default(value):
+    # Session data may still carry datetime objects from older code paths
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class SessionJournal:
+    """Append-only journal plus periodic snapshot for the in-memory session state
+
+    Every mutation of ACTIVE_SESSIONS / SESSION_RESPONSES is appended to
+    journal.log as one JSON line tagged with a sequence number. Once
+    `snapshot_every` records have accumulated the live journal is rotated
+    into a closed segment and the state is written as JSON lines in a
+    background thread; segments already covered by the snapshot are then
+    removed. Restoring loads the snapshot and replays only the records newer
+    than it. Response lists are kept as snapshot text (SnapshotText) until a
+    session is first used, so restore time hardly grows with old responses.
+
+    Appends are flushed under the journal lock but fsync'd by commit()
+    after it is released, so requests arriving together share one fsync
+    (a group commit) instead of queueing for one each.
+
+    Sequence numbers are kept per process, so a directory has exactly one
+    writer: the journal holds an exclusive lock on journal.lock and raises
+    JournalLockedError when another process (a second gunicorn worker)
+    already has it. Several workers need the SQLite store; see resolve_backend.
+    """
+
+    def __init__(self, directory, snapshot_every=10000, fsync=True):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.lock = threading.RLock()
+        self.seq = 0
+        self._pending = 0
+        self._file = None
+        # Highest sequence number known to be on disk; guarded by _sync_lock
+        self._synced = 0
+        self._sync_lock = threading.Lock()
+        self._snapshot_thread = None
+        private_directory(directory)
+        self._lock_fd = self._acquire(directory)
+        # A fork (gunicorn --preload) inherits the journal but not the lock; only this process may write
+        self._owner_pid = os.getpid()
+
+    @staticmethod
+    def _acquire(directory):
+        """Lock journal.lock for this process; os.lockf keeps fcntl off the startup imports"""
+        key = os.path.realpath(directory)
+        with _open_journals_lock:
+            if key in _open_journals:
+                raise JournalLockedError(f'The session journal in {directory} is already open in this process')
+            fd = os.open(os.path.join(directory, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o600)
+            if hasattr(os, 'lockf'):  # Windows: no advisory locks, one process is assumed
+                try:
+                    os.lockf(fd, os.F_TLOCK, 0)
+                except OSError:
+                    os.close(fd)
+                    raise JournalLockedError(
+                        f'Another process is writing the session journal in {directory}; '
+                        'the memory store supports one process, use SCANMARK_STORE=sqlite for several workers')
+            _open_journals.add(key)
+        return fd
+
+    @property
+    def journal_path(self):
+        return os.path.join(self.directory, JOURNAL_NAME)
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.directory, SNAPSHOT_NAME)
+
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN)))
+
+    def restore(self):
+        """Rebuild (sessions, responses) from the snapshot and journal"""
+        with self.lock:
+            sessions, responses, seq = {}, {}, 0
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    header = json.loads(f.readline())
+                    sessions, seq = header['sessions'], header['seq']
+                    for line in f:
+                        admin_username, session_id = json.loads(line)
+                        responses.setdefault(admin_username, {})[session_id] = SnapshotText(next(f))
+            elif os.path.exists(os.path.join(self.directory, LEGACY_SNAPSHOT_NAME)):
+                # Pickles are not loaded implicitly: anyone able to write one could run code
+                raise RuntimeError(
+                    f'{LEGACY_SNAPSHOT_NAME} in {self.directory} predates JSON snapshots; convert it once with '
+                    'session_store.convert_legacy_snapshot(directory) after checking where it came from')
+            snapshot_seq = seq
+
+            for path in self._segments() + [self.journal_path]:
+                if not os.path.exists(path):
+                    continue
+                valid_end = 0
+                with open(path, 'rb') as f:
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            # Torn final write from a crash mid-append; it was never acknowledged
+                            break
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # A torn write that earlier versions appended onto; later lines are intact
+                            valid_end += len(line)
+                            continue
+                        valid_end += len(line)
+                        if record[0] <= snapshot_seq:
+                            continue
+                        self._apply(sessions, responses, record[1], record[2:])
+                        seq = max(seq, record[0])
+                if path == self.journal_path and valid_end < os.path.getsize(path):
+                    # Cut the torn tail so the next append starts on a line of its own
+                    with open(path, 'r+b') as f:
+                        f.truncate(valid_end)
+                        f.flush()
+                        os.fsync(f.fileno())
+
+            self.seq = seq
+            self._pending = seq - snapshot_seq
+            return sessions, responses
+
+    @staticmethod
+    def _apply(sessions, responses, op, args):
+        if op == 'session':
+            admin_username, session_id, session_data = args
+            sessions.setdefault(admin_username, {})[session_id] = session_data
+            responses.setdefault(admin_username, {}).setdefault(session_id, [])
+        elif op == 'response':
+            admin_username, session_id, response = args
+            items = responses.setdefault(admin_username, {}).setdefault(session_id, [])
+            # Replay leaves snapshot text unparsed
+            (items.tail if isinstance(items, SnapshotText) else items).append(response)
+        elif op == 'active':
+            admin_username, session_id, active = args
+            session_data = sessions.get(admin_username, {}).get(session_id)
+            if session_data is not None:
+                session_data['active'] = active
+        elif op == 'delete':
+            admin_username, session_id = args
+            sessions.get(admin_username, {}).pop(session_id, None)
+            responses.get(admin_username, {}).pop(session_id, None)
+
+    def record(self, op, *args):
+        """Append one mutation to the journal and wait until it is on disk"""
+        self.commit(self.record_many([(op, *args)]))
+
+    def record_many(self, records):
+        """Append several (op, *args) mutations; returns the sequence number to commit()
+
+        The records are written but not yet fsync'd. Callers release
+        self.lock before commit(), so one fsync covers every record that
+        concurrent requests appended in the meantime.
+        """
+        with self.lock:
+            if os.getpid() != self._owner_pid:
+                raise JournalLockedError('The session journal was opened by another process (forked worker)')
+            if self._file is None:
+                self._file = open(self.journal_path, 'a', encoding='utf-8')
+            lines = []
+            for op, *args in records:
+                self.seq += 1
+                lines.append(json.dumps([self.seq, op, *args], separators=(',', ':'), default=_encode_default))
+            self._file.write('\n'.join(lines) + '\n')
+            self._file.flush()
+            self._pending += len(lines)
+            return self.seq
+
+    def commit(self, seq):
+        """Wait until every record up to `seq` is on disk"""
+        if not self.fsync:
+            return
+        with self._sync_lock:
+            if self._synced >= seq:
+                # Covered by an fsync another request made while we waited
+                return
+            with self.lock:
+                target = self.seq
+                # A duplicate stays valid if the journal is rotated while we sync
+                fd = os.dup(self._file.fileno()) if self._file is not None else None
+            if fd is not None:
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            self._synced = target
+
+    def should_snapshot(self):
+        return self._pending >= self.snapshot_every and not self._snapshot_running()
+
+    def _snapshot_running(self):
+        return self._snapshot_thread is not None and self._snapshot_thread.is_alive()
+
+    def snapshot(self, sessions, responses, background=True):
+        """Rotate the journal and persist a copy of the given state"""
+        with self.lock:
+            if self._file is not None:
+                if self.fsync:
+                    # Records not yet committed must be on disk before the file is closed
+                    os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.journal_path):
+                os.replace(self.journal_path, os.path.join(self.directory, f'journal-{self.seq:012d}.log'))
+
+            # Responses are never mutated after being appended, so copying the
+            # containers is enough to freeze the state for the writer thread
+            state = {
+                'seq': self.seq,
+                'sessions': {admin: {sid: dict(data) for sid, data in admin_sessions.items()}
+                             for admin, admin_sessions in sessions.items()},
+                'responses': {admin: {sid: list(items) if isinstance(items, list) else items
+                                      for sid, items in admin_responses.items()}
+                              for admin, admin_responses in responses.items()},
+            }
+            self._pending = 0
+
+        if background:
+            self._snapshot_thread = threading.Thread(target=self._write_snapshot, args=(state,), daemon=True)
+            self._snapshot_thread.start()
+        else:
+            self._write_snapshot(state)
+
+    def _write_snapshot(self, state):
+        write_snapshot(self.snapshot_path, state)
+
+        # Segments are named after the last sequence number they contain
+        for path in self._segments():
+            segment_seq = int(os.path.basename(path)[len('journal-'):-len('.log')])
+            if segment_seq <= state['seq']:
+                os.remove(path)
+
+    def wait(self):
+        """Block until a background snapshot (if any) has finished"""
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+
+    def close(self):
+        self.wait()
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._lock_fd is not None:
+                # Closing the descriptor releases the lock
+                os.close(self._lock_fd)
+                self._lock_fd = None
+                with _open_journals_lock:
+                    _open_journals.discard(os.path.realpath(self.directory))
+
+
+def convert_legacy_snapshot(directory):
+    """Rewrite a snapshot.pickle from an older version as snapshot.jsonl
+
+    Only run this on a file you trust: loading a pickle can execute code.
+    """
+    import pickle
+    legacy_path = os.path.join(directory, LEGACY_SNAPSHOT_NAME)
+    with open(legacy_path, 'rb') as f:
+        state = pickle.load(f)
+    write_snapshot(os.path.join(directory, SNAPSHOT_NAME), state)
+    os.remove(legacy_path)
+
+
+class SessionStore:
+    """Interface for where sessions and their responses live
+
+    Session data is a plain dict; responses are appended in arrival order.
+    """
+
+    def get_sessions(self, admin_username):
+        raise NotImplementedError
+
+    def get_session(self, admin_username, session_id):
+        return self.get_sessions(admin_username).get(session_id)
+
+    def put_session(self, admin_username, session_id, session_data):
+        raise NotImplementedError
+
+    def set_active(self, admin_username, session_id, active):
+        raise NotImplementedError
+
+    def delete_session(self, admin_username, session_id):
+        raise NotImplementedError
+
+    def get_responses(self, admin_username, session_id):
+        raise NotImplementedError
+
+    def iter_responses(self, admin_username, session_id):
+        """Iterate a session's responses without materialising them all"""
+        return iter(self.get_responses(admin_username, session_id))
+
+    def get_responses_page(self, admin_username, session_id, cursor=None, limit=50):
+        """One page of responses in arrival order
+        Returns: (responses, next_cursor or None)
+
+        The cursor is an opaque keyset position: the last response of the
+        previous page, never an offset that shifts as responses arrive.
+        A malformed or out-of-range cursor raises ValueError.
+        """
+        raise NotImplementedError
+
+    def responses_after(self, admin_username, session_id, position=0, limit=200):
+        """Responses stored after `position`, as (position, response) pairs
+
+        Positions are increasing integers; the last one seen can be passed
+        back to continue from there (used by the live event feed).
+        """
+        raise NotImplementedError
+
+    def tail_position(self, admin_username, session_id):
+        """Position of the newest response, or 0 if there are none"""
+        raise NotImplementedError
+
+    def add_response(self, admin_username, session_id, response):
+        """Store a response; returns False if the enrollment number already responded"""
+        raise NotImplementedError
+
+    def add_responses(self, items):
+        """Store several (admin_username, session_id, response) at once
+
+        Returns one add_response() result per item. Backends commit the
+        whole batch together, so bursts cost one sync instead of one each.
+        """
+        return [self.add_response(admin_username, session_id, response)
+                for admin_username, session_id, response in items]
+
+    def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local dicts made durable by a SessionJournal
+
+    Fast, but private to one process: use SQLiteSessionStore when running
+    several gunicorn workers.
+    """
+
+    def __init__(self, journal):
+        self.journal = journal
+        self.sessions, self.responses = journal.restore()
+        # Per-session hash index of enrollment numbers for O(1) duplicate checks,
+        # built when a restored session first takes a submission
+        self.enrollments = {}
+
+    def get_sessions(self, admin_username):
+        return self.sessions.get(admin_username, {})
+
+    def put_session(self, admin_username, session_id, session_data):
+        with self.journal.lock:
+            self.sessions.setdefault(admin_username, {})[session_id] = session_data
+            self.responses.setdefault(admin_username, {}).setdefault(session_id, [])
+            # Rendered QR codes are derived data and are regenerated on demand
+            seq = self._record('session', admin_username, session_id,
+                               {k: v for k, v in session_data.items() if k != 'qr_code'})
+        self.journal.commit(seq)
+
+    def set_active(self, admin_username, session_id, active):
+        with self.journal.lock:
+            session_data = self.sessions.get(admin_username, {}).get(session_id)
+            if session_data is None:
+                return False
+            session_data['active'] = active
+            seq = self._record('active', admin_username, session_id, active)
+        self.journal.commit(seq)
+        return True
+
+    def delete_session(self, admin_username, session_id):
+        with self.journal.lock:
+            if self.sessions.get(admin_username, {}).pop(session_id, None) is None:
+                return False
+            self.responses.get(admin_username, {}).pop(session_id, None)
+            self.enrollments.pop((admin_username, session_id), None)
+            seq = self._record('delete', admin_username, session_id)
+        self.journal.commit(seq)
+        return True
+
+    def get_responses(self, admin_username, session_id):
+        admin_responses = self.responses.get(admin_username, {})
+        items = admin_responses.get(session_id, [])
+        if isinstance(items, SnapshotText):
+            with self.journal.lock:
+                items = loaded_responses(admin_responses, session_id) if session_id in admin_responses else []
+        return items
+
+    def _session_responses(self, admin_username, session_id):
+        """Response list and enrollment keys of a session; callers hold the journal lock"""
+        admin_responses = self.responses.setdefault(admin_username, {})
+        admin_responses.setdefault(session_id, [])
+        items = loaded_responses(admin_responses, session_id)
+        seen = self.enrollments.get((admin_username, session_id))
+        if seen is None:
+            seen = self.enrollments[(admin_username, session_id)] = {enrollment_key(r) for r in items} - {None}
+        return items, seen
+
+    def get_responses_page(self, admin_username, session_id, cursor=None, limit=50):
+        # Lists are append-only, so a position is a stable key for a response
+        items = self.get_responses(admin_username, session_id)
+        start = int(cursor) if cursor else 0
+        if not 0 <= start <= len(items):
+            raise ValueError(f'cursor out of range: {cursor}')
+        page = items[start:start + limit]
+        end = start + len(page)
+        return page, (str(end) if end < len(items) else None)
+
+    def responses_after(self, admin_username, session_id, position=0, limit=200):
+        items = self.get_responses(admin_username, session_id)
+        return [(position + i + 1, item) for i, item in enumerate(items[position:position + limit])]
+
+    def tail_position(self, admin_username, session_id):
+        return len(self.get_responses(admin_username, session_id))
+
+    def add_response(self, admin_username, session_id, response):
+        key = enrollment_key(response)
+        with self.journal.lock:
+            items, seen = self._session_responses(admin_username, session_id)
+            if key is not None:
+                if key in seen:
+                    return False
+                seen.add(key)
+            items.append(response)
+            seq = self._record('response', admin_username, session_id, response)
+        self.journal.commit(seq)
+        return True
+
+    def add_responses(self, items):
+        results = []
+        records = []
+        with self.journal.lock:
+            for admin_username, session_id, response in items:
+                key = enrollment_key(response)
+                session_items, seen = self._session_responses(admin_username, session_id)
+                if key is not None and key in seen:
+                    results.append(False)
+                    continue
+                if key is not None:
+                    seen.add(key)
+                session_items.append(response)
+                records.append(('response', admin_username, session_id, response))
+                results.append(True)
+            seq = self._record_many(records) if records else 0
+        self.journal.commit(seq)
+        return results
+
+    def _record(self, op, *args):
+        return self._record_many([(op, *args)])
+
+    def _record_many(self, records):
+        """Journal state changes and snapshot once enough have piled up; callers hold the journal lock
+
+        Returns the sequence number to commit() once the lock is released.
+        """
+        seq = self.journal.record_many(records)
+        if self.journal.should_snapshot():
+            self.journal.snapshot(self.sessions, self.responses)
+        return seq
+
+    def close(self):
+        self.journal.close()
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions and responses in a SQLite database shared by every worker
+
+    WAL mode lets readers in all processes proceed while one writer
+    appends, so a QR created in one gunicorn worker is visible to a scan
+    that lands on another. Each thread keeps its own connection.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            admin_username TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            data TEXT NOT NULL,
+            active INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (admin_username, session_id)
+        );
+        CREATE TABLE IF NOT EXISTS responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_username TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            data TEXT NOT NULL,
+            enrollment_no TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_responses_session ON responses(admin_username, session_id, id);
+    """
+
+    # The unique index makes duplicate detection atomic across every worker
+    INDEXES = """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_responses_enrollment
+            ON responses(admin_username, session_id, enrollment_no);
+    """
+
+    def __init__(self, path):
+        import sqlite3
+        self._sqlite3 = sqlite3
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(self.SCHEMA)
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(responses)')]
+        if 'enrollment_no' not in columns:
+            conn.execute('ALTER TABLE responses ADD COLUMN enrollment_no TEXT')
+        conn.executescript(self.INDEXES)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _dumps(value):
+        return json.dumps(value, separators=(',', ':'), default=_encode_default)
+
+    def get_sessions(self, admin_username):
+        rows = self._connection().execute(
+            'SELECT session_id, data, active FROM sessions WHERE admin_username = ? ORDER BY rowid',
+            (admin_username,)
+        ).fetchall()
+        sessions = {}
+        for session_id, data, active in rows:
+            session_data = json.loads(data)
+            session_data['active'] = bool(active)
+            sessions[session_id] = session_data
+        return sessions
+
+    def get_session(self, admin_username, session_id):
+        row = self._connection().execute(
+            'SELECT data, active FROM sessions WHERE admin_username = ? AND session_id = ?',
+            (admin_username, session_id)
+        ).fetchone()
+        if row is None:
+            return None
+        session_data = json.loads(row[0])
+        session_data['active'] = bool(row[1])
+        return session_data
+
+    def put_session(self, admin_username, session_id, session_data):
+        data = {k: v for k, v in session_data.items() if k != 'qr_code'}
+        self._connection().execute(
+            'INSERT OR REPLACE INTO sessions (admin_username, session_id, data, active) VALUES (?, ?, ?, ?)',
+            (admin_username, session_id, self._dumps(data), int(bool(session_data.get('active', False))))
+        )
+
+    def set_active(self, admin_username, session_id, active):
+        cursor = self._connection().execute(
+            'UPDATE sessions SET active = ? WHERE admin_username = ? AND session_id = ?',
+            (int(active), admin_username, session_id)
+        )
+        return cursor.rowcount > 0
+
+    def delete_session(self, admin_username, session_id):
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.execute('DELETE FROM sessions WHERE admin_username = ? AND session_id = ?',
+                                  (admin_username, session_id))
+            conn.execute('DELETE FROM responses WHERE admin_username = ? AND session_id = ?',
+                         (admin_username, session_id))
+        return cursor.rowcount > 0
+
+    def get_responses(self, admin_username, session_id):
+        rows = self._connection().execute(
+            'SELECT data FROM responses WHERE admin_username = ? AND session_id = ? ORDER BY id',
+            (admin_username, session_id)
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    def iter_responses(self, admin_username, session_id):
+        cursor = self._connection().execute(
+            'SELECT data FROM responses WHERE admin_username = ? AND session_id = ? ORDER BY id',
+            (admin_username, session_id)
+        )
+        while True:
+            rows = cursor.fetchmany(500)
+            if not rows:
+                break
+            for (data,) in rows:
+                yield json.loads(data)
+
+    def get_responses_page(self, admin_username, session_id, cursor=None, limit=50):
+        # AUTOINCREMENT ids follow arrival (and so created_at) order, making id the keyset
+        after = int(cursor) if cursor else 0
+        if after < 0:
+            raise ValueError(f'cursor out of range: {cursor}')
+        rows = self._connection().execute(
+            'SELECT id, data FROM responses WHERE admin_username = ? AND session_id = ? AND id > ? '
+            'ORDER BY id LIMIT ?',
+            (admin_username, session_id, after, limit + 1)
+        ).fetchall()
+        next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+        return [json.loads(data) for _, data in rows[:limit]], next_cursor
+
+    def responses_after(self, admin_username, session_id, position=0, limit=200):
+        rows = self._connection().execute(
+            'SELECT id, data FROM responses WHERE admin_username = ? AND session_id = ? AND id > ? '
+            'ORDER BY id LIMIT ?',
+            (admin_username, session_id, position, limit)
+        )
+        return [(row_id, json.loads(data)) for row_id, data in rows]
+
+    def tail_position(self, admin_username, session_id):
+        row = self._connection().execute(
+            'SELECT MAX(id) FROM responses WHERE admin_username = ? AND session_id = ?',
+            (admin_username, session_id)
+        ).fetchone()
+        return row[0] or 0
+
+    def add_response(self, admin_username, session_id, response):
+        cursor = self._connection().execute(
+            'INSERT OR IGNORE INTO responses (admin_username, session_id, data, enrollment_no) VALUES (?, ?, ?, ?)',
+            (admin_username, session_id, self._dumps(response), enrollment_key(response))
+        )
+        return cursor.rowcount > 0
+
+    def add_responses(self, items):
+        conn = self._connection()
+        results = []
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for admin_username, session_id, response in items:
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO responses (admin_username, session_id, data, enrollment_no) '
+                    'VALUES (?, ?, ?, ?)',
+                    (admin_username, session_id, self._dumps(response), enrollment_key(response))
+                )
+                results.append(cursor.rowcount > 0)
+        return results
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def gunicorn_workers(argv=None, environ=None, modules=None):
+    """How gunicorn will serve the app, or None when it is not the server
+    Returns: (workers, preload) with workers 0 when not known here
+
+    Read from the command line, GUNICORN_CMD_ARGS and WEB_CONCURRENCY, the
+    places gunicorn itself reads them. A config file may set either, so
+    with one (-c, or ./gunicorn.conf.py) the count is reported as unknown.
+    """
+    argv = sys.argv if argv is None else argv
+    environ = os.environ if environ is None else environ
+    modules = sys.modules if modules is None else modules
+    # argv[0] is .../bin/gunicorn, or .../gunicorn/__main__.py under python -m
+    command = argv[0] if argv else ''
+    if 'gunicorn' not in modules and 'gunicorn' not in command:
+        return None
+
+    # Command-line flags take precedence over GUNICORN_CMD_ARGS
+    args = environ.get('GUNICORN_CMD_ARGS', '').split()
+    if 'gunicorn' in command:
+        args += argv[1:]
+    workers = environ.get('WEB_CONCURRENCY', '1')
+    preload = False
+    config_file = os.path.exists('gunicorn.conf.py')
+    for i, arg in enumerate(args):
+        name, _, value = arg.partition('=')
+        if name in ('-w', '--workers'):
+            workers = value or (args[i + 1] if i + 1 < len(args) else '')
+        elif arg.startswith('-w') and not arg.startswith('--'):
+            workers = arg[2:]
+        elif name == '--preload':
+            preload = True
+        elif name in ('-c', '--config') or (arg.startswith('-c') and not arg.startswith('--')):
+            config_file = True
+    if config_file or not workers.isdigit():
+        return 0, preload
+    return int(workers), preload
+
+
+def resolve_backend(backend, **detect):
+    """The store to build for SCANMARK_STORE, checked against the server
+
+    'auto' is the journaled memory store for a single process and SQLite
+    when gunicorn forks several workers, preloads the app (the journal
+    would be opened in the master), or its worker count is not known
+    here. Choosing 'memory' for several workers or --preload raises
+    StoreConfigurationError at startup instead of failing every write.
+    """
+    served = gunicorn_workers(**detect)
+    single = served is None or (served[0] == 1 and not served[1])
+    if backend == 'auto':
+        return 'memory' if single else 'sqlite'
+    if backend == 'memory' and served is not None and (served[0] > 1 or served[1]):
+        how = '--preload' if served[1] else f'{served[0]} workers'
+        raise StoreConfigurationError(
+            f'SCANMARK_STORE=memory is private to one process and cannot serve gunicorn '
+            f'with {how}; use SCANMARK_STORE=sqlite (or auto)')
+    return backend
+
+
+def create_store(backend, data_dir, **options):
+    """Build the session store selected by SCANMARK_STORE"""
+    if backend == 'memory':
+        return MemorySessionStore(SessionJournal(data_dir, **options))
+    if backend == 'sqlite':
+        return SQLiteSessionStore(os.path.join(private_directory(data_dir), 'sessions.db'))
+    raise ValueError(f'Unknown session store backend: {backend}')
@@ -0,0 +1,426 @@
+"""Embedded SQLite backend for database.py
+
+SQLiteBackend answers the subset of the Supabase/PostgREST client API that
+the Database class uses: table(name) returns a query builder with
+select/insert/upsert/update/delete, the eq/neq/gt/gte/lt/lte/in_/or_
+filters, order/limit/range/single and count='exact', and execute() returns
+an object with .data and .count. rpc(name, params) runs the functions
+PostgREST would expose. Any object with that interface can sit under
+Database (see database.get_client), so Supabase and this backend are
+interchangeable.
+
+Tables and indexes come from schema.sql. Postgres types and defaults are
+translated to SQLite's; the plpgsql trigger functions are replaced by the
+equivalent row-level SQLite triggers below. Each thread gets its own
+connection in WAL mode.
+"""
+import os
+import re
+import uuid
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+TYPE_TRANSLATIONS = [
+    (re.compile(r'\buuid\b', re.I), 'TEXT'),
+    (re.compile(r'\btimestamp\b', re.I), 'TEXT'),
+    (re.compile(r'\bdate\b', re.I), 'TEXT'),
+    (re.compile(r'\bboolean\b', re.I), 'INTEGER'),
+    (re.compile(r'\bbigint\b', re.I), 'INTEGER'),
+    (re.compile(r'DEFAULT\s+now\(\)', re.I), 'DEFAULT (now())'),
+    (re.compile(r'DEFAULT\s+uuid_generate_v4\(\)', re.I), 'DEFAULT (uuid_generate_v4())'),
+    (re.compile(r'DEFAULT\s+true\b', re.I), 'DEFAULT 1'),
+    (re.compile(r'DEFAULT\s+false\b', re.I), 'DEFAULT 0'),
+]
+
+# schema.sql statements with no SQLite equivalent; triggers are replaced below
+SKIPPED_STATEMENTS = re.compile(
+    r'^(CREATE\s+EXTENSION|CREATE\s+OR\s+REPLACE\s+FUNCTION|DROP\s+TRIGGER|CREATE\s+TRIGGER|SELECT|INSERT)\b', re.I)
+
+# Kept by the triggers below; rebuilt from attendance only when missing or empty
+ROLLUP_TABLES = ('attendance_daily', 'attendance_students')
+
+ADD_COLUMN = re.compile(
+    r'^ALTER\s+TABLE\s+(\w+)\s+ADD\s+COLUMN\s+IF\s+NOT\s+EXISTS\s+(\w+)\s+(.+)$', re.I | re.S)
+
+# Row-level versions of the statement-level plpgsql triggers in schema.sql
+SQLITE_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trg_attendance_insert AFTER INSERT ON attendance BEGIN
+        INSERT INTO attendance_daily (day, count) VALUES (substr(NEW.created_at, 1, 10), 1)
+            ON CONFLICT (day) DO UPDATE SET count = count + 1;
+        INSERT INTO attendance_students (student_id, first_seen) VALUES (NEW.student_id, NEW.created_at)
+            ON CONFLICT (student_id) DO NOTHING;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_attendance_delete AFTER DELETE ON attendance BEGIN
+        UPDATE attendance_daily SET count = count - 1 WHERE day = substr(OLD.created_at, 1, 10);
+    END;
+"""
+
+OPERATORS = {'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+
+class BackendError(Exception):
+    """A query the backend rejected (unknown table or column, bad filter, single() mismatch)"""
+
+
+class APIResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def split_statements(sql):
+    """Split a SQL script on semicolons, keeping $$-quoted bodies and dropping -- comments"""
+    statements, current = [], []
+    in_dollar = False
+    i = 0
+    while i < len(sql):
+        if sql.startswith('$$', i):
+            in_dollar = not in_dollar
+            current.append('$$')
+            i += 2
+            continue
+        char = sql[i]
+        if not in_dollar and sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = len(sql) if end == -1 else end
+            continue
+        if char == ';' and not in_dollar:
+            statement = ''.join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    statement = ''.join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+def _split_top_level(text):
+    """Split a PostgREST logic tree on commas outside parentheses and quotes"""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+class QueryBuilder:
+    def __init__(self, backend, table):
+        if table not in backend.columns:
+            raise BackendError(f'relation "{table}" does not exist')
+        self.backend = backend
+        self.table = table
+        self.operation = 'select'
+        self.columns = '*'
+        self.payload = None
+        self.where = []
+        self.params = []
+        self.orders = []
+        self.count = None
+        self.limit_rows = None
+        self.offset = None
+        self.single_row = False
+        self.ignore_duplicates = False
+        self.on_conflict = None
+
+    def _column(self, name):
+        name = name.strip()
+        if not _IDENTIFIER.match(name) or name not in self.backend.columns[self.table]:
+            raise BackendError(f'column "{name}" does not exist on "{self.table}"')
+        return name
+
+    # Operations
+
+    def select(self, columns='*', count=None):
+        if columns.strip() != '*':
+            self.columns = ', '.join(self._column(c) for c in columns.split(','))
+        self.count = count
+        return self
+
+    def insert(self, payload):
+        self.operation, self.payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, ignore_duplicates=False, on_conflict=None):
+        self.operation, self.payload = 'upsert', payload
+        self.ignore_duplicates = ignore_duplicates
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, payload):
+        self.operation, self.payload = 'update', payload
+        return self
+
+    def delete(self):
+        self.operation = 'delete'
+        return self
+
+    # Filters
+
+    def _condition(self, column, operator, value):
+        column = self._column(column)
+        if operator == 'in':
+            values = list(value)
+            if not values:
+                return '0', []
+            return f'{column} IN ({", ".join("?" * len(values))})', values
+        if operator == 'is':
+            return f'{column} IS NULL', []
+        if operator not in OPERATORS:
+            raise BackendError(f'Unsupported filter operator: {operator}')
+        return f'{column} {OPERATORS[operator]} ?', [value]
+
+    def _filter(self, column, operator, value):
+        clause, params = self._condition(column, operator, value)
+        self.where.append(clause)
+        self.params.extend(params)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, 'eq', value)
+
+    def neq(self, column, value):
+        return self._filter(column, 'neq', value)
+
+    def gt(self, column, value):
+        return self._filter(column, 'gt', value)
+
+    def gte(self, column, value):
+        return self._filter(column, 'gte', value)
+
+    def lt(self, column, value):
+        return self._filter(column, 'lt', value)
+
+    def lte(self, column, value):
+        return self._filter(column, 'lte', value)
+
+    def in_(self, column, values):
+        return self._filter(column, 'in', values)
+
+    def or_(self, filters):
+        """PostgREST logic tree, e.g. 'a.lt.1,and(a.eq.1,b.lt.2)'"""
+        clause, params = self._logic(filters, 'OR')
+        self.where.append(clause)
+        self.params.extend(params)
+        return self
+
+    def _logic(self, text, joiner):
+        clauses, params = [], []
+        for part in _split_top_level(text):
+            nested = re.match(r'^(and|or)\((.*)\)$', part, re.S)
+            if nested:
+                clause, nested_params = self._logic(nested.group(2), nested.group(1).upper())
+            else:
+                column, operator, value = part.split('.', 2)
+                if len(value) >= 2 and value[0] == value[-1] == '"':
+                    value = value[1:-1]
+                if operator == 'in':
+                    value = [v.strip().strip('"') for v in value.strip('()').split(',')]
+                clause, nested_params = self._condition(column, operator, value)
+            clauses.append(clause)
+            params.extend(nested_params)
+        return '(' + f' {joiner} '.join(clauses) + ')', params
+
+    # Modifiers
+
+    def order(self, column, desc=False):
+        self.orders.append(f'{self._column(column)} {"DESC" if desc else "ASC"}')
+        return self
+
+    def limit(self, count):
+        self.limit_rows = int(count)
+        return self
+
+    def range(self, start, end):
+        self.offset = int(start)
+        self.limit_rows = int(end) - int(start) + 1
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    # Execution
+
+    def _where_sql(self):
+        return (' WHERE ' + ' AND '.join(self.where)) if self.where else ''
+
+    def execute(self):
+        conn = self.backend.connection()
+        if self.operation == 'select':
+            return self._execute_select(conn)
+        if self.operation in ('insert', 'upsert'):
+            rows = self.payload if isinstance(self.payload, list) else [self.payload]
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                data = [row for row in (self._insert_row(conn, row) for row in rows) if row is not None]
+            return APIResponse(data)
+        if self.operation == 'update':
+            assignments = ', '.join(f'{self._column(column)} = ?' for column in self.payload)
+            sql = f'UPDATE {self.table} SET {assignments}{self._where_sql()} RETURNING *'
+            cursor = conn.execute(sql, list(self.payload.values()) + self.params)
+            return APIResponse(self.backend.rows(self.table, cursor))
+        if self.operation == 'delete':
+            cursor = conn.execute(f'DELETE FROM {self.table}{self._where_sql()} RETURNING *', self.params)
+            return APIResponse(self.backend.rows(self.table, cursor))
+        raise BackendError(f'Unknown operation {self.operation}')
+
+    def _insert_row(self, conn, row):
+        columns = [self._column(column) for column in row]
+        sql = f'INSERT INTO {self.table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+        if self.operation == 'upsert':
+            conflict = self.on_conflict or self.backend.primary_keys[self.table]
+            if self.ignore_duplicates:
+                sql += f' ON CONFLICT ({conflict}) DO NOTHING'
+            else:
+                updates = ', '.join(f'{c} = excluded.{c}' for c in columns if c not in conflict.split(','))
+                sql += f' ON CONFLICT ({conflict}) DO ' + (f'UPDATE SET {updates}' if updates else 'NOTHING')
+        cursor = conn.execute(sql + ' RETURNING *', list(row.values()))
+        rows = self.backend.rows(self.table, cursor)
+        return rows[0] if rows else None
+
+    def _execute_select(self, conn):
+        sql = f'SELECT {self.columns} FROM {self.table}{self._where_sql()}'
+        if self.orders:
+            sql += ' ORDER BY ' + ', '.join(self.orders)
+        if self.limit_rows is not None or self.offset is not None:
+            sql += f' LIMIT {self.limit_rows if self.limit_rows is not None else -1}'
+            if self.offset:
+                sql += f' OFFSET {self.offset}'
+        data = self.backend.rows(self.table, conn.execute(sql, self.params))
+
+        count = None
+        if self.count == 'exact':
+            count = conn.execute(f'SELECT COUNT(*) FROM {self.table}{self._where_sql()}', self.params).fetchone()[0]
+        if self.single_row:
+            if len(data) != 1:
+                raise BackendError(f'JSON object requested, multiple (or no) rows returned ({len(data)})')
+            data = data[0]
+        return APIResponse(data, count)
+
+
+class SQLiteBackend:
+    """PostgREST-compatible client over an embedded SQLite database"""
+
+    def __init__(self, path, schema_path=SCHEMA_PATH):
+        self.path = path
+        self._local = threading.local()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.columns = {}
+        self.boolean_columns = {}
+        self.primary_keys = {}
+        self._apply_schema(schema_path)
+        self.rpcs = {'backfill_attendance_daily': self._backfill_attendance_daily}
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None,
+                                   check_same_thread=False, cached_statements=256)
+            conn.create_function('now', 0, lambda: datetime.now().isoformat())
+            conn.create_function('uuid_generate_v4', 0, lambda: str(uuid.uuid4()))
+            if self.path != ':memory:':
+                conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _apply_schema(self, schema_path):
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            schema = f.read()
+        conn = self.connection()
+        existing_tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for statement in split_statements(schema):
+            if SKIPPED_STATEMENTS.match(statement):
+                continue
+            added = ADD_COLUMN.match(statement)
+            if added:
+                table, column, column_type = added.groups()
+                existing = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+                if column not in existing:
+                    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {self._translate(column_type)}')
+                continue
+            conn.execute(self._translate(statement))
+        conn.executescript(SQLITE_TRIGGERS)
+
+        for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+            info = conn.execute(f'PRAGMA table_info({table})').fetchall()
+            self.columns[table] = {row[1] for row in info}
+            self.primary_keys[table] = ','.join(row[1] for row in sorted(info, key=lambda r: r[5]) if row[5])
+        # Declared types are translated away, so read booleans back from schema.sql itself
+        for table, body in re.findall(r'CREATE\s+TABLE\s+IF\s+NOT\s+EXISTS\s+(\w+)\s*\((.*?)\);',
+                                      schema, re.S | re.I):
+            self.boolean_columns[table] = set(re.findall(r'^\s*(\w+)\s+boolean\b', body, re.M | re.I))
+        # The triggers keep the rollups current from here on; a full rebuild is for first use
+        if any(table not in existing_tables or conn.execute(f'SELECT 1 FROM {table} LIMIT 1').fetchone() is None
+               for table in ROLLUP_TABLES):
+            self._backfill_attendance_daily({})
+
+    @staticmethod
+    def _translate(statement):
+        for pattern, replacement in TYPE_TRANSLATIONS:
+            statement = pattern.sub(replacement, statement)
+        return statement
+
+    def rows(self, table, cursor):
+        names = [column[0] for column in cursor.description]
+        booleans = [name for name in names if name in self.boolean_columns.get(table, ())]
+        data = [dict(zip(names, row)) for row in cursor.fetchall()]
+        for row in data:
+            for name in booleans:
+                if row[name] is not None:
+                    row[name] = bool(row[name])
+        return data
+
+    def table(self, name):
+        return QueryBuilder(self, name)
+
+    # supabase-py also exposes from_()
+    from_ = table
+
+    def rpc(self, name, params=None):
+        if name not in self.rpcs:
+            raise BackendError(f'function {name} does not exist')
+        return _RPCCall(self.rpcs[name], params or {})
+
+    def _backfill_attendance_daily(self, params):
+        conn = self.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT INTO attendance_daily (day, count) '
+                'SELECT substr(created_at, 1, 10), COUNT(*) FROM attendance WHERE true GROUP BY 1 '
+                'ON CONFLICT (day) DO UPDATE SET count = excluded.count'
+            )
+            conn.execute(
+                'INSERT INTO attendance_students (student_id, first_seen) '
+                'SELECT student_id, MIN(created_at) FROM attendance WHERE true GROUP BY student_id '
+                'ON CONFLICT (student_id) DO NOTHING'
+            )
+        return None
+
+
+class _RPCCall:
+    def __init__(self, function, params):
+        self.function = function
+        self.params = params
+
+    def execute(self):
+        return APIResponse(self.function(self.params))
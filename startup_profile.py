@@ -0,0 +1,170 @@
+"""Cold-start instrumentation for the serverless entry point
+
+Enabled by setting SCANMARK_PROFILE_STARTUP before index.py is imported:
+every module import is timed (inclusive and self time) until the first
+request has been served, then one report is printed. Use
+SCANMARK_PROFILE_STARTUP=json for a single machine-readable line, which is
+what benchmarks/bench_cold_start.py reads.
+
+Only meant for diagnosis: the import hook wraps every module loader.
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+REPORT_PREFIX = 'startup-profile '
+
+_started = None
+_milestones = []
+_records = []
+_phase = 'import'
+_local = threading.local()
+_lock = threading.Lock()
+_reported = False
+_first_request_ms = None
+
+
+class _TimedLoader:
+    """Delegating loader that times exec_module"""
+
+    def __init__(self, loader):
+        self._loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        stack = _local.__dict__.setdefault('stack', [])
+        frame = [time.perf_counter(), 0.0]
+        stack.append(frame)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            if stack:
+                stack[-1][1] += elapsed
+            with _lock:
+                _records.append((module.__name__, elapsed, elapsed - frame[1], _phase))
+
+
+class _TimingFinder:
+    """Meta path finder that wraps the loader found by the finders after it"""
+
+    @classmethod
+    def find_spec(cls, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is cls:
+                continue
+            find_spec = getattr(finder, 'find_spec', None)
+            if find_spec is None:
+                continue
+            spec = find_spec(name, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                spec.loader = _TimedLoader(spec.loader)
+            return spec
+        return None
+
+
+def enable():
+    """Start timing imports; call before anything heavy is imported"""
+    global _started
+    if _started is None:
+        _started = time.perf_counter()
+        sys.meta_path.insert(0, _TimingFinder)
+
+
+def disable():
+    if _TimingFinder in sys.meta_path:
+        sys.meta_path.remove(_TimingFinder)
+
+
+def mark(label):
+    """Record a milestone, in ms since enable()"""
+    if _started is not None:
+        _milestones.append((label, (time.perf_counter() - _started) * 1000))
+
+
+def instrument(app):
+    """Time the first request through `app`, then print the report"""
+    if _started is None:
+        return
+    mark('app ready')
+    wsgi_app = app.wsgi_app
+
+    def first_request(environ, start_response):
+        global _phase, _first_request_ms
+        with _lock:
+            first = app.wsgi_app is first_request
+            if first:
+                app.wsgi_app = wsgi_app
+                _phase = 'first request'
+        if not first:
+            return wsgi_app(environ, start_response)
+        started = time.perf_counter()
+        try:
+            return wsgi_app(environ, start_response)
+        finally:
+            _first_request_ms = (time.perf_counter() - started) * 1000
+            mark('first response')
+            disable()
+            emit()
+
+    app.wsgi_app = first_request
+
+
+def report(top=15):
+    """Timings so far: milestones, slowest modules and per-package totals"""
+    with _lock:
+        records = list(_records)
+    packages = {}
+    for name, _, self_time, phase in records:
+        key = (name.split('.')[0], phase)
+        packages[key] = packages.get(key, 0.0) + self_time
+    slowest = sorted(records, key=lambda r: r[2], reverse=True)[:top]
+    return {
+        'milestones_ms': {label: round(ms, 1) for label, ms in _milestones},
+        'first_request_ms': None if _first_request_ms is None else round(_first_request_ms, 1),
+        'modules': {phase: sorted(name for name, _, _, p in records if p == phase)
+                    for phase in ('import', 'first request')},
+        'slowest_modules': [
+            {'module': name, 'self_ms': round(self_time * 1000, 2),
+             'inclusive_ms': round(elapsed * 1000, 2), 'phase': phase}
+            for name, elapsed, self_time, phase in slowest
+        ],
+        'packages_ms': [
+            {'package': package, 'phase': phase, 'self_ms': round(total * 1000, 2)}
+            for (package, phase), total in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ],
+    }
+
+
+def emit():
+    """Print the report once"""
+    global _reported
+    if _reported:
+        return
+    _reported = True
+    data = report()
+    if os.getenv('SCANMARK_PROFILE_STARTUP', '').lower() == 'json':
+        print(REPORT_PREFIX + json.dumps(data, separators=(',', ':')), flush=True)
+        return
+    print("Startup profile (ms since profiling was enabled):")
+    for label, ms in data['milestones_ms'].items():
+        print(f"  {label:<24} {ms:>9.1f}")
+    print(f"  {'first request took':<24} {data['first_request_ms']:>9.1f}")
+    print(f"  modules imported: {len(data['modules']['import'])} at import, "
+          f"{len(data['modules']['first request'])} during the first request")
+    print("  Slowest packages (self time):")
+    for item in data['packages_ms']:
+        print(f"    {item['package']:<28} {item['phase']:<14} {item['self_ms']:>8.2f}")
+    print("  Slowest modules (self / inclusive):")
+    for item in data['slowest_modules']:
+        print(f"    {item['module']:<40} {item['phase']:<14} {item['self_ms']:>8.2f} {item['inclusive_ms']:>8.2f}")
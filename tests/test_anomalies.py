@@ -0,0 +1,86 @@
+import math
+import random
+from datetime import datetime, timedelta
+
+from anomalies import scan
+from geofence import METRES_PER_DEGREE
+
+LAT, LNG = 28.6139, 77.2090
+START = datetime(2024, 1, 15, 9, 0, 0)
+
+
+def submission(enrollment_no, seconds, north_m=0.0, east_m=0.0, device_id=None):
+    response = {
+        'enrollment_no': enrollment_no,
+        'created_at': (START + timedelta(seconds=seconds)).isoformat(),
+        'latitude': LAT + north_m / METRES_PER_DEGREE,
+        'longitude': LNG + east_m / (METRES_PER_DEGREE * math.cos(math.radians(LAT))),
+    }
+    if device_id:
+        response['device_id'] = device_id
+    return response
+
+
+def classroom(count=30, seed=7):
+    """Honest submissions scattered over a 20 m room, a minute apart"""
+    rng = random.Random(seed)
+    return [submission(f'E{n:03d}', n * 60, rng.uniform(-10, 10), rng.uniform(-10, 10), device_id=f'device-{n:04d}')
+            for n in range(count)]
+
+
+def test_an_honest_class_is_not_flagged():
+    result = scan(classroom())
+    assert result['checked'] == result['located'] == 30
+    assert result['flagged'] == []
+
+
+def test_shared_device_burst_is_flagged():
+    responses = classroom() + [
+        submission('P1', 5, 1, 1, device_id='proxy-phone-1'),
+        submission('P2', 12, 1, 1, device_id='proxy-phone-1'),
+    ]
+    result = scan(responses)
+    [device] = result['shared_devices']
+    assert device['device_id'] == 'proxy-ph'
+    assert device['enrollments'] == ['P1', 'P2']
+    assert device['burst'] and device['min_gap_s'] == 7
+    assert result['flagged'] == ['P1', 'P2']
+
+
+def test_device_moving_impossibly_fast_is_flagged():
+    responses = classroom() + [
+        submission('P1', 0, 0, 0, device_id='proxy-phone-1'),
+        submission('P2', 60, 0, 5000, device_id='proxy-phone-1'),
+    ]
+    [device] = scan(responses)['shared_devices']
+    assert device['impossible_travel'] and not device['burst']
+
+
+def test_shared_location_only_within_the_time_window():
+    responses = classroom() + [
+        submission('L1', 100, 12.0, 12.0),
+        submission('L2', 110, 12.1, 12.0),
+        # Same spot, but long after the window
+        submission('L3', 1000, 12.0, 12.1),
+    ]
+    [place] = scan(responses, window_s=120)['shared_locations']
+    assert place['enrollments'] == ['L1', 'L2']
+    assert place['burst'] and place['span_s'] == 10
+
+
+def test_far_submission_is_an_outlier():
+    responses = classroom() + [submission('FAR', 30, 2000, 0)]
+    result = scan(responses)
+    assert [o['enrollment_no'] for o in result['outliers']] == ['FAR']
+    assert result['outliers'][0]['distance_m'] > result['outlier_threshold_m']
+
+
+def test_missing_or_bad_fields_are_skipped():
+    responses = classroom(5) + [
+        {'enrollment_no': 'X1', 'latitude': 'nan', 'longitude': '', 'created_at': 'yesterday'},
+        {'enrollment_no': 'X2'},
+    ]
+    result = scan(responses)
+    assert result['checked'] == 7
+    assert result['located'] == 5
+    assert scan([])['flagged'] == []
@@ -0,0 +1,95 @@
+import math
+
+import pytest
+
+from geofence import parse_geofence, contains, contains_many, audit, distance_m, METRES_PER_DEGREE
+
+LAT, LNG = 28.6139, 77.2090
+
+
+def offset(north_m, east_m):
+    """A point north_m and east_m away from (LAT, LNG)"""
+    return LAT + north_m / METRES_PER_DEGREE, LNG + east_m / (METRES_PER_DEGREE * math.cos(math.radians(LAT)))
+
+
+def square(half_m, margin_m=0):
+    corners = [offset(-half_m, -half_m), offset(-half_m, half_m), offset(half_m, half_m), offset(half_m, -half_m)]
+    return {'type': 'polygon', 'points': [list(c) for c in corners], 'margin_m': margin_m}
+
+
+def test_parse_radius_and_polygon_forms():
+    assert parse_geofence({}) is None
+    fence = parse_geofence({'geofence_lat': str(LAT), 'geofence_lng': str(LNG),
+                            'geofence_radius': '40', 'geofence_margin': '10'})
+    assert fence == {'type': 'radius', 'center': [LAT, LNG], 'radius_m': 40.0, 'margin_m': 10.0}
+
+    fence = parse_geofence({'geofence_polygon': '[[0, 0], [0, 1], [1, 1]]'})
+    assert fence['type'] == 'polygon' and len(fence['points']) == 3
+
+
+@pytest.mark.parametrize('form', [
+    {'geofence_lat': '91', 'geofence_lng': '0', 'geofence_radius': '40'},
+    {'geofence_lat': 'nan', 'geofence_lng': '0', 'geofence_radius': '40'},
+    {'geofence_lat': '0', 'geofence_lng': '0', 'geofence_radius': '0'},
+    {'geofence_lat': '0', 'geofence_lng': '0', 'geofence_radius': '40', 'geofence_margin': '-1'},
+    {'geofence_polygon': '[[0, 0], [0, 1]]'},
+    {'geofence_polygon': 'not json'},
+])
+def test_parse_rejects_bad_fences(form):
+    with pytest.raises(ValueError):
+        parse_geofence(form)
+
+
+def test_radius_fence_with_margin():
+    fence = {'type': 'radius', 'center': [LAT, LNG], 'radius_m': 40, 'margin_m': 10}
+    assert abs(distance_m(LAT, LNG, *offset(30, 0)) - 30) < 0.1
+    assert contains(fence, *offset(30, 0))
+    assert contains(fence, *offset(0, 45))
+    assert not contains(fence, *offset(0, 55))
+
+
+def test_polygon_fence_with_margin():
+    assert contains(square(20), *offset(10, -10))
+    assert not contains(square(20), *offset(25, 0))
+    assert contains(square(20, margin_m=10), *offset(25, 0))
+    assert not contains(square(20, margin_m=10), *offset(35, 0))
+
+
+@pytest.mark.parametrize('fence', [
+    {'type': 'radius', 'center': [LAT, LNG], 'radius_m': 40, 'margin_m': 10},
+    square(20),
+    square(20, margin_m=10),
+])
+def test_contains_many_matches_contains(fence):
+    points = [offset(north, east) for north in range(-60, 61, 7) for east in range(-60, 61, 11)]
+    lats, lngs = [p[0] for p in points], [p[1] for p in points]
+    assert list(contains_many(fence, lats, lngs)) == [contains(fence, lat, lng) for lat, lng in points]
+
+
+def test_audit_separates_outside_from_missing():
+    responses = [
+        {'enrollment_no': 'IN', 'latitude': str(offset(5, 5)[0]), 'longitude': str(offset(5, 5)[1])},
+        {'enrollment_no': 'OUT', 'latitude': offset(100, 0)[0], 'longitude': offset(100, 0)[1]},
+        {'enrollment_no': 'NONE', 'latitude': '', 'longitude': None},
+        {'enrollment_no': 'BAD', 'latitude': 'here', 'longitude': 'there'},
+    ]
+    outside, missing = audit(square(20), responses)
+    assert [r['enrollment_no'] for r in outside] == ['OUT']
+    assert sorted(r['enrollment_no'] for r in missing) == ['BAD', 'NONE']
+
+
+def test_audit_without_numpy(monkeypatch):
+    import builtins
+    real_import = builtins.__import__
+
+    def no_numpy(name, *args, **kwargs):
+        if name == 'numpy':
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, '__import__', no_numpy)
+    responses = [{'latitude': offset(5, 5)[0], 'longitude': offset(5, 5)[1]},
+                 {'latitude': offset(100, 0)[0], 'longitude': offset(100, 0)[1]},
+                 {'latitude': None, 'longitude': None}]
+    outside, missing = audit(square(20), responses)
+    assert outside == [responses[1]] and missing == [responses[2]]
@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+
+import pytest
+
+from session_store import (SessionJournal, MemorySessionStore, JournalLockedError, StoreConfigurationError,
+                           JOURNAL_NAME, create_store, resolve_backend)
+
+
+def response(enrollment_no):
+    return {'enrollment_no': enrollment_no, 'student_name': f'Student {enrollment_no}'}
+
+
+def open_store(directory, **options):
+    return MemorySessionStore(SessionJournal(directory, **options))
+
+
+def test_torn_tail_survives_two_restarts(tmp_path):
+    store = open_store(str(tmp_path))
+    store.put_session('a', 's1', {'name': 'Lecture', 'active': True})
+    for enrollment_no in ('E1', 'E2', 'E3'):
+        assert store.add_response('a', 's1', response(enrollment_no))
+    store.close()
+
+    # A crash in the middle of the next append
+    with open(os.path.join(str(tmp_path), JOURNAL_NAME), 'a', encoding='utf-8') as f:
+        f.write('[5,"response","a","s1",{"enrol')
+
+    store = open_store(str(tmp_path))
+    assert store.add_response('a', 's1', response('E4'))
+    store.close()
+
+    store = open_store(str(tmp_path))
+    assert [r['enrollment_no'] for r in store.get_responses('a', 's1')] == ['E1', 'E2', 'E3', 'E4']
+    # The duplicate index came back with them
+    assert not store.add_response('a', 's1', response('E2'))
+    store.close()
+
+
+def test_records_after_an_old_torn_line_are_replayed(tmp_path):
+    # Journals written before torn tails were cut have the next record glued onto the torn one
+    lines = [
+        [1, 'session', 'a', 's1', {'name': 'Lecture', 'active': True}],
+        [2, 'response', 'a', 's1', response('E1')],
+    ]
+    with open(os.path.join(str(tmp_path), JOURNAL_NAME), 'w', encoding='utf-8') as f:
+        f.write(''.join(json.dumps(line) + '\n' for line in lines))
+        f.write('[3,"response","a","s1",{"enrol' + json.dumps([3, 'response', 'a', 's1', response('E2')]) + '\n')
+        f.write(json.dumps([4, 'response', 'a', 's1', response('E3')]) + '\n')
+
+    store = open_store(str(tmp_path))
+    assert [r['enrollment_no'] for r in store.get_responses('a', 's1')] == ['E1', 'E3']
+    store.close()
+
+
+def test_snapshot_and_tail_restore(tmp_path):
+    store = open_store(str(tmp_path), snapshot_every=3)
+    store.put_session('a', 's1', {'name': 'Lecture', 'active': True})
+    for i in range(10):
+        store.add_response('a', 's1', response(f'E{i}'))
+    store.set_active('a', 's1', False)
+    store.close()
+    assert os.path.exists(os.path.join(str(tmp_path), 'snapshot.jsonl'))
+
+    store = open_store(str(tmp_path))
+    assert [r['enrollment_no'] for r in store.get_responses('a', 's1')] == [f'E{i}' for i in range(10)]
+    assert store.get_session('a', 's1')['active'] is False
+    assert not store.add_response('a', 's1', response('E7'))
+    store.close()
+
+
+def test_deleted_session_stays_deleted(tmp_path):
+    store = open_store(str(tmp_path))
+    store.put_session('a', 's1', {'name': 'Lecture', 'active': True})
+    store.add_response('a', 's1', response('E1'))
+    assert store.delete_session('a', 's1')
+    store.close()
+
+    store = open_store(str(tmp_path))
+    assert store.get_session('a', 's1') is None
+    assert store.get_responses('a', 's1') == []
+    store.close()
+
+
+def test_second_writer_is_refused(tmp_path):
+    journal = SessionJournal(str(tmp_path))
+    with pytest.raises(JournalLockedError):
+        SessionJournal(str(tmp_path))
+    journal.close()
+    SessionJournal(str(tmp_path)).close()
+
+
+def test_legacy_pickle_is_not_loaded(tmp_path):
+    with open(os.path.join(str(tmp_path), 'snapshot.pickle'), 'wb') as f:
+        f.write(b'not loaded')
+    journal = SessionJournal(str(tmp_path))
+    with pytest.raises(RuntimeError, match='convert_legacy_snapshot'):
+        journal.restore()
+    journal.close()
+
+
+def test_untouched_sessions_survive_a_second_snapshot(tmp_path):
+    store = open_store(str(tmp_path), snapshot_every=1000)
+    for session_id in ('s1', 's2'):
+        store.put_session('a', session_id, {'name': session_id, 'active': True})
+        for i in range(5):
+            store.add_response('a', session_id, response(f'{session_id}-E{i}'))
+    store.journal.snapshot(store.sessions, store.responses, background=False)
+    store.close()
+
+    # s1 is only replayed onto, s2 is never read before the next snapshot
+    store = open_store(str(tmp_path), snapshot_every=1000)
+    store.journal.record('response', 'a', 's1', response('s1-E5'))
+    store.close()
+    store = open_store(str(tmp_path), snapshot_every=1000)
+    store.journal.snapshot(store.sessions, store.responses, background=False)
+    store.close()
+
+    store = open_store(str(tmp_path))
+    assert len(store.get_responses('a', 's1')) == 6
+    assert [r['enrollment_no'] for r in store.get_responses('a', 's2')] == [f's2-E{i}' for i in range(5)]
+    assert not store.add_response('a', 's1', response('s1-E5'))
+    assert store.add_response('a', 's2', response('s2-E5'))
+    store.close()
+
+
+def test_concurrent_submissions_share_fsyncs(tmp_path, monkeypatch):
+    store = open_store(str(tmp_path))
+    store.put_session('a', 's1', {'name': 'Lecture', 'active': True})
+    real_fsync = os.fsync
+    calls = []
+
+    def slow_fsync(fd):
+        calls.append(fd)
+        time.sleep(0.02)
+        real_fsync(fd)
+
+    monkeypatch.setattr(os, 'fsync', slow_fsync)
+    threads = [threading.Thread(target=store.add_response, args=('a', 's1', response(f'E{i}')))
+               for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) < 16
+    assert store.journal._synced == store.journal.seq
+    store.close()
+
+    store = open_store(str(tmp_path))
+    assert len(store.get_responses('a', 's1')) == 16
+    store.close()
+
+
+def test_writer_in_another_process_is_refused(tmp_path):
+    journal = SessionJournal(str(tmp_path))
+    script = ('import sys, session_store\n'
+              'try:\n'
+              '    session_store.SessionJournal(sys.argv[1])\n'
+              'except session_store.JournalLockedError:\n'
+              '    sys.exit(3)\n')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', script, str(tmp_path)], cwd=root)
+    assert result.returncode == 3
+    journal.close()
+    assert subprocess.run([sys.executable, '-c', script, str(tmp_path)], cwd=root).returncode == 0
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_pages_are_oldest_first_and_reject_bad_cursors(tmp_path, backend):
+    store = create_store(backend, str(tmp_path))
+    store.put_session('a', 's1', {'name': 'Lecture', 'active': True})
+    for n in range(5):
+        store.add_response('a', 's1', response(f'E{n}'))
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = store.get_responses_page('a', 's1', cursor=cursor, limit=2)
+        seen.extend(r['enrollment_no'] for r in page)
+        if cursor is None:
+            break
+    assert seen == ['E0', 'E1', 'E2', 'E3', 'E4']
+
+    for bad in ('-5', 'zz'):
+        with pytest.raises(ValueError):
+            store.get_responses_page('a', 's1', cursor=bad)
+    if backend == 'memory':
+        # Positions past the end are not keys of any response
+        with pytest.raises(ValueError):
+            store.get_responses_page('a', 's1', cursor='99')
+    store.close()
+
+
+def detect(argv, **environ):
+    return {'argv': argv, 'environ': environ, 'modules': {}}
+
+
+def test_auto_store_follows_the_gunicorn_worker_count():
+    assert resolve_backend('auto', **detect(['flask'])) == 'memory'
+    assert resolve_backend('auto', **detect(['/venv/bin/gunicorn', 'index:app'])) == 'memory'
+    assert resolve_backend('auto', **detect(['/venv/bin/gunicorn', '-w', '4', 'index:app'])) == 'sqlite'
+    assert resolve_backend('auto', **detect(['/venv/bin/gunicorn', '--workers=2', 'index:app'])) == 'sqlite'
+    assert resolve_backend('auto', **detect(['/venv/bin/gunicorn', 'index:app'], WEB_CONCURRENCY='3')) == 'sqlite'
+    assert resolve_backend('auto', **detect(['/venv/bin/gunicorn', 'index:app'], GUNICORN_CMD_ARGS='--preload')) == 'sqlite'
+    # Workers set in a config file are not visible here
+    assert resolve_backend('auto', **detect(['/venv/bin/gunicorn', '-c', 'conf.py', 'index:app'])) == 'sqlite'
+
+
+def test_memory_store_is_refused_for_several_workers():
+    with pytest.raises(StoreConfigurationError):
+        resolve_backend('memory', **detect(['/venv/bin/gunicorn', '-w4', 'index:app']))
+    with pytest.raises(StoreConfigurationError):
+        resolve_backend('memory', **detect(['/venv/bin/gunicorn', '--preload', 'index:app']))
+    assert resolve_backend('memory', **detect(['/venv/bin/gunicorn', '-w', '1', 'index:app'])) == 'memory'
+    assert resolve_backend('sqlite', **detect(['/venv/bin/gunicorn', '-w', '4', 'index:app'])) == 'sqlite'
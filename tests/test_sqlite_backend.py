@@ -0,0 +1,97 @@
+import pytest
+
+from sqlite_backend import SQLiteBackend, BackendError, split_statements
+
+
+@pytest.fixture
+def client(tmp_path):
+    return SQLiteBackend(str(tmp_path / 'scanmark.db'))
+
+
+def attend(client, student_id, created_at, token='t1'):
+    return client.table('attendance').insert(
+        {'student_id': student_id, 'created_at': created_at, 'token': token}).execute().data[0]
+
+
+def test_split_statements_keeps_dollar_quoted_bodies():
+    sql = """
+        -- a comment; with a semicolon
+        CREATE TABLE a (x text);
+        CREATE FUNCTION f() RETURNS trigger AS $$ BEGIN RETURN NULL; END; $$ LANGUAGE plpgsql;
+    """
+    statements = split_statements(sql)
+    assert len(statements) == 2
+    assert 'RETURN NULL; END;' in statements[1]
+
+
+def test_insert_fills_defaults_and_reads_booleans_back(client):
+    row = client.table('sessions').insert(
+        {'id': 's1', 'name': 'Lecture', 'faculty': 'F', 'branch': 'B', 'semester': '1'}).execute().data[0]
+    assert row['active'] is True
+    assert row['created_at']
+
+    client.table('sessions').update({'active': False}).eq('id', 's1').execute()
+    assert client.table('sessions').select('*').eq('id', 's1').single().execute().data['active'] is False
+
+
+def test_filters_order_and_count(client):
+    for n, day in enumerate(['2024-01-01', '2024-01-02', '2024-01-03']):
+        attend(client, f'S{n}', f'{day}T09:00:00', token='t1' if n < 2 else 't2')
+
+    result = (client.table('attendance').select('student_id', count='exact')
+              .in_('token', ['t1', 't2']).gte('created_at', '2024-01-02')
+              .order('created_at', desc=True).execute())
+    assert [r['student_id'] for r in result.data] == ['S2', 'S1']
+    assert result.count == 2
+    assert client.table('attendance').select('*').range(1, 1).order('created_at').execute().data[0]['student_id'] == 'S1'
+
+
+def test_or_logic_tree_pages_on_a_keyset(client):
+    rows = [attend(client, f'S{n}', '2024-01-01T09:00:00' if n < 2 else '2024-01-01T10:00:00') for n in range(4)]
+    rows.sort(key=lambda r: (r['created_at'], r['id']))
+    last = rows[1]
+
+    page = (client.table('attendance').select('*')
+            .or_(f'created_at.gt."{last["created_at"]}",'
+                 f'and(created_at.eq."{last["created_at"]}",id.gt."{last["id"]}")')
+            .order('created_at').order('id').execute().data)
+    assert [r['id'] for r in page] == [r['id'] for r in rows[2:]]
+
+
+def test_upsert_updates_or_ignores_on_conflict(client):
+    client.table('admins').insert({'username': 'a', 'password_hash': 'one'}).execute()
+    client.table('admins').upsert({'username': 'a', 'password_hash': 'two'}).execute()
+    assert client.table('admins').select('*').eq('username', 'a').single().execute().data['password_hash'] == 'two'
+
+    client.table('admins').upsert({'username': 'a', 'password_hash': 'three'}, ignore_duplicates=True).execute()
+    assert client.table('admins').select('*').eq('username', 'a').single().execute().data['password_hash'] == 'two'
+
+
+def test_rollups_follow_inserts_and_deletes(client):
+    first = attend(client, 'S1', '2024-01-01T09:00:00')
+    attend(client, 'S2', '2024-01-01T10:00:00')
+    attend(client, 'S1', '2024-01-02T09:00:00')
+    client.table('attendance').delete().eq('id', first['id']).execute()
+
+    daily = {r['day']: r['count'] for r in client.table('attendance_daily').select('*').execute().data}
+    assert daily == {'2024-01-01': 1, '2024-01-02': 1}
+    students = client.table('attendance_students').select('student_id').order('student_id').execute().data
+    assert [r['student_id'] for r in students] == ['S1', 'S2']
+
+
+def test_rollups_survive_reopening(tmp_path):
+    path = str(tmp_path / 'scanmark.db')
+    attend(SQLiteBackend(path), 'S1', '2024-01-01T09:00:00')
+    reopened = SQLiteBackend(path)
+    assert reopened.table('attendance_daily').select('*').execute().data == [{'day': '2024-01-01', 'count': 1}]
+
+
+def test_unknown_tables_columns_and_single_mismatch_are_rejected(client):
+    with pytest.raises(BackendError):
+        client.table('missing')
+    with pytest.raises(BackendError):
+        client.table('attendance').select('*').eq('student_id; DROP TABLE attendance', 'x')
+    with pytest.raises(BackendError):
+        client.table('attendance').select('*').single().execute()
+    with pytest.raises(BackendError):
+        client.rpc('missing')
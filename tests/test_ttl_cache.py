@@ -0,0 +1,110 @@
+import time
+import threading
+
+from ttl_cache import TTLCache, ttl_cached
+
+
+def test_invalidate_drops_one_key_or_everything():
+    cache = TTLCache(ttl=60)
+    loads = []
+
+    def loader(key):
+        return lambda: loads.append(key) or f'value-{key}'
+
+    for key in ('a', 'b'):
+        cache.get_or_load(key, loader(key))
+    cache.invalidate('a')
+    cache.get_or_load('a', loader('a'))
+    cache.get_or_load('b', loader('b'))
+    assert loads == ['a', 'b', 'a']
+
+    cache.invalidate()
+    cache.get_or_load('b', loader('b'))
+    assert loads == ['a', 'b', 'a', 'b']
+
+
+def test_load_racing_an_invalidate_is_not_stored():
+    cache = TTLCache(ttl=60)
+    started, release = threading.Event(), threading.Event()
+    values = iter(['old', 'new'])
+
+    def slow_loader():
+        started.set()
+        release.wait(5)
+        return next(values)
+
+    results = []
+    loader_thread = threading.Thread(target=lambda: results.append(cache.get_or_load('k', slow_loader)))
+    loader_thread.start()
+    assert started.wait(5)
+    # The write that made 'old' out of date lands while it is being loaded
+    cache.invalidate('k')
+    release.set()
+    loader_thread.join(5)
+
+    assert results == ['old']
+    assert cache.get_or_load('k', slow_loader) == 'new'
+
+
+def test_entries_expire_and_are_served_stale_while_reloading():
+    cache = TTLCache(ttl=0.05, stale_ttl=5)
+    values = iter(['first', 'second'])
+    assert cache.get_or_load('k', lambda: next(values)) == 'first'
+    time.sleep(0.1)
+
+    # Stale: the old value comes back at once and a reload starts behind it
+    assert cache.get_or_load('k', lambda: next(values)) == 'first'
+    deadline = time.monotonic() + 5
+    while cache.get_or_load('k', lambda: 'unused') != 'second' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get_or_load('k', lambda: 'unused') == 'second'
+    assert cache.stats()['stale_hits'] >= 1
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('k', loader))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ['value'] * 8
+    assert len(calls) == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    for key in ('a', 'b'):
+        cache.get_or_load(key, lambda: key)
+    cache.get_or_load('a', lambda: 'reloaded')
+    cache.get_or_load('c', lambda: 'c')
+    assert cache.get_or_load('a', lambda: 'reloaded') == 'a'
+    assert cache.get_or_load('b', lambda: 'reloaded') == 'reloaded'
+
+
+def test_decorator_invalidates_by_arguments():
+    calls = []
+
+    @ttl_cached(ttl=60)
+    def lookup(key):
+        calls.append(key)
+        return key.upper()
+
+    assert lookup('a') == 'A' and lookup('a') == 'A'
+    lookup.invalidate('a')
+    assert lookup('a') == 'A'
+    lookup('b')
+    lookup.cache_clear()
+    lookup('b')
+    assert calls == ['a', 'a', 'b', 'b']
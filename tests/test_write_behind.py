@@ -0,0 +1,102 @@
+import os
+import json
+import glob
+
+import write_behind
+from write_behind import BatchWriter
+
+
+def row(n):
+    return {'id': f'r{n}', 'student_id': f'S{n}'}
+
+
+def spools(tmp_path):
+    return sorted(glob.glob(os.path.join(str(tmp_path), 'attendance.*.spool')))
+
+
+def test_rows_are_flushed_in_batches_and_the_spool_removed(tmp_path):
+    batches = []
+    writer = BatchWriter(batches.append, str(tmp_path / 'attendance.spool'), max_batch=10, max_delay=0.2)
+    for n in range(25):
+        writer.submit(row(n))
+    assert writer.flush(timeout=5)
+    writer.close()
+
+    assert [r['id'] for batch in batches for r in batch] == [f'r{n}' for n in range(25)]
+    assert max(len(batch) for batch in batches) <= 10
+    assert spools(tmp_path) == []
+
+
+def test_spool_of_a_dead_process_is_replayed(tmp_path):
+    # Left by a process that crashed part-way through writing its last row
+    orphan = tmp_path / 'attendance.99999.spool'
+    orphan.write_text(''.join(json.dumps(row(n)) + '\n' for n in range(3)) + '{"id": "r3", "stu',
+                      encoding='utf-8')
+
+    flushed = []
+    writer = BatchWriter(flushed.extend, str(tmp_path / 'attendance.spool'), max_delay=0.01)
+    assert writer.flush(timeout=5)
+    writer.close()
+
+    assert [r['id'] for r in flushed] == ['r0', 'r1', 'r2']
+    assert not orphan.exists()
+
+
+def test_rows_left_unflushed_on_close_are_replayed_on_next_start(tmp_path):
+    def unavailable(rows):
+        raise ConnectionError('database is down')
+
+    writer = BatchWriter(unavailable, str(tmp_path / 'attendance.spool'), max_delay=10)
+    for n in range(3):
+        writer.submit(row(n))
+    writer.close()
+    assert len(spools(tmp_path)) == 1
+
+    flushed = []
+    # A new process would have a new pid; rename so the spool looks like another's
+    os.replace(spools(tmp_path)[0], str(tmp_path / 'attendance.99999.spool'))
+    writer = BatchWriter(flushed.extend, str(tmp_path / 'attendance.spool'), max_delay=0.01)
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert [r['id'] for r in flushed] == ['r0', 'r1', 'r2']
+
+
+def test_spool_is_compacted_past_the_flushed_prefix(tmp_path, monkeypatch):
+    monkeypatch.setattr(write_behind, 'COMPACT_BYTES', 512)
+    flushed = []
+    writer = BatchWriter(flushed.extend, str(tmp_path / 'attendance.spool'), max_batch=5, max_delay=0.01)
+    written = 0
+    for n in range(100):
+        writer.submit(row(n))
+        written += len(json.dumps(row(n), separators=(',', ':'))) + 1
+    assert writer.flush(timeout=5)
+
+    assert os.path.getsize(writer.spool_path) < written
+    assert len(flushed) == 100
+    # Writing carries on into the compacted file
+    writer.submit(row(100))
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert flushed[-1]['id'] == 'r100'
+    assert spools(tmp_path) == []
+
+
+def test_rows_that_keep_failing_are_dead_lettered(tmp_path):
+    flushed = []
+
+    def flush(rows):
+        if any(r['id'] == 'r2' for r in rows):
+            raise ValueError('violates a constraint')
+        flushed.extend(rows)
+
+    writer = BatchWriter(flush, str(tmp_path / 'attendance.spool'), max_delay=0.1, max_retries=1)
+    for n in range(5):
+        writer.submit(row(n))
+    assert writer.flush(timeout=5)
+    writer.close()
+
+    assert sorted(r['id'] for r in flushed) == ['r0', 'r1', 'r3', 'r4']
+    with open(writer.dead_letter_path, encoding='utf-8') as f:
+        dead = [json.loads(line) for line in f]
+    assert [entry['row']['id'] for entry in dead] == ['r2']
+    assert 'violates a constraint' in dead[0]['error']
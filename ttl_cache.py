@@ -0,0 +1,144 @@
+import time
+import threading
+from functools import wraps
+from collections import OrderedDict
+
+
+class _Flight:
+    """One in-progress load that concurrent callers wait on"""
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """Thread-safe TTL cache with LRU eviction, single-flight loads and stale-while-revalidate
+
+    Entries are fresh for `ttl` seconds. For a further `stale_ttl` seconds
+    they are still returned, while one background thread reloads them.
+    Concurrent misses on the same key share a single call to the loader.
+    At most `maxsize` entries are kept; expired entries are dropped first,
+    then the least recently used.
+    """
+
+    def __init__(self, maxsize=1000, ttl=60, stale_ttl=0, name=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self._items = OrderedDict()
+        self._flights = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.load_errors = 0
+
+    def get_or_load(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                value, loaded_at = entry
+                age = now - loaded_at
+                if age < self.ttl:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self._items.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._flights:
+                        self._flights[key] = _Flight(self._generation)
+                        threading.Thread(target=self._load, args=(key, loader), daemon=True).start()
+                    return value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self._flights[key] = _Flight(self._generation)
+            else:
+                self.coalesced += 1
+
+        if leader:
+            self._load(key, loader)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _load(self, key, loader):
+        with self._lock:
+            flight = self._flights[key]
+        try:
+            flight.value = loader()
+            with self._lock:
+                # A load that raced an invalidate() must not store the old value
+                if flight.generation == self._generation:
+                    self._items[key] = (flight.value, time.monotonic())
+                    self._items.move_to_end(key)
+                    self._evict()
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self.load_errors += 1
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _evict(self):
+        if len(self._items) <= self.maxsize:
+            return
+        cutoff = time.monotonic() - self.ttl - self.stale_ttl
+        for key in [k for k, (_, loaded_at) in self._items.items() if loaded_at < cutoff]:
+            del self._items[key]
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._items.clear()
+            else:
+                self._items.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'size': len(self._items),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'load_errors': self.load_errors,
+            }
+
+
+def ttl_cached(maxsize=1000, ttl=60, stale_ttl=0):
+    """Decorator form of TTLCache keyed on the positional arguments
+
+    The wrapper exposes .cache, .invalidate(*args) and .cache_clear().
+    """
+    def decorator(func):
+        cache = TTLCache(maxsize=maxsize, ttl=ttl, stale_ttl=stale_ttl, name=func.__name__)
+
+        @wraps(func)
+        def wrapper(*args):
+            return cache.get_or_load(args, lambda: func(*args))
+
+        wrapper.cache = cache
+        wrapper.invalidate = lambda *args: cache.invalidate(args)
+        wrapper.cache_clear = lambda: cache.invalidate()
+        return wrapper
+    return decorator
@@ -0,0 +1,297 @@
+import os
+import glob
+import json
+import time
+import queue
+import atexit
+import threading
+
+import logs
+
+try:
+    import fcntl
+except ImportError:  # Windows: spools of other processes cannot be told apart from live ones
+    fcntl = None
+
+log = logs.get_logger('write_behind')
+
+_STOP = object()
+
+# Rewrite the spool without its flushed prefix once that prefix is this large
+COMPACT_BYTES = 1024 * 1024
+
+
+class QueueFullError(Exception):
+    """Raised when the write-behind queue stays full past the submit timeout"""
+
+
+class BatchWriter:
+    """Bounded write-behind queue that flushes rows in bulk
+
+    submit() appends the row to an fsync'd spool file and queues it; the
+    caller can acknowledge as soon as it returns. A background thread
+    gathers queued rows and hands them to `flush_fn` as one list once
+    `max_batch` rows are waiting or `max_delay` seconds have passed since
+    the first one. At most `max_queue` rows may be unflushed at a time;
+    beyond that submit() blocks for up to `put_timeout` seconds and then
+    raises QueueFullError.
+
+    Each process spools to its own file next to `spool_path`
+    (attendance.spool becomes attendance.<pid>.spool) and holds a flock on
+    it. Rows are queued in spool order, so everything before the last
+    flushed row can be cut off: the spool is compacted once that prefix
+    passes COMPACT_BYTES, and removed on a clean close. On start-up, spools
+    left by processes that died (unlocked ones) are queued again, so
+    `flush_fn` must be idempotent (e.g. an upsert keyed on the row id).
+
+    A batch that still fails after `max_retries` attempts is retried row by
+    row; rows that fail on their own are appended to `<spool>.dead` with
+    the error rather than blocking the queue.
+    """
+
+    def __init__(self, flush_fn, spool_path, max_batch=200, max_delay=0.05,
+                 max_queue=5000, put_timeout=1.0, fsync=True, on_flush=None, max_retries=5):
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.put_timeout = put_timeout
+        self.fsync = fsync
+        self.on_flush = on_flush
+        self.max_retries = max_retries
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._queue = queue.Queue()
+        self._spool_lock = threading.Lock()
+        self._unflushed = 0
+        self._closed = False
+
+        base, ext = os.path.splitext(os.path.abspath(spool_path))
+        self.spool_path = f'{base}.{os.getpid()}{ext}'
+        self.dead_letter_path = f'{base}.dead{ext}'
+        # Single shared spool written by earlier versions
+        self._legacy_path = base + ext
+        os.makedirs(os.path.dirname(self.spool_path), exist_ok=True)
+        if os.path.exists(self.spool_path):
+            # Left by an earlier process that had our pid; recovered below like any orphan
+            os.replace(self.spool_path, f'{base}.{os.getpid()}-{time.time_ns()}{ext}')
+        self._spool = open(self.spool_path, 'a', encoding='utf-8')
+        self._lock_spool(self._spool)
+        # Logical byte offsets: _base is where the file currently starts
+        self._base = 0
+        self._end = 0
+        self._flushed = 0
+
+        # Queue again the rows of spools whose process died
+        recovered, claimed = [], []
+        for path in glob.glob(f'{glob.escape(base)}.*{ext}') + [self._legacy_path]:
+            if path in (self.spool_path, self.dead_letter_path):
+                continue
+            handle = self._claim(path)
+            if handle is not None:
+                recovered.extend(self._read_spool(path))
+                claimed.append((path, handle))
+        with self._spool_lock:
+            for row in recovered:
+                # Recovered rows may exceed max_queue; those do not take a slot
+                self._append(row, self._slots.acquire(blocking=False))
+        for path, handle in claimed:
+            # Safe now that the rows are in our own fsync'd spool
+            os.remove(path)
+            handle.close()
+
+        self._thread = threading.Thread(target=self._run, name='batch-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @staticmethod
+    def _lock_spool(handle, blocking=True):
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except OSError:
+            return False
+        return True
+
+    def _claim(self, path):
+        """Lock a spool no live process holds; None if it is in use"""
+        if not os.path.exists(path) or (fcntl is None and path != self._legacy_path):
+            return None
+        handle = open(path, 'a', encoding='utf-8')
+        if self._lock_spool(handle, blocking=False):
+            return handle
+        handle.close()
+        return None
+
+    @staticmethod
+    def _read_spool(path):
+        rows = []
+        if not os.path.exists(path):
+            return rows
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    # Torn final line; that submit never returned
+                    break
+        return rows
+
+    def _append(self, row, holds_slot):
+        """Spool and queue one row; callers hold _spool_lock so queue order is spool order"""
+        line = json.dumps(row, separators=(',', ':')) + '\n'
+        self._spool.write(line)
+        self._spool.flush()
+        if self.fsync:
+            os.fsync(self._spool.fileno())
+        self._end += len(line.encode('utf-8'))
+        self._unflushed += 1
+        self._queue.put((row, self._end, holds_slot))
+
+    def submit(self, row):
+        """Durably queue one row; returns once it is safe to acknowledge"""
+        if self._closed:
+            raise RuntimeError('BatchWriter is closed')
+        if not self._slots.acquire(timeout=self.put_timeout):
+            raise QueueFullError('Write-behind queue is full')
+        with self._spool_lock:
+            self._append(row, True)
+        return row
+
+    def _run(self):
+        stopping = False
+        written = True
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            written = self._write(batch, retry=not stopping)
+        if not written:
+            # Compacting past later rows would lose this batch; all of it is replayed on next start
+            return
+
+        # Drain whatever was queued before close()
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+        for start in range(0, len(batch), self.max_batch):
+            if not self._write(batch[start:start + self.max_batch], retry=False):
+                # Later rows stay spooled too and are replayed on next start
+                break
+
+    def _flush(self, rows):
+        try:
+            self.flush_fn(rows)
+            return None
+        except Exception as e:
+            log.exception('batch.flush_failed', rows=len(rows), spool=self.spool_path)
+            return e
+
+    def _write(self, batch, retry=True):
+        """Flush queued (row, offset, holds_slot) items; False if they stay in the spool"""
+        rows = [row for row, _, _ in batch]
+        error = self._flush(rows)
+        attempt = 1
+        delay = 0.1
+        while error is not None and retry and attempt < self.max_retries:
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+            error = self._flush(rows)
+            attempt += 1
+        if error is not None and not retry:
+            # Rows stay in the spool and are replayed on next start
+            return False
+
+        written = rows
+        if error is not None:
+            # Find the rows that fail on their own and set them aside
+            written, dead = [], []
+            for row in rows:
+                row_error = self._flush([row])
+                if row_error is None:
+                    written.append(row)
+                else:
+                    dead.append({'row': row, 'error': str(row_error), 'failed_at': time.time()})
+            self._dead_letter(dead)
+
+        with self._spool_lock:
+            self._unflushed -= len(batch)
+            self._flushed = batch[-1][1]
+            if self._flushed - self._base >= COMPACT_BYTES:
+                self._compact()
+        for _, _, holds_slot in batch:
+            if holds_slot:
+                self._slots.release()
+        if self.on_flush is not None and written:
+            self.on_flush(written)
+        return True
+
+    def _dead_letter(self, entries):
+        if not entries:
+            return
+        log.error('batch.dead_lettered', rows=len(entries), path=self.dead_letter_path)
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(entry, separators=(',', ':'), default=str) + '\n' for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self):
+        """Drop the flushed prefix of the spool; callers hold _spool_lock"""
+        self._spool.flush()
+        with open(self.spool_path, 'rb') as f:
+            f.seek(self._flushed - self._base)
+            tail = f.read()
+        tmp_path = self.spool_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        # Lock the new file before it replaces the old one so it is never claimable
+        new_spool = open(tmp_path, 'a', encoding='utf-8')
+        self._lock_spool(new_spool)
+        os.replace(tmp_path, self.spool_path)
+        self._spool.close()
+        self._spool = new_spool
+        self._base = self._flushed
+
+    def pending(self):
+        """Number of rows accepted but not yet flushed"""
+        return self._unflushed
+
+    def flush(self, timeout=None):
+        """Wait until every row submitted so far has been flushed"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._unflushed and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.005)
+        return self._unflushed == 0
+
+    def close(self, timeout=10):
+        """Flush remaining rows and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        with self._spool_lock:
+            if self._unflushed == 0 and not self._thread.is_alive() and os.path.exists(self.spool_path):
+                # Nothing left to replay
+                os.remove(self.spool_path)
+            self._spool.close()